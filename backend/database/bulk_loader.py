@@ -0,0 +1,272 @@
+# backend/database/bulk_loader.py
+"""
+Carga masiva de los viajes en SQLite (tabla `viajes` y sus dimensiones; ver schema.py).
+- Los textos se cambian por los ids de `destinos`/`empresas` y la fecha por su número de día
+- Los textos y las fechas se convierten una vez por valor distinto (`pd.factorize`), no por fila
+- Las filas con la misma clave se unen con un `lexsort` sobre la clave ya numérica, que
+  también deja las filas ordenadas (`agrupar_viajes`), sin groupby ni columnas object
+- Las filas se pasan a `executemany` como tuplas con tipos de Python (str, float, int, None),
+  convertidas columna a columna, sin pasar por `to_sql`
+- Toda la carga va en una sola transacción: o queda la tabla nueva completa o la anterior
+- Durante la carga: WAL, `synchronous=OFF` y una caché de páginas más grande
+- Los índices (`schema.INDICES_VIAJES`, también el de la clave única) se borran antes de
+  insertar y se crean al final, de una vez; las filas se insertan ordenadas por la clave,
+  lo que abarata construir el índice único
+- Informa filas/s de la inserción y el tiempo total
+
+Uso (benchmark con filas sintéticas frente a `to_sql` haciendo el mismo trabajo):
+    python -m backend.database.bulk_loader --benchmark 1000000
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backend.database.schema import FECHA_EPOCH, borrar_indices, create_database, crear_indices
+
+# Columnas del DataFrame combinado (las de la vista `viajes_combinados`)
+VIAJE_KEY = ["origen", "destino", "fecha_viaje", "empresa", "precio_min"]
+VIAJE_DB_COLUMNS = VIAJE_KEY + [
+    "asientos_disponibles", "rating_empresa", "temperatura_promedio", "categoria_clima", "url_imagen_destino"
+]
+# Columnas de la tabla `viajes`; su clave es el índice único de schema.py
+VIAJES_TABLE_KEY = ["origen_id", "destino_id", "fecha", "empresa_id", "precio_min"]
+VIAJES_TABLE_COLUMNS = VIAJES_TABLE_KEY + [
+    "asientos_disponibles", "rating_empresa", "temperatura_promedio", "categoria_clima"
+]
+
+SYNCHRONOUS = "OFF"   # Si se corta la luz a mitad de carga, basta con volver a cargar (--completo)
+CACHE_MIB = 256       # Caché de páginas durante la carga
+
+
+def numero_de_dia(fechas):
+    """
+    Fechas ('YYYY-MM-DD' o datetime) -> días desde FECHA_EPOCH como Int32 (NA si no es una fecha).
+    Solo se convierte cada fecha distinta una vez.
+    """
+    codigos, valores = pd.factorize(pd.Series(fechas))
+    dias = (pd.to_datetime(pd.Index(valores), errors="coerce") - pd.Timestamp(FECHA_EPOCH)).days
+    return pd.Series(pd.array(dias, dtype="Int32").take(codigos, allow_fill=True))
+
+
+def ids_dimension(conn, tabla, nombres):
+    """Diccionario nombre -> id de la tabla de dimensión (`destinos` o `empresas`), creando los que falten."""
+    nuevos = [(nombre,) for nombre in pd.Series(nombres).dropna().unique()]
+    conn.executemany(f"INSERT OR IGNORE INTO {tabla} (nombre) VALUES (?)", nuevos)
+    return dict(conn.execute(f"SELECT nombre, id FROM {tabla}"))
+
+
+def _ids(serie, ids):
+    """Textos -> ids Int32 según `ids` (nombre -> id). Se busca cada texto distinto una vez, no cada fila."""
+    codigos, valores = pd.factorize(serie)  # Con categóricas usa sus códigos; NaN -> -1
+    return pd.array(pd.Index(valores).map(ids), dtype="Int32").take(codigos, allow_fill=True)
+
+
+def normalizar(conn, df: pd.DataFrame):
+    """
+    Convierte los viajes combinados (columnas de la vista `viajes_combinados`) en filas de
+    la tabla `viajes`: textos -> ids de las dimensiones (se crean los nuevos) y fecha ->
+    número de día. Guarda también el enlace de imagen de cada destino. Debe ir dentro de la
+    transacción de la carga. Las filas no se agrupan: ver `agrupar_viajes`.
+    """
+    df = df.reindex(columns=VIAJE_DB_COLUMNS)
+    destinos = ids_dimension(conn, "destinos", pd.concat([df["origen"].drop_duplicates(), df["destino"].drop_duplicates()]))
+    empresas = ids_dimension(conn, "empresas", df["empresa"].drop_duplicates())
+    imagenes = df[["destino", "url_imagen_destino"]].dropna().drop_duplicates("destino")
+    conn.executemany(
+        "UPDATE destinos SET url_imagen = ? WHERE nombre = ?",
+        imagenes[["url_imagen_destino", "destino"]].itertuples(index=False, name=None),
+    )
+    return pd.DataFrame({
+        "origen_id": _ids(df["origen"], destinos),
+        "destino_id": _ids(df["destino"], destinos),
+        "fecha": numero_de_dia(df["fecha_viaje"]).array,
+        "empresa_id": _ids(df["empresa"], empresas),
+        "precio_min": df["precio_min"].to_numpy(),
+        "asientos_disponibles": df["asientos_disponibles"].to_numpy(),
+        "rating_empresa": df["rating_empresa"].to_numpy(),
+        "temperatura_promedio": df["temperatura_promedio"].to_numpy(),
+        "categoria_clima": df["categoria_clima"].to_numpy(),
+    })
+
+
+def agrupar_viajes(viajes: pd.DataFrame):
+    """
+    Une las filas de `viajes` (ya normalizadas) que comparten la clave única (misma empresa,
+    ruta, día y precio, en distintos horarios): suma sus asientos y el resto lo toma de la
+    primera fila. Devuelve las filas ordenadas por la clave (nulos primero), el orden que
+    abarata construir el índice único. Sin groupby: como la clave es numérica, basta un
+    `lexsort` y ver dónde cambia la clave entre filas consecutivas.
+    """
+    if viajes.empty:
+        return viajes.reset_index(drop=True)
+    # -inf: los nulos van primero y son iguales entre sí (como dropna=False)
+    claves = [viajes[columna].to_numpy(dtype="float64", na_value=-np.inf) for columna in VIAJES_TABLE_KEY]
+    orden = np.lexsort(claves[::-1])
+    nuevo = np.zeros(len(orden), dtype=bool)
+    nuevo[0] = True
+    for clave in claves:
+        clave = clave[orden]
+        nuevo[1:] |= clave[1:] != clave[:-1]
+    inicios = np.flatnonzero(nuevo)
+
+    agrupados = viajes.iloc[orden[inicios]].reset_index(drop=True)
+    if len(inicios) < len(orden):
+        asientos = viajes["asientos_disponibles"].to_numpy(dtype="float64", na_value=0)[orden]
+        agrupados["asientos_disponibles"] = np.add.reduceat(asientos, inicios).astype("int64")
+    return agrupados
+
+
+def _columna(serie):
+    """Valores de Python de una columna (None en lugar de NaN/NA), sin recorrerla fila a fila."""
+    if serie.notna().all():
+        return serie.to_numpy().tolist()  # tolist de numpy: int/float de Python directamente
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def filas_tipadas(df, columnas=VIAJE_DB_COLUMNS):
+    """Iterador de tuplas por fila para sqlite3, armado a partir de las columnas ya convertidas."""
+    return zip(*(_columna(df[column]) for column in columnas))
+
+
+@contextmanager
+def pragmas_de_carga(conn, synchronous=SYNCHRONOUS, cache_mib=CACHE_MIB):
+    """
+    Ajusta la conexión para una carga grande y, al salir, restaura `synchronous` y
+    `cache_size`. El modo WAL se queda mientras se construye la versión; `publicacion.publicar`
+    la deja en modo DELETE antes de publicarla.
+    """
+    anteriores = {pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in ("synchronous", "cache_size")}
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute(f"PRAGMA cache_size = {-cache_mib * 1024}")  # Negativo = KiB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    try:
+        yield conn
+    finally:
+        for pragma, valor in anteriores.items():
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+
+
+def carga_masiva(db_path, df: pd.DataFrame):
+    """
+    Reemplaza todos los viajes por los de `df` (columnas de la vista `viajes_combinados`)
+    en una sola transacción. Las tablas deben existir (`create_database`). Los destinos y
+    empresas que ya no tienen viajes se borran. Devuelve el número de filas escritas.
+    """
+    inicio = time.perf_counter()
+    placeholders = ", ".join("?" for _ in VIAJES_TABLE_COLUMNS)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        with pragmas_de_carga(conn):
+            with conn:  # Una sola transacción, también para borrar y crear los índices
+                conn.execute("BEGIN")
+                borrar_indices(conn)
+                conn.execute("DELETE FROM viajes")
+                viajes = agrupar_viajes(normalizar(conn, df))
+                preparacion = time.perf_counter() - inicio
+                inicio_insercion = time.perf_counter()
+                conn.executemany(
+                    f"INSERT INTO viajes ({', '.join(VIAJES_TABLE_COLUMNS)}) VALUES ({placeholders})",
+                    filas_tipadas(viajes, VIAJES_TABLE_COLUMNS),
+                )
+                insercion = time.perf_counter() - inicio_insercion
+                inicio_indices = time.perf_counter()
+                crear_indices(conn)
+                indices = time.perf_counter() - inicio_indices
+                conn.execute("DELETE FROM empresas WHERE id NOT IN (SELECT empresa_id FROM viajes WHERE empresa_id IS NOT NULL)")
+                conn.execute("""
+                    DELETE FROM destinos WHERE id NOT IN (
+                        SELECT destino_id FROM viajes WHERE destino_id IS NOT NULL
+                        UNION SELECT origen_id FROM viajes WHERE origen_id IS NOT NULL
+                    )
+                """)
+    finally:
+        conn.close()
+
+    total = time.perf_counter() - inicio
+    logging.info(
+        f"⚡ Carga masiva: {len(viajes):,} filas en {total:.2f}s (preparación {preparacion:.2f}s; "
+        f"inserción {insercion:.2f}s, {len(viajes) / max(insercion, 1e-9):,.0f} filas/s; índices {indices:.2f}s)"
+    )
+    return len(viajes)
+
+
+def _viajes_sinteticos(filas, seed=0):
+    """DataFrame combinado sintético (mismas columnas que el del pipeline) con `filas` viajes."""
+    rng = random.Random(seed)
+    destinos = ["Arequipa", "Trujillo", "Cusco", "Piura", "Huancayo", "Huaraz", "Ica", "Tacna"]
+    empresas = [f"Empresa {i}" for i in range(60)]
+    fechas = [f"2025-{mes:02d}-{dia:02d}" for mes in range(1, 13) for dia in range(1, 29)]
+    destino = [rng.choice(destinos) for _ in range(filas)]
+    return pd.DataFrame({
+        "origen": "Lima",
+        "destino": destino,
+        "fecha_viaje": [rng.choice(fechas) for _ in range(filas)],
+        "empresa": [rng.choice(empresas) for _ in range(filas)],
+        "precio_min": [round(rng.uniform(30, 250), 2) for _ in range(filas)],
+        "asientos_disponibles": [rng.randint(0, 50) for _ in range(filas)],
+        "rating_empresa": [round(rng.uniform(1, 5), 1) for _ in range(filas)],
+        "temperatura_promedio": [round(rng.uniform(5, 30), 2) for _ in range(filas)],
+        "categoria_clima": [rng.choice(["Frío", "Templado", "Cálido"]) for _ in range(filas)],
+        "url_imagen_destino": [f"https://example.com/{d}.jpg" for d in destino],
+    })
+
+
+def _carga_to_sql(db_path, df):
+    """
+    Referencia del benchmark: el mismo trabajo que `carga_masiva` (normalizar, agrupar y
+    reemplazar los viajes en el esquema de schema.py, con los mismos pragmas y en una
+    transacción), pero insertando con `to_sql` y con los índices ya creados.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with pragmas_de_carga(conn):
+            with conn:
+                conn.execute("BEGIN")
+                conn.execute("DELETE FROM viajes")
+                viajes = agrupar_viajes(normalizar(conn, df))
+                viajes.to_sql("viajes", conn, if_exists="append", index=False)
+    finally:
+        conn.close()
+
+
+def benchmark(filas=1_000_000):
+    """
+    Compara, sobre `filas` viajes sintéticos, `to_sql` frente a `carga_masiva`, haciendo el
+    mismo trabajo (ver `_carga_to_sql`): cambia solo cómo se insertan las filas y cuándo se
+    construyen los índices. Informa tiempo total y tamaño del archivo.
+    """
+    df = _viajes_sinteticos(filas)
+    print(f"📊 Benchmark: {len(df):,} viajes")
+    with tempfile.TemporaryDirectory() as tmp:
+        for nombre, cargar in (("🐢 to_sql", _carga_to_sql), ("⚡ carga_masiva", carga_masiva)):
+            db_path = Path(tmp) / f"{nombre.split()[1]}.db"
+            create_database(db_path)
+            inicio = time.perf_counter()
+            cargar(db_path, df)
+            elapsed = time.perf_counter() - inicio
+            print(f"{nombre}: {elapsed:.2f}s ({len(df) / elapsed:,.0f} filas/s), "
+                  f"archivo {db_path.stat().st_size / 2**20:,.0f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la carga masiva de viajes_combinados")
+    parser.add_argument("--benchmark", type=int, metavar="FILAS", default=1_000_000,
+                        help="Viajes sintéticos a cargar")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    benchmark(args.benchmark)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# backend/database/exportacion.py
+"""
+Exportación de `viajes_combinados` a Arrow IPC para el frontend.
+- Cada versión publicada (ver publicacion.py) lleva al lado su `versiones/viajes_grupales_<versión>.arrow`
+- Tipos explícitos (`ESQUEMA_VIAJES`): fechas como date32, textos repetidos como diccionarios
+  (categóricas en pandas) y precios, ratings y temperaturas como float32
+- Filas ordenadas por destino y fecha (y precio), el orden en que filtra el buscador
+- Se lee la tabla `viajes` (ids y números) y las dimensiones aparte, no la vista: así los
+  textos salen de los diccionarios y no se crea un str de Python por fila
+- Sin compresión y en un solo bloque: el frontend abre el archivo con `memory_map` y las
+  columnas numéricas se usan sin copiarlas; varios procesos comparten las mismas páginas
+  a través de la caché del sistema operativo
+
+Uso (benchmark con filas sintéticas frente a `read_sql_query`):
+    python -m backend.database.exportacion --benchmark 1000000
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+_TEXTO = pa.dictionary(pa.int32(), pa.string())
+
+# Mismas columnas (y en el mismo orden) que la vista `viajes_combinados` de schema.py
+ESQUEMA_VIAJES = pa.schema([
+    ("id", pa.int32()),
+    ("origen", _TEXTO),
+    ("destino", _TEXTO),
+    ("fecha_viaje", pa.date32()),
+    ("empresa", _TEXTO),
+    ("precio_min", pa.float32()),
+    ("asientos_disponibles", pa.int32()),
+    ("rating_empresa", pa.float32()),
+    ("temperatura_promedio", pa.float32()),
+    ("categoria_clima", _TEXTO),
+    ("url_imagen_destino", _TEXTO),
+])
+ORDEN_VIAJES = ["destino", "fecha_viaje", "precio_min"]
+
+
+def _dimension(conn, tabla, columnas):
+    """Filas de una tabla de dimensión ordenadas por nombre: (ids, y un pa.array por columna)."""
+    filas = conn.execute(f"SELECT id, {', '.join(columnas)} FROM {tabla} ORDER BY nombre").fetchall()
+    valores = list(zip(*filas)) or [()] * (len(columnas) + 1)
+    return pa.array(valores[0], pa.int64()), [pa.array(v, pa.string()) for v in valores[1:]]
+
+
+def _texto(ids_dimension, nombres, ids):
+    """Columna de diccionario a partir de los ids de `viajes` (los índices son la posición en `nombres`)."""
+    indices = pc.index_in(ids, value_set=ids_dimension).cast(pa.int32())
+    return pa.DictionaryArray.from_arrays(indices, nombres)
+
+
+def tabla_viajes(conn):
+    """
+    Lee los viajes como tabla Arrow con `ESQUEMA_VIAJES` (las columnas de la vista
+    `viajes_combinados`), ordenada por `ORDEN_VIAJES`. Lee la tabla `viajes` y las
+    dimensiones por separado: los textos no se repiten fila a fila y la fecha ya es un
+    número de día (lo mismo que date32).
+    """
+    ids_destinos, (destinos, imagenes) = _dimension(conn, "destinos", ["nombre", "url_imagen"])
+    ids_empresas, (empresas,) = _dimension(conn, "empresas", ["nombre"])
+    filas = conn.execute(
+        "SELECT id, origen_id, destino_id, fecha, empresa_id, precio_min, asientos_disponibles,"
+        " rating_empresa, temperatura_promedio, categoria_clima FROM viajes"
+    ).fetchall()
+    (ids, origen, destino, fecha, empresa, precio, asientos, rating, temperatura,
+     clima) = (list(columna) for columna in zip(*filas)) if filas else [[]] * 10
+
+    destino = pa.array(destino, pa.int64())
+    columnas = {
+        "id": pa.array(ids, pa.int32()),
+        "origen": _texto(ids_destinos, destinos, pa.array(origen, pa.int64())),
+        "destino": _texto(ids_destinos, destinos, destino),
+        "fecha_viaje": pa.array(fecha, pa.int32()).cast(pa.date32()),  # Días desde 1970-01-01
+        "empresa": _texto(ids_empresas, empresas, pa.array(empresa, pa.int64())),
+        "precio_min": pa.array(precio, pa.float32()),
+        "asientos_disponibles": pa.array(asientos, pa.int32()),
+        "rating_empresa": pa.array(rating, pa.float32()),
+        "temperatura_promedio": pa.array(temperatura, pa.float32()),
+        "categoria_clima": pa.array(clima, pa.string()).dictionary_encode(),
+        "url_imagen_destino": pc.take(imagenes, pc.index_in(destino, value_set=ids_destinos)).dictionary_encode(),
+    }
+    tabla = pa.table(columnas).cast(ESQUEMA_VIAJES)
+    # Los diccionarios de destinos están ordenados por nombre: ordenar por sus índices es ordenar por nombre
+    orden = pc.sort_indices(
+        pa.table({
+            "destino": tabla["destino"].combine_chunks().indices,
+            "fecha_viaje": tabla["fecha_viaje"],
+            "precio_min": tabla["precio_min"],
+        }),
+        sort_keys=[(columna, "ascending") for columna in ORDEN_VIAJES],
+    )
+    return tabla.take(orden)
+
+
+def tabla_desde_vista(conn):
+    """
+    La misma tabla que `tabla_viajes`, pero leída de la vista `viajes_combinados` (o de la
+    tabla de ese nombre en los esquemas anteriores). Es más lenta; la usa el frontend
+    cuando la versión publicada no tiene exportación Arrow.
+    """
+    df = pd.read_sql_query(f"SELECT * FROM viajes_combinados ORDER BY {', '.join(ORDEN_VIAJES)}", conn)
+    df = df.reindex(columns=ESQUEMA_VIAJES.names)  # La tabla anterior no tenía `id`
+    return pa.Table.from_pandas(df, preserve_index=False).cast(ESQUEMA_VIAJES)
+
+
+def exportar_arrow(conn, path, version=None):
+    """
+    Escribe los viajes de `conn` en `path` (Arrow IPC, sin compresión) y guarda la versión
+    en los metadatos del esquema. Escribe primero un .tmp: `path` o está completo o no existe.
+    """
+    inicio = time.perf_counter()
+    path = Path(path)
+    tabla = tabla_viajes(conn)
+    if version is not None:
+        tabla = tabla.replace_schema_metadata({"version": version})
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, tabla.schema) as writer:
+            writer.write_table(tabla, max_chunksize=max(tabla.num_rows, 1))
+    os.replace(tmp_path, path)
+    logging.info(
+        f"🏹 Exportados {tabla.num_rows:,} viajes a {path.name} "
+        f"({path.stat().st_size / 2**20:,.1f} MiB, {time.perf_counter() - inicio:.2f}s)"
+    )
+    return path
+
+
+def leer_arrow(path):
+    """Abre `path` con memory_map: los datos no se leen hasta que se usan y no se copian."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+def a_pandas(tabla):
+    """
+    DataFrame de la app: diccionarios -> categóricas, date32 -> datetime64 y los números
+    tal cual (sin nulos, las columnas del DataFrame apuntan a la memoria de la tabla).
+    """
+    return tabla.to_pandas(split_blocks=True, date_as_object=False)
+
+
+def _read_sql(db_path):
+    """Lectura anterior del frontend: SQL completo + conversión de fechas y números."""
+    conn = sqlite3.connect(db_path)
+    try:
+        df = pd.read_sql_query("SELECT * FROM viajes_combinados", conn)
+    finally:
+        conn.close()
+    df["fecha_viaje"] = pd.to_datetime(df["fecha_viaje"])
+    for col in ["precio_min", "asientos_disponibles", "rating_empresa", "temperatura_promedio"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def _memoria_privada():
+    """MiB residentes del proceso que no son páginas compartidas de archivos (Linux); None si no se sabe."""
+    try:
+        _, residente, compartida = map(int, Path("/proc/self/statm").read_text().split()[:3])
+    except (OSError, ValueError):
+        return None
+    return (residente - compartida) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _medir_carga(metodo, path):
+    """Carga los viajes con `metodo` en este proceso; devuelve (filas, segundos, MiB privados añadidos)."""
+    memoria = _memoria_privada()
+    inicio = time.perf_counter()
+    df = _read_sql(path) if metodo == "read_sql_query" else a_pandas(leer_arrow(path))
+    elapsed = time.perf_counter() - inicio
+    df["precio_min"].sum()  # Recorre una columna para que sus páginas estén en memoria
+    return len(df), elapsed, None if memoria is None else _memoria_privada() - memoria
+
+
+def benchmark(filas=1_000_000):
+    """
+    Compara, sobre `filas` viajes sintéticos, la lectura anterior del frontend
+    (`read_sql_query` y conversiones) frente a abrir el Arrow con memory_map: tiempo
+    y memoria privada que suma el proceso (la que no se comparte con otros procesos).
+    Cada lectura se mide en un proceso nuevo, como el arranque de un worker de Streamlit.
+    """
+    from backend.database.bulk_loader import _viajes_sinteticos, carga_masiva
+    from backend.database.schema import create_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, arrow_path = Path(tmp) / "viajes.db", Path(tmp) / "viajes.arrow"
+        create_database(db_path)
+        carga_masiva(db_path, _viajes_sinteticos(filas))
+        conn = sqlite3.connect(db_path)
+        try:
+            exportar_arrow(conn, arrow_path)
+        finally:
+            conn.close()
+
+        for nombre, metodo, path in (("🐢", "read_sql_query", db_path), ("⚡", "memory_map", arrow_path)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                n, elapsed, privada = pool.submit(_medir_carga, metodo, path).result()
+            privada = "" if privada is None else f", +{privada:,.0f} MiB privados"
+            print(f"{nombre} {metodo}: {n:,} filas en {elapsed:.3f}s{privada}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la lectura de viajes_combinados en el frontend")
+    parser.add_argument("--benchmark", type=int, metavar="FILAS", default=1_000_000,
+                        help="Viajes sintéticos a cargar")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    benchmark(args.benchmark)
+
+
+if __name__ == "__main__":
+    main()
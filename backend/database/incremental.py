@@ -0,0 +1,211 @@
+# backend/database/incremental.py
+"""
+Detección de cambios para el ETL incremental.
+- Cada fuente cruda (registro vigente del archivo de segmentos o JSON suelto) corresponde
+  a una ruta-fecha; su huella (mtime, tamaño y hash) se guarda en la tabla `etl_fuentes`
+- En la siguiente ejecución solo se re-parsean las fuentes nuevas o cambiadas, y solo se
+  tocan en la base de datos las filas de esas rutas-fecha
+- Si cambia una entrada compartida por todas las filas (clima, imágenes), la carga es completa
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backend.database.loader import clave_json_redbus
+from backend.scraping.redbus.archive import latest_index_entries
+from backend.scraping.redbus.config import ARCHIVE_DIRNAME
+
+ESTADO_TABLE = "etl_fuentes"
+DATE_FORMAT = "%d-%b-%Y"
+
+
+@dataclass
+class PlanEtl:
+    """Qué hay que recargar en esta ejecución."""
+    completo: bool
+    motivo: str = ""
+    cambiadas: dict = field(default_factory=dict)     # fuente -> huella actual
+    eliminadas: dict = field(default_factory=dict)    # fuente -> huella guardada
+    sin_cambios: int = 0
+    huellas: dict = field(default_factory=dict)       # todas las huellas actuales, para guardar al final
+
+    @property
+    def claves_redbus(self):
+        """Rutas-fecha (origen, destino, 'DD-MMM-YYYY') que hay que volver a parsear."""
+        return {huella["clave"] for huella in self.cambiadas.values() if huella["clave"]}
+
+    @property
+    def claves_afectadas(self):
+        """(origen, destino, 'YYYY-MM-DD') cuyas filas se reemplazan en la base de datos."""
+        huellas = list(self.cambiadas.values()) + list(self.eliminadas.values())
+        return {(o, d, fecha_iso(f)) for o, d, f in (h["clave"] for h in huellas if h["clave"])}
+
+    @property
+    def hay_cambios(self):
+        return self.completo or bool(self.cambiadas or self.eliminadas)
+
+
+def fecha_iso(date_str):
+    """'03-Jul-2025' -> '2025-07-03' (formato de `fecha_viaje` en la base de datos)."""
+    return datetime.strptime(date_str, DATE_FORMAT).strftime("%Y-%m-%d")
+
+
+def hash_archivo(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _huella_archivo(path, clave=None):
+    stat = os.stat(path)
+    return {"clave": clave, "mtime": stat.st_mtime, "size": stat.st_size, "content_hash": None, "path": str(path)}
+
+
+def fuentes_redbus(json_dir, archive_dir=None):
+    """
+    Huellas de las fuentes vigentes de RedBus, con la misma regla que `process_redbus_data`:
+    el registro más reciente del archivo por ruta-fecha y los JSON sueltos que no estén en él.
+    Los registros ya traen su hash en el índice; los JSON se hashean solo si cambió su mtime o tamaño.
+    """
+    json_dir = Path(json_dir)
+    archive_dir = Path(archive_dir) if archive_dir else json_dir / ARCHIVE_DIRNAME
+    huellas = {}
+    for entry in latest_index_entries(archive_dir) if archive_dir.exists() else []:
+        clave = (entry["origen"], entry["destino"], entry["date_str"])
+        huellas["archivo:" + "|".join(clave)] = {
+            "clave": clave, "mtime": None, "size": entry["length"],
+            "content_hash": entry["content_hash"], "path": None,
+        }
+    archivadas = {huella["clave"] for huella in huellas.values()}
+    for path in json_dir.glob("redbus_*.json"):
+        clave = clave_json_redbus(path)
+        if clave not in archivadas:
+            huellas["json:" + path.name] = _huella_archivo(path, clave)
+    return huellas
+
+
+def fuentes_entrada(paths):
+    """Huellas de entradas que afectan a todas las filas (por ejemplo, el clima y las imágenes)."""
+    return {"entrada:" + Path(path).name: _huella_archivo(path) for path in paths if Path(path).exists()}
+
+
+def _crear_tabla_estado(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {ESTADO_TABLE} (
+        fuente TEXT PRIMARY KEY,
+        origen TEXT,
+        destino TEXT,
+        date_str TEXT,
+        mtime REAL,
+        size INTEGER,
+        content_hash TEXT,
+        actualizado_en TEXT
+    )
+    """)
+
+
+def leer_estado(db_path):
+    """Huellas guardadas en la última ejecución: fuente -> huella ({} si no hay estado)."""
+    if not Path(db_path).exists():
+        return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        _crear_tabla_estado(conn)
+        rows = conn.execute(
+            f"SELECT fuente, origen, destino, date_str, mtime, size, content_hash FROM {ESTADO_TABLE}"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        fuente: {"clave": (o, d, f) if o else None, "mtime": mtime, "size": size, "content_hash": content_hash}
+        for fuente, o, d, f, mtime, size, content_hash in rows
+    }
+
+
+def _sin_cambios(huella, anterior):
+    """
+    Compara una huella con la guardada. Para archivos, si mtime y tamaño coinciden no se
+    lee el contenido; si no, se hashea y se compara el hash (un `touch` no cuenta como cambio).
+    """
+    if anterior is None:
+        if huella["path"]:
+            huella["content_hash"] = hash_archivo(huella["path"])
+        return False
+    if huella["path"] is None:
+        return huella["content_hash"] == anterior["content_hash"]
+    if huella["mtime"] == anterior["mtime"] and huella["size"] == anterior["size"]:
+        huella["content_hash"] = anterior["content_hash"]
+        return True
+    huella["content_hash"] = hash_archivo(huella["path"])
+    return huella["content_hash"] == anterior["content_hash"]
+
+
+def planificar_etl(db_path, fuentes, entradas=None, completo=False):
+    """
+    Compara las huellas actuales con las guardadas y decide qué recargar.
+    La carga es completa si se pide, si no hay estado previo o si cambió alguna `entradas`.
+    """
+    entradas = entradas or {}
+    estado = leer_estado(db_path)
+    plan = PlanEtl(completo=completo, motivo="pedido" if completo else "", huellas={**fuentes, **entradas})
+
+    if not completo and not estado:
+        plan.completo, plan.motivo = True, "sin ejecución anterior"
+    for fuente, huella in entradas.items():
+        if not _sin_cambios(huella, estado.get(fuente)) and not plan.completo:
+            plan.completo, plan.motivo = True, f"cambió {fuente.split(':', 1)[1]}"
+
+    for fuente, huella in fuentes.items():
+        if _sin_cambios(huella, estado.get(fuente)):
+            plan.sin_cambios += 1
+        else:
+            plan.cambiadas[fuente] = huella
+    plan.eliminadas = {
+        fuente: anterior for fuente, anterior in estado.items()
+        if fuente not in plan.huellas and not fuente.startswith("entrada:")
+    }
+
+    if plan.completo:
+        logging.info(f"🔄 ETL completo ({plan.motivo}): {len(fuentes)} fuentes de RedBus.")
+    else:
+        logging.info(
+            f"🔄 ETL incremental: {len(plan.cambiadas)} fuentes nuevas o cambiadas, "
+            f"{len(plan.eliminadas)} eliminadas y {plan.sin_cambios} sin cambios."
+        )
+    return plan
+
+
+def guardar_estado(db_path, plan):
+    """Guarda las huellas actuales tras una carga correcta y olvida las fuentes eliminadas."""
+    now = datetime.now(timezone.utc).isoformat()
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            _crear_tabla_estado(conn)
+            if plan.completo:
+                conn.execute(f"DELETE FROM {ESTADO_TABLE}")
+            else:
+                conn.executemany(f"DELETE FROM {ESTADO_TABLE} WHERE fuente = ?", [(f,) for f in plan.eliminadas])
+            conn.executemany(
+                f"""
+                INSERT INTO {ESTADO_TABLE} (fuente, origen, destino, date_str, mtime, size, content_hash, actualizado_en)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fuente) DO UPDATE SET
+                    mtime = excluded.mtime, size = excluded.size,
+                    content_hash = excluded.content_hash, actualizado_en = excluded.actualizado_en
+                """,
+                [
+                    (fuente, *(huella["clave"] or (None, None, None)), huella["mtime"], huella["size"],
+                     huella["content_hash"], now)
+                    for fuente, huella in plan.huellas.items()
+                ],
+            )
+    finally:
+        conn.close()
@@ -2,95 +2,211 @@
 import sqlite3           # Para interactuar con bases de datos SQLite
 import pandas as pd      # Para manipulación de datos tabulares
 from pathlib import Path # Para manejo de rutas de archivos
-import json              # Para leer y escribir archivos JSON
 import logging           # Para registrar mensajes de log
 
+from backend.scraping.redbus.archive import latest_index_entries  # Índice del archivo de segmentos
+from backend.scraping.redbus.config import ARCHIVE_DIRNAME, DEFAULT_ORIGIN
+from backend.database.bulk_loader import (
+    VIAJES_TABLE_COLUMNS, VIAJES_TABLE_KEY, agrupar_viajes, carga_masiva, filas_tipadas, normalizar, numero_de_dia
+)
+from backend.database.redbus_parser import VIAJE_COLUMNS, parse_parallel  # Parseo en paralelo, por columnas con tipo
+
 # Configura el sistema de logging para mostrar mensajes informativos con timestamp
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
-def cargar_json_desde_archivo(ruta_archivo):
+def clave_json_redbus(file_path):
+    """
+    (origen, destino, fecha) de un JSON suelto: redbus_<destino>_<fecha>.json
+    (origen por defecto) o redbus_<origen>_<destino>_<fecha>.json.
     """
-    Carga datos desde un archivo JSON, manejando errores comunes como archivo vacío,
-    archivo no encontrado o errores de decodificación.
-    Devuelve el contenido como diccionario o None si hay error.
+    parts = file_path.stem.split("_")[1:]
+    if len(parts) == 2:
+        parts = [DEFAULT_ORIGIN] + parts
+    return tuple(parts)
+
+
+def leer_cache_viajes(cache_path):
     """
+    Lee la caché de viajes ya parseados (Parquet con la columna `content_hash`).
+    Devuelve un DataFrame vacío si no existe o no se puede leer.
+    """
+    if cache_path is None or not Path(cache_path).exists():
+        return pd.DataFrame()
     try:
-        with open(ruta_archivo, "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content:
-                logging.warning(f"Archivo JSON está vacío, saltando: {ruta_archivo}")
-                return None
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError, Exception) as e:
-        logging.error(f"Error cargando {ruta_archivo}: {e}")
-        return None
-
-def process_redbus_data(json_dir: Path):
+        return pd.read_parquet(cache_path)
+    except Exception as e:
+        logging.warning(f"No se pudo leer la caché de viajes {cache_path}, se reconstruirá: {e}")
+        return pd.DataFrame()
+
+
+def process_redbus_data(json_dir: Path, archive_dir: Path = None, cache_path: Path = None, workers: int = None,
+                        claves=None):
     """
-    Lee todos los archivos JSON de RedBus en el directorio especificado,
-    procesa los datos de viajes y los devuelve como un DataFrame de pandas.
+    Lee los datos crudos de RedBus y devuelve los viajes como un DataFrame de pandas.
+    - Si existe el archivo de segmentos (`<json_dir>/archive`), toma de él la descarga
+      más reciente de cada ruta-fecha, leyendo solo esos registros.
+    - Con `cache_path`, los registros cuyo hash de contenido ya se parseó en una
+      ejecución anterior se toman de la caché sin descomprimirlos ni parsearlos.
+    - Los archivos JSON sueltos se procesan para las rutas-fecha que no estén en el archivo.
+    - El parseo se reparte entre `workers` procesos (por defecto, uno por núcleo).
+    - Con `claves` (conjunto de (origen, destino, fecha 'DD-MMM-YYYY')), solo se leen esas
+      rutas-fecha; lo usa el ETL incremental para re-parsear solo lo que cambió.
     Realiza verificaciones de robustez para evitar errores por datos faltantes o mal formateados.
     """
-    all_trips = []  # Lista para almacenar todos los viajes procesados
-    json_files = list(json_dir.glob("*.json"))  # Busca todos los archivos JSON en el directorio
-    
-    if not json_files:
+    archive_dir = Path(archive_dir) if archive_dir else json_dir / ARCHIVE_DIRNAME
+    all_entries = latest_index_entries(archive_dir) if archive_dir.exists() else []
+    archived_keys = {(entry["origen"], entry["destino"], entry["date_str"]) for entry in all_entries}
+    entries = all_entries if claves is None else [
+        entry for entry in all_entries if (entry["origen"], entry["destino"], entry["date_str"]) in claves
+    ]
+
+    # 1. Registros del archivo de segmentos: cada hash de contenido se parsea una sola vez
+    cache = leer_cache_viajes(cache_path)
+    cached_hashes = set(cache["content_hash"]) if not cache.empty else set()
+    new_entries = {}
+    for entry in entries:
+        if entry["content_hash"] not in cached_hashes:
+            new_entries.setdefault(entry["content_hash"], entry)
+    if entries:
+        logging.info(
+            f"Archivo de RedBus: {len(entries)} registros, {len(entries) - len(new_entries)} "
+            f"sin cambios o repetidos (desde la caché) y {len(new_entries)} por parsear."
+        )
+
+    # 2. JSON sueltos (formato anterior) que no estén ya en el archivo
+    json_files = [
+        file_path for file_path in json_dir.glob("redbus_*.json")
+        if clave_json_redbus(file_path) not in archived_keys
+        and (claves is None or clave_json_redbus(file_path) in claves)
+    ]
+
+    if claves is not None and not json_files and not entries:
+        return pd.DataFrame(columns=VIAJE_COLUMNS)  # Solo hubo rutas-fecha eliminadas
+    if not json_files and not entries:
         logging.warning(f"No se encontraron archivos JSON en {json_dir}")
         return pd.DataFrame()  # Retorna DataFrame vacío si no hay archivos
 
-    logging.info(f"Procesando {len(json_files)} archivos JSON de RedBus...")
-    
-    for file_path in json_files:
-        data = cargar_json_desde_archivo(file_path)
-
-        # Verifica que el archivo tenga datos válidos y una lista de inventarios
-        if not data or not isinstance(data.get("inventories"), list):
-            logging.warning(f"Archivo JSON inválido o sin inventario, saltando: {file_path.name}")
-            continue
-        
-        # Obtiene las ciudades de origen y destino del viaje
-        origen = data.get("parentSrcCityName")
-        destino = data.get("parentDstCityName")
-        
-        # Procesa cada viaje en el inventario
-        for viaje in data.get("inventories", []):
-            fare_list = viaje.get("fareList", [])
-            # Filtra precios válidos (números) y obtiene el mínimo
-            precios_validos = [p for p in fare_list if isinstance(p, (int, float))]
-            precio_min = min(precios_validos) if precios_validos else None
-
-            # Agrega los datos relevantes del viaje a la lista
-            all_trips.append({
-                'origen': origen,
-                'destino': destino,
-                'fecha_viaje': viaje.get("departureTime", " ").split(" ")[0], # Solo la fecha
-                'empresa': viaje.get("travelsName"),
-                'precio_min': precio_min,
-                'asientos_disponibles': viaje.get("availableSeats"),
-                'rating_empresa': viaje.get("totalRatings")
-            })
-            
-    return pd.DataFrame(all_trips)  # Convierte la lista de viajes en un DataFrame
-
-
-def load_combined_data_to_db(db_path: str, combined_df: pd.DataFrame):
+    if json_files:
+        logging.info(f"Procesando {len(json_files)} archivos JSON de RedBus...")
+
+    # Registros nuevos del archivo y JSON sueltos se parsean juntos, repartidos entre procesos
+    viajes_json, viajes_archivo = parse_parallel(
+        json_files, archive_dir, list(new_entries.values()), workers=workers
+    )
+    archive_trips = viajes_archivo.to_frame() if len(viajes_archivo) else pd.DataFrame()
+
+    # La caché guarda los viajes una vez por hash, solo de los hashes vigentes
+    current_hashes = [entry["content_hash"] for entry in entries]
+    if not cache.empty:
+        cache = cache[cache["content_hash"].isin({entry["content_hash"] for entry in all_entries})]
+    parsed = pd.concat([cache, archive_trips], ignore_index=True)
+    if cache_path is not None and not parsed.empty:
+        parsed.to_parquet(cache_path, index=False)
+
+    # merge para repetir los viajes de cada registro que comparte hash con otro
+    df_archivo = (
+        pd.DataFrame({"content_hash": current_hashes}).merge(parsed, on="content_hash")
+        if not parsed.empty else pd.DataFrame()
+    )
+
+    df_json = viajes_json.to_frame()  # Con las columnas de siempre aunque no haya viajes
+    if df_archivo.empty:
+        return df_json
+    return pd.concat([df_archivo.drop(columns="content_hash"), df_json], ignore_index=True)
+
+
+def upsert_viajes(conn, df: pd.DataFrame, claves_afectadas=None):
     """
-    Carga el DataFrame combinado final en la base de datos SQLite especificada por db_path.
-    Si el DataFrame está vacío, no realiza ninguna acción.
-    Utiliza el método to_sql de pandas para insertar los datos en la tabla 'viajes_combinados'.
+    Inserta o actualiza los viajes con INSERT ... ON CONFLICT sobre la clave única de la
+    tabla `viajes`, sin tocar el esquema. Con `claves_afectadas`
+    ({(origen, destino, 'YYYY-MM-DD')}), además borra las filas de esas rutas-fecha
+    que ya no vienen en `df` (viajes que desaparecieron). No hace commit.
+    Devuelve (filas escritas, filas borradas).
     """
-    if combined_df.empty:
+    viajes = agrupar_viajes(normalizar(conn, df))
+    placeholders = ", ".join("?" for _ in VIAJES_TABLE_COLUMNS)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in VIAJES_TABLE_COLUMNS if c not in VIAJES_TABLE_KEY)
+    borradas = 0
+
+    if claves_afectadas:
+        # Rutas-fecha a ids y número de día; las de destinos desconocidos no tienen filas
+        destinos = dict(conn.execute("SELECT nombre, id FROM destinos"))
+        claves = pd.DataFrame(sorted(claves_afectadas), columns=["origen", "destino", "fecha_viaje"])
+        claves = pd.DataFrame({
+            "origen_id": claves["origen"].map(destinos).astype("Int32"),
+            "destino_id": claves["destino"].map(destinos).astype("Int32"),
+            "fecha": numero_de_dia(claves["fecha_viaje"]).array,
+        }).dropna()
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _claves_afectadas (origen_id INTEGER, destino_id INTEGER, fecha INTEGER)")
+        conn.execute("DELETE FROM _claves_afectadas")
+        conn.executemany("INSERT INTO _claves_afectadas VALUES (?, ?, ?)", filas_tipadas(claves, list(claves.columns)))
+        # Las filas con algún NULL en la clave no chocan con ON CONFLICT: se reemplazan
+        borradas += conn.execute("""
+            DELETE FROM viajes
+            WHERE (empresa_id IS NULL OR precio_min IS NULL)
+              AND (origen_id, destino_id, fecha) IN (SELECT origen_id, destino_id, fecha FROM _claves_afectadas)
+        """).rowcount
+
+    conn.executemany(
+        f"""
+        INSERT INTO viajes ({", ".join(VIAJES_TABLE_COLUMNS)}) VALUES ({placeholders})
+        ON CONFLICT({", ".join(VIAJES_TABLE_KEY)}) DO UPDATE SET {updates}
+        """,
+        filas_tipadas(viajes, VIAJES_TABLE_COLUMNS),
+    )
+
+    if claves_afectadas:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS _claves_nuevas
+            (origen_id INTEGER, destino_id INTEGER, fecha INTEGER, empresa_id INTEGER, precio_min REAL)
+        """)
+        conn.execute("DELETE FROM _claves_nuevas")
+        conn.executemany("INSERT INTO _claves_nuevas VALUES (?, ?, ?, ?, ?)", filas_tipadas(viajes, VIAJES_TABLE_KEY))
+        borradas += conn.execute("""
+            DELETE FROM viajes
+            WHERE (origen_id, destino_id, fecha) IN (SELECT origen_id, destino_id, fecha FROM _claves_afectadas)
+              AND NOT EXISTS (
+                  SELECT 1 FROM _claves_nuevas n
+                  WHERE n.origen_id = viajes.origen_id AND n.destino_id = viajes.destino_id
+                    AND n.fecha = viajes.fecha AND n.empresa_id = viajes.empresa_id
+                    AND n.precio_min = viajes.precio_min
+              )
+        """).rowcount
+    return len(viajes), borradas
+
+
+def load_combined_data_to_db(db_path: str, combined_df: pd.DataFrame, claves_afectadas=None):
+    """
+    Carga el DataFrame combinado final en las tablas creadas por schema.py (`viajes` y sus
+    dimensiones; se leen con la vista 'viajes_combinados'), en una sola transacción.
+    - Sin `claves_afectadas`: carga completa con `carga_masiva` (bulk_loader.py).
+    - Con `claves_afectadas`: carga incremental, solo se tocan las filas de esas rutas-fecha.
+    Devuelve True si la carga terminó bien.
+    """
+    if combined_df.empty and not claves_afectadas:
         logging.warning("El DataFrame combinado está vacío. No se cargará nada a la base de datos.")
-        return
+        return False
+
+    modo = "incremental" if claves_afectadas else "completa"
+    logging.info(f"Cargando {len(combined_df)} registros en la base de datos (carga {modo})...")
+
+    if not claves_afectadas:
+        try:
+            carga_masiva(db_path, combined_df)
+            logging.info("¡Carga completada exitosamente!")
+            return True
+        except Exception as e:
+            logging.error(f"Error al cargar datos a la base de datos: {e}")
+            return False
 
-    logging.info(f"Cargando {len(combined_df)} registros en la base de datos...")
-    
     conn = sqlite3.connect(db_path)  # Abre conexión a la base de datos
     try:
-        # Inserta el DataFrame en la tabla 'viajes_combinados', reemplazando si ya existe
-        combined_df.to_sql('viajes_combinados', conn, if_exists='replace', index=False)
-        logging.info("¡Carga completada exitosamente!")
+        with conn:  # Una sola transacción: o se carga todo o no cambia nada
+            escritas, borradas = upsert_viajes(conn, combined_df, claves_afectadas)
+        logging.info(f"¡Carga completada exitosamente! {escritas} filas escritas y {borradas} borradas.")
+        return True
     except Exception as e:
         logging.error(f"Error al cargar datos a la base de datos: {e}")
+        return False
     finally:
-        conn.close()  # Cierra la conexión a la base de
\ No newline at end of file
+        conn.close()  # Cierra la conexión a la base de datos
@@ -0,0 +1,187 @@
+# backend/database/publicacion.py
+"""
+Publicación atómica de la base de datos.
+- El ETL nunca escribe en la base de datos publicada: trabaja sobre una copia nueva
+  (`versiones/viajes_grupales_<versión>.db.tmp`), hecha con la API de backup de SQLite
+- Antes de publicar se registra la versión en la tabla `data_version` y se comprueba la
+  copia (integrity_check, claves foráneas, filas de la vista)
+- Publicar es un `os.replace` de la ruta "actual" (`viajes_grupales.db`): quien ya
+  tenía abierta la versión anterior la sigue leyendo entera; quien abre después, ve la nueva
+- Cada versión lleva su exportación Arrow (`versiones/viajes_grupales_<versión>.arrow`, ver
+  exportacion.py), escrita antes de publicar la base de datos: quien lee la versión de
+  `data_version` encuentra siempre su .arrow
+- Se conservan las últimas versiones en `versiones/` para poder volver atrás
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backend.database.exportacion import exportar_arrow
+
+VERSIONES_DIRNAME = "versiones"
+VERSIONES_A_CONSERVAR = 3
+VERSION_TABLE = "data_version"
+REINTENTOS_PUBLICACION = 5   # En Windows, os.replace falla si un lector tiene el archivo abierto
+
+
+class VersionInvalida(Exception):
+    """La versión construida no pasó las comprobaciones y no se publicó."""
+
+
+def versiones_dir(db_path):
+    return Path(db_path).parent / VERSIONES_DIRNAME
+
+
+def ruta_arrow(db_path, version):
+    """Exportación Arrow de la versión `version` de `db_path`."""
+    return versiones_dir(db_path) / f"{Path(db_path).stem}_{version}.arrow"
+
+
+def nueva_version(db_path):
+    """
+    Prepara el archivo de trabajo de una versión nueva: una copia consistente de la
+    base de datos publicada (vacío si aún no hay ninguna). Devuelve (versión, ruta).
+    """
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    destino = versiones_dir(db_path) / f"{Path(db_path).stem}_{version}.db.tmp"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    if Path(db_path).exists():
+        origen = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+        copia = sqlite3.connect(destino)
+        try:
+            origen.backup(copia)
+        finally:
+            copia.close()
+            origen.close()
+    logging.info(f"🧱 Construyendo la versión {version} en {destino.name}")
+    return version, destino
+
+
+def descartar_version(build_path):
+    for path in (Path(build_path), Path(f"{build_path}-wal"), Path(f"{build_path}-shm")):
+        path.unlink(missing_ok=True)
+
+
+def hash_fuentes(huellas):
+    """Hash de todas las fuentes de la versión (fuente y hash de su contenido, en orden)."""
+    digest = hashlib.sha256()
+    for fuente in sorted(huellas):
+        digest.update(f"{fuente}={huellas[fuente]['content_hash']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _contar(conn, tabla):
+    return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+
+
+def registrar_version(conn, version, modo, huellas):
+    """Añade la fila de la versión a `data_version` (hora, filas por tabla y hash de las fuentes)."""
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        version TEXT PRIMARY KEY,
+        construida_en TEXT,
+        modo TEXT,
+        filas_viajes INTEGER,
+        filas_destinos INTEGER,
+        filas_empresas INTEGER,
+        fuentes INTEGER,
+        hash_fuentes TEXT
+    )
+    """)
+    conn.execute(
+        f"INSERT INTO {VERSION_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (version, datetime.now(timezone.utc).isoformat(), modo, _contar(conn, "viajes"),
+         _contar(conn, "destinos"), _contar(conn, "empresas"), len(huellas), hash_fuentes(huellas)),
+    )
+
+
+def comprobar_version(conn):
+    """Lanza VersionInvalida si la base de datos construida no se puede publicar."""
+    integridad = conn.execute("PRAGMA integrity_check").fetchall()
+    if integridad != [("ok",)]:
+        raise VersionInvalida(f"integrity_check: {integridad[:5]}")
+    huerfanas = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if huerfanas:
+        raise VersionInvalida(f"{len(huerfanas)} filas con claves foráneas rotas")
+    viajes = _contar(conn, "viajes")
+    if viajes == 0:
+        raise VersionInvalida("la tabla 'viajes' está vacía")
+    if _contar(conn, "viajes_combinados") != viajes:
+        raise VersionInvalida("la vista 'viajes_combinados' no devuelve todos los viajes")
+
+
+def _reemplazar(origen, destino):
+    for intento in range(1, REINTENTOS_PUBLICACION + 1):
+        try:
+            os.replace(origen, destino)
+            return
+        except PermissionError:
+            if intento == REINTENTOS_PUBLICACION:
+                raise
+            time.sleep(0.2 * intento)
+
+
+def _podar(db_path, conservar=VERSIONES_A_CONSERVAR):
+    for extension in ("db", "arrow"):
+        publicadas = sorted(versiones_dir(db_path).glob(f"{Path(db_path).stem}_*.{extension}"))
+        for path in publicadas[:-conservar]:
+            try:
+                path.unlink(missing_ok=True)
+            except PermissionError:  # Windows: un frontend aún tiene abierta esa versión
+                logging.warning(f"No se pudo borrar {path.name}; se reintentará en la próxima publicación.")
+
+
+def publicar(build_path, db_path, version, modo, huellas):
+    """
+    Registra la versión, la comprueba, la exporta a Arrow y, si todo está bien, la publica
+    en `db_path` de forma atómica. Si algo falla se descarta y `db_path` no cambia.
+    Devuelve la ruta de la versión publicada.
+    """
+    build_path, db_path = Path(build_path), Path(db_path)
+    conn = sqlite3.connect(build_path)
+    try:
+        with conn:
+            registrar_version(conn, version, modo, huellas)
+        # Sin WAL: un -wal que quedara junto a la ruta publicada no correspondería al archivo nuevo
+        conn.execute("PRAGMA journal_mode = DELETE")
+        comprobar_version(conn)
+        exportar_arrow(conn, ruta_arrow(db_path, version), version)
+    except BaseException:
+        conn.close()
+        descartar_version(build_path)
+        raise
+    conn.close()
+
+    publicada = build_path.with_suffix("")  # viajes_grupales_<versión>.db
+    os.replace(build_path, publicada)
+    # La ruta actual pasa a ser otro nombre del archivo de la versión (o una copia)
+    tmp_path = db_path.with_name(f".{db_path.name}.{version}.tmp")
+    try:
+        os.link(publicada, tmp_path)
+    except OSError:
+        shutil.copy2(publicada, tmp_path)
+    _reemplazar(tmp_path, db_path)
+    _podar(db_path)
+    logging.info(f"📦 Versión {version} publicada en {db_path}")
+    return publicada
+
+
+def version_publicada(db_path):
+    """Versión de la base de datos publicada según `data_version`; None si no hay."""
+    try:
+        conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+        try:
+            fila = conn.execute(
+                f"SELECT version FROM {VERSION_TABLE} ORDER BY construida_en DESC LIMIT 1"
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return fila[0] if fila else None
@@ -0,0 +1,374 @@
+# backend/database/redbus_parser.py
+"""
+Parseo en paralelo de las respuestas crudas de RedBus para el ETL.
+- Usa orjson si está instalado (varias veces más rápido que json) y, si no, json
+- De cada inventario solo se leen los 5 campos que usa el ETL; el resto del documento
+  no se convierte en filas ni se copia
+- Los archivos y registros se reparten en lotes entre procesos; cada proceso devuelve
+  columnas (`ColumnarTrips`: arrays con tipo fijo y textos como códigos), no un diccionario por viaje
+
+Uso (benchmark con un corpus sintético):
+    python -m backend.database.redbus_parser --benchmark 1000000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backend.scraping.redbus.archive import read_records
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # orjson es opcional
+    loads = json.loads
+
+NAN = float("nan")
+
+VIAJE_COLUMNS = ["origen", "destino", "fecha_viaje", "empresa", "precio_min", "asientos_disponibles", "rating_empresa"]
+MIN_TASKS_PER_PROCESS = 32   # Por debajo de esto no vale la pena arrancar procesos
+BATCH_SIZE = 64              # Archivos o registros por lote enviado a un proceso
+
+
+class _Interned:
+    """Códigos enteros para una columna de texto con pocos valores distintos (None = -1)."""
+
+    def __init__(self):
+        self.codes = array("i")
+        self.values = []
+        self._index = {}
+
+    def _code(self, value):
+        if value is None:
+            return -1
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self._code(value))
+
+    def repeat(self, value, n):
+        self.codes.extend(array("i", [self._code(value)]) * n)
+
+    def extend(self, other):
+        """Añade los valores de otra columna, traduciendo sus códigos a los de esta."""
+        # El último elemento traduce el -1 (None) a sí mismo
+        remap = np.array([self._code(value) for value in other.values] + [-1], dtype=np.int32)
+        self.codes.frombytes(remap[np.frombuffer(other.codes, dtype=np.int32)].tobytes())
+
+    def categorical(self):
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32), categories=self.values)
+
+    def strings(self):
+        """Columna de texto que reutiliza un único objeto str por valor distinto."""
+        values = np.array(self.values + [None], dtype=object)
+        return values[np.frombuffer(self.codes, dtype=np.int32)]
+
+
+def _a_float(value):
+    """Número (también "4.1" como texto) -> float; cualquier otra cosa -> NaN."""
+    if value is None or isinstance(value, bool):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _a_entero(value):
+    """Entero que cabe en int32 (también 3.0 o "3") -> int; cualquier otra cosa -> None (nulo)."""
+    numero = _a_float(value)
+    if numero != numero or not numero.is_integer() or not -2**31 <= numero < 2**31:
+        return None
+    return int(numero)
+
+
+def _a_texto(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+class ColumnarTrips:
+    """
+    Acumulador de viajes por columnas, con tipos fijos desde el principio:
+    - origen, destino, empresa (y `content_hash`): códigos enteros -> `category`
+    - fecha_viaje: códigos enteros -> texto con un objeto str por fecha distinta
+    - precio_min, rating_empresa: array de float64 (NaN si falta)
+    - asientos_disponibles: array de int32 más máscara de nulos -> `Int32`
+    No crea un diccionario ni objetos Python por viaje, y se envía entre procesos como bytes.
+    """
+
+    def __init__(self, with_hash=False):
+        self.origen = _Interned()
+        self.destino = _Interned()
+        self.empresa = _Interned()
+        self.fecha_viaje = _Interned()
+        self.content_hash = _Interned() if with_hash else None
+        self.precio_min = array("d")
+        self.rating_empresa = array("d")
+        self.asientos = array("i")
+        self.asientos_nulos = bytearray()
+
+    def __len__(self):
+        return len(self.precio_min)
+
+    def add(self, data, content_hash=None):
+        """
+        Añade los viajes de una respuesta de RedBus (dict) y devuelve cuántos añadió.
+        Misma lógica que el ETL original: fecha sin hora y precio mínimo entre las tarifas numéricas.
+        Cada campo se convierte antes de añadir nada: un rating que no es número queda en
+        NaN y unos asientos que no son un entero, nulos. Así un valor raro no corta el ETL
+        ni deja columnas de distinto largo.
+        """
+        n_viajes = 0
+        for viaje in data.get("inventories") or []:
+            if not isinstance(viaje, dict):
+                continue
+            precios_validos = [p for p in viaje.get("fareList") or [] if isinstance(p, (int, float))]
+            precio = float(min(precios_validos)) if precios_validos else NAN
+            salida = viaje.get("departureTime", " ")
+            fecha = salida.split(" ")[0] if isinstance(salida, str) else None
+            empresa = _a_texto(viaje.get("travelsName"))
+            rating = _a_float(viaje.get("totalRatings"))
+            asientos = _a_entero(viaje.get("availableSeats"))
+
+            self.precio_min.append(precio)
+            self.fecha_viaje.append(fecha)
+            self.empresa.append(empresa)
+            self.rating_empresa.append(rating)
+            self.asientos.append(0 if asientos is None else asientos)
+            self.asientos_nulos.append(asientos is None)
+            n_viajes += 1
+        self.origen.repeat(_a_texto(data.get("parentSrcCityName")), n_viajes)
+        self.destino.repeat(_a_texto(data.get("parentDstCityName")), n_viajes)
+        if self.content_hash is not None:
+            self.content_hash.repeat(content_hash, n_viajes)
+        return n_viajes
+
+    def extend(self, other):
+        """Añade todos los viajes de otro acumulador (por ejemplo, el de un proceso hijo)."""
+        for name in ("origen", "destino", "empresa", "fecha_viaje"):
+            getattr(self, name).extend(getattr(other, name))
+        if self.content_hash is not None:
+            self.content_hash.extend(other.content_hash)
+        self.precio_min.extend(other.precio_min)
+        self.rating_empresa.extend(other.rating_empresa)
+        self.asientos.extend(other.asientos)
+        self.asientos_nulos.extend(other.asientos_nulos)
+
+    def to_frame(self):
+        """DataFrame con tipos explícitos (ver la docstring de la clase)."""
+        columns = {
+            "origen": self.origen.categorical(),
+            "destino": self.destino.categorical(),
+            "fecha_viaje": self.fecha_viaje.strings(),
+            "empresa": self.empresa.categorical(),
+            "precio_min": np.frombuffer(self.precio_min, dtype=np.float64).copy(),
+            "asientos_disponibles": pd.arrays.IntegerArray(
+                np.frombuffer(self.asientos, dtype=np.int32).copy(),
+                np.frombuffer(bytes(self.asientos_nulos), dtype=np.bool_).copy(),
+            ),
+            "rating_empresa": np.frombuffer(self.rating_empresa, dtype=np.float64).copy(),
+        }
+        if self.content_hash is not None:
+            columns["content_hash"] = self.content_hash.categorical()
+        return pd.DataFrame(columns)
+
+
+def _con_inventario(data):
+    return isinstance(data, dict) and isinstance(data.get("inventories"), list)
+
+
+def parsear_archivos(paths):
+    """Parsea un lote de JSON sueltos. Devuelve (ColumnarTrips, avisos)."""
+    viajes, avisos = ColumnarTrips(), []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            if not content:
+                avisos.append(f"Archivo JSON está vacío, saltando: {path}")
+                continue
+            data = loads(content)
+        except (OSError, ValueError) as e:
+            avisos.append(f"Error cargando {path}: {e}")
+            continue
+        if not _con_inventario(data):
+            avisos.append(f"Archivo JSON inválido o sin inventario, saltando: {os.path.basename(path)}")
+            continue
+        viajes.add(data)
+    return viajes, avisos
+
+
+def parsear_registros(archive_dir, entries):
+    """
+    Parsea un lote de registros del archivo de segmentos. Cada viaje lleva el
+    `content_hash` de su registro. Devuelve (ColumnarTrips, avisos).
+    """
+    viajes, avisos = ColumnarTrips(with_hash=True), []
+    for entry, data in read_records(archive_dir, entries):
+        if not _con_inventario(data):
+            avisos.append(f"Registro sin inventario, saltando: {entry['destino']} {entry['date_str']}")
+            continue
+        viajes.add(data, entry["content_hash"])
+    return viajes, avisos
+
+
+def _lotes(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _unir(partes, with_hash=False):
+    viajes = ColumnarTrips(with_hash)
+    for parte, avisos in partes:
+        for aviso in avisos:
+            logging.warning(aviso)
+        viajes.extend(parte)
+    return viajes
+
+
+def parse_parallel(json_paths=(), archive_dir=None, entries=(), workers=None):
+    """
+    Parsea JSON sueltos y registros del archivo y devuelve dos ColumnarTrips:
+    (viajes de los JSON, viajes del archivo con `content_hash`).
+    Con pocas tareas, o `workers=1`, se parsea en este mismo proceso.
+    """
+    workers = workers or os.cpu_count() or 1
+    json_paths = [str(path) for path in json_paths]
+    # Los registros de un mismo segmento van juntos: cada lote abre su segmento una vez
+    entries = sorted(entries, key=lambda e: (e["segment"], e["offset"]))
+    total = len(json_paths) + len(entries)
+
+    if workers == 1 or total < MIN_TASKS_PER_PROCESS:
+        partes_json = [parsear_archivos(json_paths)]
+        partes_archivo = [parsear_registros(archive_dir, entries)] if entries else []
+    else:
+        workers = min(workers, max(1, total // MIN_TASKS_PER_PROCESS))
+        logging.info(f"⚙️ Parseando {total} respuestas de RedBus en {workers} procesos...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros_json = [pool.submit(parsear_archivos, lote) for lote in _lotes(json_paths, BATCH_SIZE)]
+            futuros_archivo = [pool.submit(parsear_registros, archive_dir, lote)
+                               for lote in _lotes(entries, BATCH_SIZE)]
+            partes_json = [futuro.result() for futuro in futuros_json]
+            partes_archivo = [futuro.result() for futuro in futuros_archivo]
+
+    return _unir(partes_json), _unir(partes_archivo, with_hash=True)
+
+
+def _documentos_sinteticos(trips, per_document=40, seed=0):
+    """Respuestas de RedBus sintéticas (solo los campos que usa el ETL) con `trips` viajes en total."""
+    rng = random.Random(seed)
+    destinos = ["Arequipa", "Trujillo", "Cusco", "Piura", "Huancayo", "Huaraz", "Ica", "Tacna"]
+    empresas = [f"Empresa {i}" for i in range(60)]
+    documentos = []
+    for start in range(0, trips, per_document):
+        fecha = f"2025-07-{rng.randint(1, 31):02d}"
+        documentos.append({
+            "parentSrcCityName": "Lima",
+            "parentDstCityName": rng.choice(destinos),
+            "inventories": [
+                {
+                    "departureTime": f"{fecha} {rng.randint(0, 23):02d}:00:00",
+                    "travelsName": rng.choice(empresas),
+                    "fareList": [round(rng.uniform(30, 250), 2) for _ in range(rng.randint(1, 3))],
+                    "availableSeats": rng.randint(0, 50),
+                    "totalRatings": round(rng.uniform(1, 5), 1),
+                }
+                for _ in range(min(per_document, trips - start))
+            ],
+        })
+    return documentos
+
+
+def _extraer_viajes(data):
+    """
+    Versión anterior del parseo (solo para el benchmark): una respuesta de RedBus
+    (dict) -> lista de diccionarios, uno por viaje.
+    """
+    viajes = []
+    # Obtiene las ciudades de origen y destino del viaje
+    origen = data.get("parentSrcCityName")
+    destino = data.get("parentDstCityName")
+
+    # Procesa cada viaje en el inventario
+    for viaje in data.get("inventories", []):
+        fare_list = viaje.get("fareList", [])
+        # Filtra precios válidos (números) y obtiene el mínimo
+        precios_validos = [p for p in fare_list if isinstance(p, (int, float))]
+        precio_min = min(precios_validos) if precios_validos else None
+
+        # Agrega los datos relevantes del viaje a la lista
+        viajes.append({
+            'origen': origen,
+            'destino': destino,
+            'fecha_viaje': viaje.get("departureTime", " ").split(" ")[0], # Solo la fecha
+            'empresa': viaje.get("travelsName"),
+            'precio_min': precio_min,
+            'asientos_disponibles': viaje.get("availableSeats"),
+            'rating_empresa': viaje.get("totalRatings")
+        })
+    return viajes
+
+
+def _medir(construir):
+    """Tiempo (sin trazar) y pico de memoria (con tracemalloc) de construir el DataFrame."""
+    start = time.perf_counter()
+    df = construir()
+    elapsed = time.perf_counter() - start
+    del df
+    gc.collect()
+    tracemalloc.start()
+    df = construir()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, df
+
+
+def benchmark(trips=1_000_000):
+    """
+    Compara, sobre un corpus sintético de `trips` viajes ya decodificado, la construcción
+    del DataFrame con una lista de diccionarios (versión anterior) frente a ColumnarTrips.
+    """
+    documentos = _documentos_sinteticos(trips)
+    print(f"📊 Benchmark: {trips:,} viajes en {len(documentos):,} respuestas sintéticas")
+
+    def por_filas():
+        all_trips = []
+        for data in documentos:
+            all_trips.extend(_extraer_viajes(data))
+        return pd.DataFrame(all_trips)
+
+    def por_columnas():
+        viajes = ColumnarTrips()
+        for data in documentos:
+            viajes.add(data)
+        return viajes.to_frame()
+
+    for nombre, construir in (("🐢 Lista de diccionarios", por_filas), ("⚡ ColumnarTrips", por_columnas)):
+        elapsed, peak, df = _medir(construir)
+        print(f"{nombre}: {elapsed:.2f}s, pico {peak / 2**20:,.0f} MiB, "
+              f"DataFrame {df.memory_usage(deep=True).sum() / 2**20:,.0f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del parseo de RedBus por columnas")
+    parser.add_argument("--benchmark", type=int, metavar="VIAJES", default=1_000_000,
+                        help="Viajes del corpus sintético")
+    args = parser.parse_args(argv)
+    benchmark(args.benchmark)
+
+
+if __name__ == "__main__":
+    main()
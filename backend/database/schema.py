@@ -6,38 +6,116 @@ from pathlib import Path
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 
+# Esquema orientado a las consultas del frontend:
+# - `destinos` y `empresas`: tablas de dimensión con ids enteros pequeños; los textos
+#   (nombre, enlace de la imagen) se guardan una sola vez y no en cada viaje
+# - `viajes`: una fila por viaje, solo con números (ids, fecha como número de día) salvo
+#   `categoria_clima`; `fecha` = días desde 1970-01-01 (date(fecha * 86400, 'unixepoch'))
+# - `viajes_combinados`: vista con las columnas de siempre (textos y fecha 'YYYY-MM-DD'),
+#   para que quien lea la base de datos no tenga que hacer los JOIN
+FECHA_EPOCH = "1970-01-01"
+
+TABLAS = {
+    "destinos": """
+    CREATE TABLE IF NOT EXISTS destinos (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL UNIQUE,
+        url_imagen TEXT
+    )""",
+    "empresas": """
+    CREATE TABLE IF NOT EXISTS empresas (
+        id INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL UNIQUE
+    )""",
+    # Sin AUTOINCREMENT: nadie referencia el id de un viaje y así no se escribe
+    # sqlite_sequence en cada inserción
+    "viajes": """
+    CREATE TABLE IF NOT EXISTS viajes (
+        id INTEGER PRIMARY KEY,
+        origen_id INTEGER REFERENCES destinos (id),
+        destino_id INTEGER REFERENCES destinos (id),
+        fecha INTEGER,
+        empresa_id INTEGER REFERENCES empresas (id),
+        precio_min REAL,
+        asientos_disponibles INTEGER,
+        rating_empresa REAL,
+        temperatura_promedio REAL,
+        categoria_clima TEXT
+    )""",
+}
+
+VISTA_VIAJES_COMBINADOS = """
+CREATE VIEW IF NOT EXISTS viajes_combinados AS
+SELECT
+    v.id,
+    o.nombre AS origen,
+    d.nombre AS destino,
+    date(v.fecha * 86400, 'unixepoch') AS fecha_viaje,
+    e.nombre AS empresa,
+    v.precio_min,
+    v.asientos_disponibles,
+    v.rating_empresa,
+    v.temperatura_promedio,
+    v.categoria_clima,
+    d.url_imagen AS url_imagen_destino
+FROM viajes v
+LEFT JOIN destinos o ON o.id = v.origen_id
+LEFT JOIN destinos d ON d.id = v.destino_id
+LEFT JOIN empresas e ON e.id = v.empresa_id
+"""
+
+# Índices de `viajes`: la clave única (la que usan los upserts con ON CONFLICT) y los
+# que cubren las búsquedas del frontend (destino + rango de fechas + presupuesto, y
+# empresa + fechas), que se resuelven recorriendo un rango del índice. Son índices aparte,
+# no restricciones de la tabla, para que la carga masiva pueda borrarlos antes de
+# insertar y crearlos de una vez al final.
+CLAVE_UNICA = "ux_viajes_clave"
+INDICES_VIAJES = {
+    CLAVE_UNICA: "UNIQUE INDEX IF NOT EXISTS ux_viajes_clave ON viajes (origen_id, destino_id, fecha, empresa_id, precio_min)",
+    "idx_viajes_destino_fecha_precio": "INDEX IF NOT EXISTS idx_viajes_destino_fecha_precio ON viajes (destino_id, fecha, precio_min)",
+    "idx_viajes_empresa_fecha": "INDEX IF NOT EXISTS idx_viajes_empresa_fecha ON viajes (empresa_id, fecha)",
+}
+
+
+def crear_indices(conn):
+    for definicion in INDICES_VIAJES.values():
+        conn.execute(f"CREATE {definicion}")
+
+
+def borrar_indices(conn):
+    for nombre in INDICES_VIAJES:
+        conn.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
 def create_database(db_path="data/processed/viajes_grupales.db"):
     """
-    Crea la base de datos y la tabla final del proyecto con el esquema completo.
+    Crea la base de datos y las tablas finales del proyecto con el esquema completo.
     """
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    
+
+    conn = None
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
-        
-        # Tabla principal que combinará toda la información
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS viajes_combinados (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            origen TEXT,
-            destino TEXT,
-            fecha_viaje DATE,
-            empresa TEXT,
-            precio_min REAL,
-            asientos_disponibles INTEGER,
-            rating_empresa REAL,
-            temperatura_promedio REAL,
-            categoria_clima TEXT,
-            url_imagen_destino TEXT,
-
-            UNIQUE(origen, destino, fecha_viaje, empresa, precio_min)
-        );
-        """)
-        
+
+        # `viajes_combinados` era una tabla con textos en cada fila (esquemas anteriores):
+        # se reemplaza por la vista y el ETL hace una carga completa
+        anterior = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'viajes_combinados'"
+        ).fetchone()
+        if anterior:
+            logging.warning("La tabla 'viajes_combinados' usa el esquema anterior; se reemplaza por el esquema final.")
+            cursor.execute("DROP TABLE viajes_combinados")
+            cursor.execute("DROP TABLE IF EXISTS etl_fuentes")
+
+        for sql in TABLAS.values():
+            cursor.execute(sql)
+        cursor.execute(VISTA_VIAJES_COMBINADOS)
+        crear_indices(cursor)
+
         conn.commit()
-        logging.info(f"Base de datos '{db_path}' y tabla 'viajes_combinados' verificadas/creadas con el esquema final.")
+        logging.info(f"Base de datos '{db_path}' y tablas 'destinos', 'empresas' y 'viajes' verificadas/creadas con el esquema final.")
     except sqlite3.Error as e:
         logging.error(f"Error al crear la base de datos: {e}")
     finally:
@@ -45,4 +123,4 @@ def create_database(db_path="data/processed/viajes_grupales.db"):
             conn.close()
 
 if __name__ == "__main__":
-    create_database()
\ No newline at end of file
+    create_database()
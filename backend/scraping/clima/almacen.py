@@ -0,0 +1,77 @@
+# backend/scraping/clima/almacen.py
+"""
+Almacén columnar del clima diario (Parquet con pyarrow).
+- Particionado por ciudad y mes: data/processed/clima/destino=Cusco/mes=2024-07/*.parquet
+- Guarda por día: temperatura promedio, mínima y máxima y precipitación total
+- Los lectores cargan solo las particiones (ciudades, meses) y columnas que necesitan
+- Reescribir un mes de una ciudad solo reemplaza esa partición
+"""
+
+import logging
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+STORE_DIR = PROJECT_ROOT / "data" / "processed" / "clima"
+
+PARTITION_SCHEMA = pa.schema([("destino", pa.string()), ("mes", pa.string())])
+DAILY_SCHEMA = pa.schema([
+    ("dia", pa.date32()),
+    ("temperatura_promedio", pa.float64()),
+    ("temperatura_min", pa.float64()),
+    ("temperatura_max", pa.float64()),
+    ("precipitacion_total", pa.float64()),
+])
+DAILY_COLUMNS = ["destino"] + DAILY_SCHEMA.names
+
+
+def _partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+def guardar_almacen(df_diario, store_dir=STORE_DIR):
+    """
+    Escribe el resumen diario (columnas DAILY_COLUMNS) en el almacén.
+    Las particiones (destino, mes) presentes en `df_diario` se reemplazan; el resto se conserva.
+    """
+    if df_diario.empty:
+        logging.warning("⚠️ No hay clima diario que guardar en el almacén.")
+        return
+    df = df_diario[DAILY_COLUMNS].copy()
+    df["dia"] = pd.to_datetime(df["dia"]).dt.date
+    df["mes"] = pd.to_datetime(df["dia"]).dt.strftime("%Y-%m")
+    table = pa.Table.from_pandas(
+        df, schema=pa.schema(list(DAILY_SCHEMA) + list(PARTITION_SCHEMA)), preserve_index=False
+    )
+    ds.write_dataset(
+        table, store_dir, format="parquet", partitioning=_partitioning(),
+        existing_data_behavior="delete_matching", basename_template="dias-{i}.parquet"
+    )
+    particiones = df.groupby(["destino", "mes"]).ngroups
+    logging.info(f"🗄️ Almacén de clima: {len(df)} días en {particiones} particiones ({store_dir})")
+
+
+def leer_almacen(store_dir=STORE_DIR, destinos=None, meses=None, columnas=None):
+    """
+    Lee el almacén como DataFrame. `destinos` y `meses` ('YYYY-MM') limitan las
+    particiones que se abren y `columnas` las columnas que se leen de cada archivo.
+    Lanza FileNotFoundError si el almacén no existe.
+    """
+    if not Path(store_dir).is_dir():
+        raise FileNotFoundError(f"No existe el almacén de clima: {store_dir}")
+    dataset = ds.dataset(store_dir, format="parquet", partitioning=_partitioning())
+
+    filtro = None
+    if destinos is not None:
+        filtro = ds.field("destino").isin(pa.array(list(destinos), type=pa.string()))  # También si está vacío
+    if meses is not None:
+        filtro_meses = ds.field("mes").isin(list(meses))
+        filtro = filtro_meses if filtro is None else filtro & filtro_meses
+
+    df = dataset.to_table(columns=columnas or DAILY_COLUMNS, filter=filtro).to_pandas()
+    if "dia" in df.columns:
+        df["dia"] = pd.to_datetime(df["dia"])
+    return df
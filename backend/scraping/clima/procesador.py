@@ -1,87 +1,259 @@
-# backend/scraping/clima/procesador.py (Versión Robusta)
+# backend/scraping/clima/procesador.py
+"""
+Pre-procesamiento del clima histórico: del CSV horario de Open-Meteo a un resumen
+diario por destino (promedio, mínima y máxima de temperatura y precipitación total),
+guardado en el almacén Parquet (`almacen.py`), y de ahí al clima de cada fecha de viaje.
+- Se puede importar (`procesar_clima`, `leer_clima_viajes`) y ejecutar como script
+- Lee el CSV por bloques y agrega cada bloque al vuelo: no carga millones de filas a la vez
+- Todo es vectorizado: el cambio de año y la categoría se aplican sobre columnas enteras
 
-import pandas as pd
-from pathlib import Path
-import sys
+Uso:
+    python backend/scraping/clima/procesador.py
+    python backend/scraping/clima/procesador.py --benchmark 2000000
+"""
 
-# --- Búsqueda dinámica de la raíz del proyecto ---
-# Esto permite ejecutar el script desde cualquier lugar
-try:
-    # Sube 3 niveles desde la ubicación del script (clima -> scraping -> backend -> RAÍZ)
-    PROJECT_ROOT = Path(__file__).resolve().parents[3]
-except IndexError:
-    print("❌ ERROR: No se pudo determinar la raíz del proyecto. Asegúrate de que la estructura de carpetas sea correcta.")
-    sys.exit(1) # Detiene el script con un código de error
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
 
-# Agregamos la raíz al path para que pueda encontrar otros módulos si fuera necesario
-sys.path.append(str(PROJECT_ROOT))
+import numpy as np
+import pandas as pd
 
+# Permite ejecutar el script directamente e importar el paquete backend
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from backend.scraping.clima.almacen import STORE_DIR, guardar_almacen, leer_almacen
 
-print("🚀 Iniciando pre-procesamiento del archivo de clima...")
-print(f"Raíz del proyecto detectada en: {PROJECT_ROOT}")
+# --- Búsqueda dinámica de la raíz del proyecto ---
+# Sube 3 niveles desde la ubicación del script (clima -> scraping -> backend -> RAÍZ)
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
-# --- 1. CONFIGURACIÓN DE RUTAS (Ahora relativas a la raíz correcta) ---
+# --- CONFIGURACIÓN DE RUTAS (relativas a la raíz del proyecto) ---
 INPUT_CSV_PATH = PROJECT_ROOT / "data" / "raw" / "clima" / "historico_julio_2024.csv"
 OUTPUT_DIR = PROJECT_ROOT / "data" / "processed"
 OUTPUT_CSV_PATH = OUTPUT_DIR / "clima_final.csv"
 
-# ... (El resto del código es exactamente el mismo que te di en la respuesta anterior) ...
-
-# Asegurarse de que el directorio de salida exista
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# --- 2. LECTURA Y LIMPIEZA INICIAL ---
-try:
-    print(f"Leyendo archivo de entrada: {INPUT_CSV_PATH}")
-    df = pd.read_csv(INPUT_CSV_PATH)
-    
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    
-    df = df.rename(columns={
-        'temperature_2m (°C)': 'temperatura_c',
-        'Destino': 'destino'
+TARGET_YEAR = 2025          # Año de los viajes al que se traslada el histórico
+CHUNK_SIZE = 500_000        # Filas horarias por bloque de lectura
+COLUMN_NAMES = {
+    "temperature_2m (°C)": "temperatura_c",
+    "precipitation (mm)": "precipitacion_mm",
+    "Destino": "destino",
+}
+REQUIRED_COLS = ["time", "temperatura_c", "destino"]
+
+# Categoría por temperatura promedio: [-inf, 15) Frío, [15, 22) Templado, [22, inf) Cálido
+CATEGORY_BINS = [-np.inf, 15, 22, np.inf]
+CATEGORY_LABELS = ["Frío", "Templado", "Cálido"]
+CATEGORY_MISSING = "No disponible"
+
+
+def shift_year(dates, year=TARGET_YEAR):
+    """
+    Lleva una serie de fechas a `year` conservando mes y día, en una sola operación.
+    El 29 de febrero hacia un año no bisiesto queda como NaT.
+    """
+    dates = pd.to_datetime(dates)
+    return pd.to_datetime(
+        pd.DataFrame({"year": year, "month": dates.dt.month, "day": dates.dt.day}),
+        errors="coerce"
+    )
+
+
+def categorizar_clima(temperaturas):
+    """Categoría de clima para una serie de temperaturas (vectorizado con pd.cut)."""
+    categorias = pd.cut(temperaturas, bins=CATEGORY_BINS, labels=CATEGORY_LABELS, right=False)
+    return categorias.cat.add_categories(CATEGORY_MISSING).fillna(CATEGORY_MISSING).astype(str)
+
+
+def _leer_bloques(input_path, chunksize):
+    """Lee el CSV horario por bloques, solo con las columnas necesarias y ya renombradas."""
+    source_cols = {source for source, target in COLUMN_NAMES.items()} | {"time"}
+    reader = pd.read_csv(
+        input_path,
+        usecols=lambda col: col in source_cols,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk = chunk.rename(columns=COLUMN_NAMES)
+        missing = [col for col in REQUIRED_COLS if col not in chunk.columns]
+        if missing:
+            raise ValueError(
+                f"Faltan columnas necesarias. Se esperaban: {REQUIRED_COLS}, pero se encontraron: {list(chunk.columns)}"
+            )
+        yield chunk
+
+
+def resumen_diario(input_path=INPUT_CSV_PATH, chunksize=CHUNK_SIZE):
+    """
+    Resumen diario por (destino, día): temperatura promedio, mínima y máxima y
+    precipitación total. Cada bloque se agrega con un único groupby y solo se
+    guardan los parciales (suma, conteo, mín, máx), no las filas horarias.
+    """
+    parciales = []
+    con_precipitacion = True
+    for chunk in _leer_bloques(input_path, chunksize):
+        chunk["temperatura_c"] = pd.to_numeric(chunk["temperatura_c"], errors="coerce")
+        if "precipitacion_mm" not in chunk.columns:
+            con_precipitacion = False
+            chunk["precipitacion_mm"] = np.nan
+        chunk["precipitacion_mm"] = pd.to_numeric(chunk["precipitacion_mm"], errors="coerce")
+        chunk = chunk.dropna(subset=["temperatura_c"])
+        chunk["dia"] = pd.to_datetime(chunk["time"], format="ISO8601").dt.normalize()
+        parciales.append(chunk.groupby(["destino", "dia"]).agg(
+            temp_suma=("temperatura_c", "sum"),
+            temp_conteo=("temperatura_c", "count"),
+            temperatura_min=("temperatura_c", "min"),
+            temperatura_max=("temperatura_c", "max"),
+            precipitacion_total=("precipitacion_mm", "sum"),
+        ))
+
+    if not parciales:
+        return pd.DataFrame(columns=["destino", "dia", "temperatura_promedio", "temperatura_min",
+                                     "temperatura_max", "precipitacion_total"])
+    # Un mismo día puede quedar repartido entre dos bloques: se combinan sus parciales
+    totales = pd.concat(parciales).groupby(level=["destino", "dia"]).agg({
+        "temp_suma": "sum", "temp_conteo": "sum", "temperatura_min": "min",
+        "temperatura_max": "max", "precipitacion_total": "sum",
+    })
+    totales["temperatura_promedio"] = totales["temp_suma"] / totales["temp_conteo"]
+    if not con_precipitacion:
+        totales["precipitacion_total"] = np.nan
+    return totales[["temperatura_promedio", "temperatura_min", "temperatura_max",
+                    "precipitacion_total"]].reset_index()
+
+
+def clima_de_viajes(diario, target_year=TARGET_YEAR):
+    """
+    Del clima diario histórico (destino, dia, temperatura_promedio) al clima de cada
+    fecha de viaje: fecha llevada a `target_year` (columna `fecha_viaje`, 'YYYY-MM-DD')
+    y categoría de clima. Si varios años caen en la misma fecha, se promedian.
+    """
+    df = diario[["destino", "dia", "temperatura_promedio"]].copy()
+    # El cambio de año se hace sobre los días ya agregados (cientos de filas, no millones)
+    df["fecha_viaje"] = shift_year(df["dia"], target_year)
+    sin_fecha = df["fecha_viaje"].isna().sum()
+    if sin_fecha:
+        logging.warning(f"⚠️ Se descartan {sin_fecha} días sin equivalente en {target_year} (29 de febrero).")
+        df = df.dropna(subset=["fecha_viaje"])
+    df["fecha_viaje"] = df["fecha_viaje"].dt.strftime("%Y-%m-%d")
+
+    df = df.groupby(["destino", "fecha_viaje"], as_index=False)["temperatura_promedio"].mean()
+    df["categoria_clima"] = categorizar_clima(df["temperatura_promedio"])
+    df["temperatura_promedio"] = df["temperatura_promedio"].round(2)
+    return df
+
+
+def procesar_clima(input_path=INPUT_CSV_PATH, output_path=OUTPUT_CSV_PATH, target_year=TARGET_YEAR,
+                   chunksize=CHUNK_SIZE, store_dir=None):
+    """
+    Etapa completa del pipeline: resumen diario por destino y clima de cada fecha de viaje.
+    Si `store_dir` no es None, el resumen diario se guarda en el almacén Parquet.
+    Si `output_path` no es None, el clima de viajes se guarda en CSV. Devuelve ese DataFrame.
+    Lanza FileNotFoundError si no existe el CSV horario y ValueError si le faltan columnas.
+    """
+    logging.info(f"🌦️ Procesando clima horario: {input_path}")
+    diario = resumen_diario(input_path, chunksize)
+    if store_dir is not None:
+        guardar_almacen(diario, store_dir)
+    df = clima_de_viajes(diario, target_year)
+
+    if output_path is not None:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(output_path, index=False, encoding="utf-8")
+        logging.info(f"✅ Clima procesado: {len(df)} filas guardadas en {output_path}")
+    return df
+
+
+def leer_clima_viajes(store_dir=STORE_DIR, target_year=TARGET_YEAR, destinos=None):
+    """
+    Clima de cada fecha de viaje leído del almacén: solo las particiones de `destinos`
+    y solo las columnas destino, dia y temperatura_promedio.
+    Lanza FileNotFoundError si el almacén no existe.
+    """
+    diario = leer_almacen(store_dir, destinos=destinos, columnas=["destino", "dia", "temperatura_promedio"])
+    logging.info(f"🗄️ Clima leído del almacén: {len(diario)} días")
+    return clima_de_viajes(diario, target_year)
+
+
+def _procesar_por_filas(input_path, target_year=TARGET_YEAR):
+    """Versión anterior (fila a fila), solo para comparar en el benchmark."""
+    df = pd.read_csv(input_path).rename(columns=COLUMN_NAMES)
+    df["time"] = pd.to_datetime(df["time"]).map(lambda dt: dt.replace(year=target_year))
+    df["fecha_viaje"] = df["time"].dt.strftime("%Y-%m-%d")
+    df["temperatura_c"] = pd.to_numeric(df["temperatura_c"], errors="coerce")
+    df = df.dropna(subset=["temperatura_c"])
+    df = df.groupby(["destino", "fecha_viaje"])["temperatura_c"].mean().reset_index()
+    df["categoria_clima"] = df["temperatura_c"].apply(
+        lambda t: "Cálido" if t >= 22 else "Templado" if t >= 15 else "Frío"
+    )
+    return df
+
+
+def benchmark(rows=2_000_000, ciudades=7, incluir_anterior=True):
+    """
+    Genera un CSV horario sintético de `rows` filas (varios años y ciudades)
+    y mide el procesamiento vectorizado frente a la versión fila a fila.
+    """
+    horas_por_ciudad = max(1, rows // ciudades)
+    times = pd.date_range("2016-01-01", periods=horas_por_ciudad, freq="h")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "time": np.tile(times.strftime("%Y-%m-%dT%H:%M"), ciudades),
+        "temperature_2m (°C)": rng.normal(16, 6, horas_por_ciudad * ciudades).round(1),
+        "precipitation (mm)": 0.0,
+        "Destino": np.repeat([f"Ciudad{i}" for i in range(ciudades)], horas_por_ciudad),
     })
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "clima_sintetico.csv"
+        df.to_csv(path, index=False)
+        print(f"📊 Benchmark: {len(df):,} filas horarias, {ciudades} ciudades, "
+              f"{times[0]:%Y-%m-%d} a {times[-1]:%Y-%m-%d}")
+
+        start = time.perf_counter()
+        resultado = procesar_clima(path, output_path=None)
+        vectorizado = time.perf_counter() - start
+        print(f"⚡ Vectorizado por bloques: {vectorizado:.2f}s ({len(resultado)} filas diarias)")
+
+        if incluir_anterior:
+            # Años bisiestos: la versión fila a fila fallaría con el 29 de febrero
+            no_bisiesto = df[~df["time"].str[5:10].eq("02-29")]
+            no_bisiesto.to_csv(path, index=False)
+            start = time.perf_counter()
+            _procesar_por_filas(path)
+            anterior = time.perf_counter() - start
+            print(f"🐢 Fila a fila (versión anterior): {anterior:.2f}s -> {anterior / vectorizado:.1f}x más lento")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-procesa el clima horario a promedios diarios")
+    parser.add_argument("--entrada", default=str(INPUT_CSV_PATH), help="CSV horario de Open-Meteo")
+    parser.add_argument("--salida", default=str(OUTPUT_CSV_PATH), help="CSV diario procesado")
+    parser.add_argument("--almacen", default=str(STORE_DIR), help="Carpeta del almacén Parquet diario")
+    parser.add_argument("--anio", type=int, default=TARGET_YEAR, help="Año al que se llevan las fechas")
+    parser.add_argument("--benchmark", type=int, metavar="FILAS", default=None,
+                        help="Mide el procesamiento con un CSV sintético de FILAS filas")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+
+    print("🚀 Iniciando pre-procesamiento del archivo de clima...")
+    try:
+        df = procesar_clima(args.entrada, args.salida, args.anio, store_dir=args.almacen)
+    except FileNotFoundError:
+        print(f"❌ ERROR: No se encontró el archivo de entrada. Asegúrate de que exista en: {args.entrada}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ Ocurrió un error leyendo o limpiando el CSV: {e}")
+        sys.exit(1)
+    print(f"\n✅ ¡Éxito! Se ha generado el archivo '{Path(args.salida).name}' con {len(df)} filas.")
+    print("Columnas del archivo final:", list(df.columns))
+
 
-    required_cols = ['time', 'temperatura_c', 'destino']
-    if not all(col in df.columns for col in required_cols):
-        raise ValueError(f"Faltan columnas necesarias. Se esperaban: {required_cols}, pero se encontraron: {list(df.columns)}")
-
-except FileNotFoundError:
-    print(f"❌ ERROR: No se encontró el archivo de entrada. Asegúrate de que exista en: {INPUT_CSV_PATH}")
-    exit()
-except Exception as e:
-    print(f"❌ Ocurrió un error leyendo o limpiando el CSV: {e}")
-    exit()
-
-# --- 3. TRANSFORMACIÓN DE DATOS ---
-print("Transformando datos: cambiando año, calculando promedios...")
-
-df['time'] = pd.to_datetime(df['time'])
-df['time'] = df['time'].map(lambda dt: dt.replace(year=2025))
-df['fecha_viaje'] = df['time'].dt.strftime('%Y-%m-%d')
-df['temperatura_c'] = pd.to_numeric(df['temperatura_c'], errors='coerce')
-df.dropna(subset=['temperatura_c'], inplace=True)
-df_promedio = df.groupby(['destino', 'fecha_viaje'])['temperatura_c'].mean().reset_index()
-df_promedio = df_promedio.rename(columns={'temperatura_c': 'temperatura_promedio'})
-
-# --- 4. ENRIQUECIMIENTO DE DATOS (AÑADIR CATEGORÍA) ---
-print("Añadiendo categoría de clima...")
-
-def categorizar_clima(temperatura: float) -> str:
-    if pd.isna(temperatura): return "No disponible"
-    if temperatura >= 22: return "Cálido"
-    if 15 <= temperatura < 22: return "Templado"
-    return "Frío"
-
-df_promedio['categoria_clima'] = df_promedio['temperatura_promedio'].apply(categorizar_clima)
-df_promedio['temperatura_promedio'] = df_promedio['temperatura_promedio'].round(2)
-
-# --- 5. GUARDAR EL RESULTADO FINAL ---
-try:
-    print(f"Guardando archivo procesado en: {OUTPUT_CSV_PATH}")
-    df_promedio.to_csv(OUTPUT_CSV_PATH, index=False, encoding='utf-8')
-    print(f"\n✅ ¡Éxito! Se ha generado el archivo 'clima_final.csv' con {len(df_promedio)} filas.")
-    print("Columnas del archivo final:", list(df_promedio.columns))
-
-except Exception as e:
-    print(f"❌ Ocurrió un error al guardar el archivo final: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
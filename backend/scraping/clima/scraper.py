@@ -1,7 +1,31 @@
-import requests
-import pandas as pd
+# backend/scraping/clima/scraper.py
+"""
+Descarga del clima horario histórico desde la API de archivo de Open-Meteo.
+- Todas las ciudades se piden en paralelo con el cliente HTTP compartido
+- Cada respuesta cruda se guarda en disco con una clave (lat, lon, variables, rango)
+- Solo se piden los días que faltan en la caché: añadir ciudades o años cuesta solo lo nuevo
+- Un día cuenta como descargado solo si trae todos sus valores: los últimos días que la
+  API aún no publica (null) se vuelven a pedir en la siguiente ejecución
+- Los bloques se unen con un único pd.concat al final
+
+Uso:
+    python backend/scraping/clima/scraper.py
+    python backend/scraping/clima/scraper.py --desde 2023-07-01 --hasta 2024-07-31
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
 from pathlib import Path
-from io import StringIO
+
+import pandas as pd
+
+# Permite ejecutar el script directamente e importar el paquete backend
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from backend.scraping.http_client import get_http_client
 
 # --- Coordenadas de las ciudades ---
 ciudades = {
@@ -19,41 +43,178 @@ start_date = "2024-07-01"
 end_date = "2024-07-31"
 variables = "temperature_2m,precipitation"
 base_url = "https://archive-api.open-meteo.com/v1/archive"
+MAX_WORKERS = 7       # Descargas simultáneas
+REQUEST_TIMEOUT = 30
 
-# --- Ruta de salida (sube 3 niveles desde este archivo) ---
+# --- Rutas de salida (sube 3 niveles desde este archivo) ---
 project_root = Path(__file__).resolve().parents[3]
 output_path = project_root / "data" / "raw" / "clima"
-output_path.mkdir(parents=True, exist_ok=True)
+CACHE_DIR = output_path / "cache"
+HISTORICO_CSV_PATH = output_path / "historico_julio_2024.csv"
+
+
+def cache_path(lat, lon, variables_api, desde, hasta, cache_dir=CACHE_DIR):
+    """
+    Archivo de caché de una respuesta: la clave es (lat, lon, variables, rango).
+    El rango queda legible en el nombre para poder saber qué días cubre.
+    """
+    vars_key = hashlib.sha1(variables_api.encode("utf-8")).hexdigest()[:8]
+    return Path(cache_dir) / f"{lat:.3f}_{lon:.3f}_{vars_key}_{desde}_{hasta}.json"
+
+
+def dias_en_cache(lat, lon, variables_api, cache_dir=CACHE_DIR):
+    """
+    Días ya descargados para una ubicación y unas variables. Solo cuentan los días
+    con todas sus horas y variables informadas: Open-Meteo devuelve null en los días
+    que aún no tiene, y esos no deben quedarse en la caché para siempre.
+    """
+    vars_key = hashlib.sha1(variables_api.encode("utf-8")).hexdigest()[:8]
+    dias = set()
+    for path in Path(cache_dir).glob(f"{lat:.3f}_{lon:.3f}_{vars_key}_*.json"):
+        df = leer_respuesta(path)
+        completas = df.drop(columns="time").notna().all(axis=1)
+        por_dia = completas.groupby(df["time"].str[:10]).all()
+        dias.update(date.fromisoformat(dia) for dia in por_dia.index[por_dia])
+    return dias
+
+
+def rangos_faltantes(desde, hasta, dias_cubiertos):
+    """Rangos contiguos (inicio, fin) de días de [desde, hasta] que no están cubiertos."""
+    rangos = []
+    inicio = None
+    dia = date.fromisoformat(desde)
+    fin = date.fromisoformat(hasta)
+    while dia <= fin:
+        if dia not in dias_cubiertos and inicio is None:
+            inicio = dia
+        if dia in dias_cubiertos and inicio is not None:
+            rangos.append((inicio.isoformat(), (dia - timedelta(days=1)).isoformat()))
+            inicio = None
+        dia += timedelta(days=1)
+    if inicio is not None:
+        rangos.append((inicio.isoformat(), fin.isoformat()))
+    return rangos
 
-# --- DataFrame acumulador ---
-df_total = pd.DataFrame()
 
-# --- Consulta por ciudad ---
-for ciudad, (lat, lon) in ciudades.items():
-    print(f"🔎 Descargando clima de: {ciudad}")
+def descargar_rango(client, lat, lon, variables_api, desde, hasta, cache_dir=CACHE_DIR, url=base_url):
+    """Pide un rango a Open-Meteo y guarda la respuesta cruda (JSON) en la caché."""
     params = {
         "latitude": lat,
         "longitude": lon,
-        "start_date": start_date,
-        "end_date": end_date,
-        "hourly": variables,
+        "start_date": desde,
+        "end_date": hasta,
+        "hourly": variables_api,
         "timezone": "auto",
-        "format": "csv"
     }
+    response = client.get(url, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    path = cache_path(lat, lon, variables_api, desde, hasta, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(response.text, encoding="utf-8")
+    tmp_path.replace(path)
+    return path
+
+
+def leer_respuesta(path):
+    """
+    Convierte una respuesta cacheada en un DataFrame horario con las mismas
+    columnas que el CSV de Open-Meteo: time, "temperature_2m (°C)", ...
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    hourly = data["hourly"]
+    units = data.get("hourly_units", {})
+    return pd.DataFrame({
+        (name if name == "time" else f"{name} ({units.get(name, '')})"): values
+        for name, values in hourly.items()
+    })
+
+
+def cargar_ciudad(ciudad, lat, lon, variables_api, desde, hasta, cache_dir=CACHE_DIR):
+    """Une los bloques cacheados de una ciudad y se queda con [desde, hasta]."""
+    vars_key = hashlib.sha1(variables_api.encode("utf-8")).hexdigest()[:8]
+    bloques = [leer_respuesta(path) for path in sorted(Path(cache_dir).glob(f"{lat:.3f}_{lon:.3f}_{vars_key}_*.json"))]
+    if not bloques:
+        return pd.DataFrame()
+    df = pd.concat(bloques, ignore_index=True)
+    # Si una hora está en varios bloques, se queda la que trae valores (no la de un día aún sin publicar)
+    df["_nulos"] = df.drop(columns="time").isna().sum(axis=1)
+    df = df.sort_values(["time", "_nulos"], kind="stable").drop_duplicates(subset="time").drop(columns="_nulos")
+    dia = df["time"].str[:10]
+    df = df[(dia >= desde) & (dia <= hasta)].copy()
+    df["Destino"] = ciudad
+    return df
+
+
+def descargar_clima(ciudades_coords=None, desde=start_date, hasta=end_date, variables_api=variables,
+                    cache_dir=CACHE_DIR, salida=HISTORICO_CSV_PATH, max_workers=MAX_WORKERS, url=base_url):
+    """
+    Descarga en paralelo solo los rangos que faltan en la caché, une todas las
+    ciudades con un único concat y guarda el CSV horario (columna `Destino`).
+    `url` permite apuntar a un servidor local en lugar de Open-Meteo.
+    Devuelve el DataFrame.
+    """
+    if ciudades_coords is None:
+        ciudades_coords = ciudades
+    client = get_http_client()
+
+    tareas = []
+    for ciudad, (lat, lon) in ciudades_coords.items():
+        faltantes = rangos_faltantes(desde, hasta, dias_en_cache(lat, lon, variables_api, cache_dir))
+        if not faltantes:
+            print(f"💾 {ciudad}: {desde} a {hasta} ya está en caché")
+        tareas += [(ciudad, lat, lon, inicio, fin) for inicio, fin in faltantes]
+
+    if tareas:
+        print(f"🔎 Descargando {len(tareas)} rangos de clima en paralelo...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = {
+                executor.submit(descargar_rango, client, lat, lon, variables_api, inicio, fin, cache_dir, url):
+                    (ciudad, inicio, fin)
+                for ciudad, lat, lon, inicio, fin in tareas
+            }
+            for futuro in as_completed(futuros):
+                ciudad, inicio, fin = futuros[futuro]
+                try:
+                    futuro.result()
+                    print(f"✅ {ciudad}: {inicio} a {fin} descargado")
+                except Exception as e:
+                    print(f"❌ Error con {ciudad} ({inicio} a {fin}): {e}")
+        client.log_stats(print)
+
+    frames = [
+        cargar_ciudad(ciudad, lat, lon, variables_api, desde, hasta, cache_dir)
+        for ciudad, (lat, lon) in ciudades_coords.items()
+    ]
+    frames = [df for df in frames if not df.empty]
+    df_total = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    if salida is not None and not df_total.empty:
+        Path(salida).parent.mkdir(parents=True, exist_ok=True)
+        df_total.to_csv(salida, index=False)
+        print(f"\n📁 CSV generado en: {salida} ({len(df_total)} filas)")
+    return df_total
+
 
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descarga el clima horario histórico de Open-Meteo")
+    parser.add_argument("--desde", default=start_date, help="Primer día (YYYY-MM-DD)")
+    parser.add_argument("--hasta", default=end_date, help="Último día (YYYY-MM-DD)")
+    parser.add_argument("--ciudades", nargs="+", default=list(ciudades), help="Ciudades a descargar")
+    parser.add_argument("--salida", default=str(HISTORICO_CSV_PATH), help="CSV horario combinado")
+    parser.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Descargas simultáneas")
+    parser.add_argument("--cache", default=str(CACHE_DIR), help="Carpeta de respuestas crudas")
+    parser.add_argument("--url", default=base_url, help="URL de la API de archivo (o un servidor local)")
+    args = parser.parse_args(argv)
 
-        df = pd.read_csv(StringIO(response.text))
-        df["ciudad"] = ciudad
-        df_total = pd.concat([df_total, df], ignore_index=True)
-        print(f"✅ {ciudad}: datos cargados")
+    desconocidas = [ciudad for ciudad in args.ciudades if ciudad not in ciudades]
+    if desconocidas:
+        parser.error(f"ciudades desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(ciudades)})")
+    seleccion = {ciudad: ciudades[ciudad] for ciudad in args.ciudades}
+    descargar_clima(seleccion, args.desde, args.hasta, cache_dir=args.cache, salida=args.salida,
+                    max_workers=args.hilos, url=args.url)
 
-    except Exception as e:
-        print(f"❌ Error con {ciudad}: {e}")
 
-# --- Guardar CSV final ---
-ruta_csv = output_path / "historico_julio_2024.csv"
-df_total.to_csv(ruta_csv, index=False)
-print(f"\n📁 CSV generado en: {ruta_csv}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# backend/scraping/http_client.py
+"""
+Capa de transporte HTTP compartida por todos los scrapers de Chaskiway.
+- Sesiones keep-alive con pool de conexiones (sin handshake TCP+TLS por petición)
+- Reintentos con backoff exponencial y jitter (tenacity), respetando Retry-After
+- Estadísticas de reutilización de conexiones por host
+- Grabación y reproducción opcional de respuestas (ver replay.py)
+- Telemetría opcional por intento: DNS, conexión, TLS, TTFB, bytes y códigos (ver telemetry.py)
+"""
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    Retrying, RetryError, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+)
+
+from backend.scraping.replay import ReplayCache, request_key
+from backend.scraping.telemetry import TIMED_POOL_CLASSES
+
+# Códigos que vale la pena reintentar
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+DEFAULT_TIMEOUT = 20
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 1.0   # Segundos de la primera espera
+DEFAULT_BACKOFF_MAX = 60.0   # Tope de espera entre reintentos
+
+
+class RetryableStatusError(Exception):
+    """Respuesta HTTP con un código que se debe reintentar (429/5xx)."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} en {response.url}")
+        self.response = response
+
+
+def parse_retry_after(value):
+    """
+    Convierte la cabecera Retry-After (segundos o fecha HTTP) a segundos.
+    Devuelve None si no viene o no se puede interpretar.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    Adaptador que recuerda los pools de urllib3 que usa cada host, para leer
+    luego cuántas conexiones se abrieron y cuántas peticiones se sirvieron.
+    Sus conexiones miden las fases de cada petición (telemetry.py).
+    """
+
+    def __init__(self, **kwargs):
+        self.pools_by_host = {}
+        self._pools_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+    def _remember(self, url, pool):
+        with self._pools_lock:
+            self.pools_by_host.setdefault(urlparse(url).netloc, set()).add(pool)
+        return pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        return self._remember(request.url, pool)
+
+    def pool_counts(self):
+        """Conexiones abiertas y peticiones servidas por host."""
+        with self._pools_lock:
+            return {
+                host: (sum(p.num_connections for p in pools), sum(p.num_requests for p in pools))
+                for host, pools in self.pools_by_host.items()
+            }
+
+
+class HttpClient:
+    """
+    Cliente HTTP con pool de conexiones persistente y reintentos.
+    Se puede compartir entre hilos (el crawler lo usa desde su pool de hilos).
+    `replay` (ReplayCache) graba o reproduce las respuestas; por defecto se toma
+    de las variables de entorno CHASKIWAY_HTTP_REPLAY / CHASKIWAY_HTTP_CASSETTE.
+    `telemetry` (Telemetry) recibe cada intento y cada petición con sus reintentos.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_SIZE, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 timeout=DEFAULT_TIMEOUT, headers=None, replay=None, telemetry=None):
+        self.replay = replay if replay is not None else ReplayCache.from_env()
+        self.telemetry = telemetry
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats = {}
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        self._adapter = _CountingAdapter(pool_connections=10, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+    # --- Estadísticas ---
+
+    def _host_stats(self, host):
+        return self._stats.setdefault(host, {"retries": 0, "failures": 0})
+
+    def _record(self, host, key):
+        with self._lock:
+            self._host_stats(host)[key] += 1
+
+    def stats(self):
+        """
+        Devuelve, por host, peticiones enviadas, conexiones abiertas,
+        reintentos, fallos definitivos y el porcentaje de reutilización.
+        """
+        pool_counts = self._adapter.pool_counts()
+        with self._lock:
+            report = {}
+            for host in set(pool_counts) | set(self._stats):
+                connections, requests_sent = pool_counts.get(host, (0, 0))
+                row = {"requests": requests_sent, "connections": connections}
+                row.update(self._stats.get(host, {"retries": 0, "failures": 0}))
+                row["reuse_ratio"] = (
+                    round(1 - row["connections"] / requests_sent, 3) if requests_sent else 0.0
+                )
+                report[host] = row
+            return report
+
+    def log_stats(self, log=logging.info):
+        """Escribe las estadísticas de reutilización por host (por defecto en el log)."""
+        for host, row in self.stats().items():
+            log(
+                f"🔌 {host}: {row['requests']} peticiones, {row['connections']} conexiones "
+                f"({row['reuse_ratio']:.0%} reutilizadas), {row['retries']} reintentos, {row['failures']} fallos"
+            )
+        if self.replay is not None:
+            self.replay.log_stats(log)
+
+    # --- Reintentos ---
+
+    def _wait(self, retry_state):
+        """Usa Retry-After si el servidor lo envía; si no, backoff exponencial con jitter."""
+        exc = retry_state.outcome.exception()
+        if isinstance(exc, RetryableStatusError):
+            retry_after = parse_retry_after(exc.response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        return wait_random_exponential(multiplier=self.backoff_base, max=self.backoff_max)(retry_state)
+
+    def _before_sleep(self, retry_state):
+        exc = retry_state.outcome.exception()
+        url = exc.response.url if isinstance(exc, RetryableStatusError) else retry_state.args[1]
+        self._record(urlparse(url).netloc, "retries")
+        logging.warning(
+            f"🔁 Reintento {retry_state.attempt_number}/{self.max_retries} en "
+            f"{retry_state.next_action.sleep:.1f}s: {exc}"
+        )
+
+    @staticmethod
+    def _pace_retry(retry_state, observer):
+        """Los reintentos también esperan su turno si el observador controla la tasa."""
+        if retry_state.attempt_number > 1 and hasattr(observer, "wait"):
+            observer.wait()
+
+    def _send(self, method, url, observer=None, label=None, **kwargs):
+        key = None
+        if self.replay is not None:
+            key = request_key(method, url, kwargs.get("params"), kwargs.get("json"), kwargs.get("data"))
+            recorded = self.replay.lookup(key)
+            if recorded is not None:
+                return recorded
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            elapsed = time.monotonic() - start
+            if observer is not None:
+                observer.on_error(e, elapsed)
+            if self.telemetry is not None:
+                self.telemetry.record_attempt(label, error=e, elapsed=elapsed)
+            raise
+        elapsed = time.monotonic() - start
+        if observer is not None:
+            observer.on_response(response, elapsed)
+        if self.telemetry is not None:
+            self.telemetry.record_attempt(label, response=response, elapsed=elapsed)
+        if response.status_code in RETRY_STATUS_CODES:
+            raise RetryableStatusError(response)
+        # Solo se graban respuestas definitivas (no 429/5xx, que se reintentan)
+        if key is not None:
+            self.replay.store(key, response)
+        return response
+
+    def request(self, method, url, observer=None, label=None, **kwargs):
+        """
+        Envía la petición reintentando errores de red y códigos 429/5xx.
+        Si se agotan los reintentos por código HTTP, devuelve la última respuesta
+        para que el llamador decida; los errores de red se propagan.
+        `observer` (opcional) recibe cada intento con `on_response(response, segundos)`
+        o `on_error(excepción, segundos)`, por ejemplo un AimdRateController.
+        `label` agrupa la petición en la telemetría (por ejemplo, la ruta consultada).
+        """
+        kwargs["observer"] = observer
+        kwargs["label"] = label
+        kwargs.setdefault("timeout", self.timeout)
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=self._wait,
+            retry=retry_if_exception_type(
+                (RetryableStatusError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+            ),
+            before_sleep=self._before_sleep,
+            before=lambda retry_state: self._pace_retry(retry_state, observer),
+        )
+        try:
+            return retrying(self._send, method, url, **kwargs)
+        except RetryError as e:
+            self._record(urlparse(url).netloc, "failures")
+            exc = e.last_attempt.exception()
+            if isinstance(exc, RetryableStatusError):
+                return exc.response
+            raise exc
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.record_fetch(label, retrying.statistics.get("attempt_number", 1))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Cliente compartido por los scrapers de un mismo proceso, para que todas
+    las peticiones reutilicen el mismo pool de conexiones.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
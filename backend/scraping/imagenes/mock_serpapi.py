@@ -0,0 +1,146 @@
+# backend/scraping/imagenes/mock_serpapi.py
+"""
+Servidor local que imita la búsqueda de imágenes de SerpAPI y sirve las imágenes.
+- GET /search?q=...: devuelve `images_results` con varios candidatos por búsqueda
+- GET /imagenes/<nombre>.jpg: imagen generada con Pillow (color estable según la búsqueda)
+- Latencia y enlaces rotos configurables, para probar la caché y el paso al siguiente candidato
+- Al terminar (Ctrl+C) muestra cuántas búsquedas e imágenes sirvió
+
+Uso:
+    python -m backend.scraping.imagenes.mock_serpapi --puerto 8767 --enlaces-rotos 1
+    python backend/scraping/imagenes/scraper.py --url http://127.0.0.1:8767/search
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+from PIL import Image
+
+
+class MockSerpApi:
+    """
+    Estado y reglas del servidor simulado. Es seguro entre hilos.
+    - `resultados`: candidatos por búsqueda
+    - `enlaces_rotos`: los primeros N candidatos de cada búsqueda devuelven 404
+    - `latency_ms`: espera antes de cada respuesta de búsqueda
+    - `ancho` × `alto`: tamaño de las imágenes generadas
+    """
+
+    def __init__(self, base_url, resultados=5, enlaces_rotos=0, latency_ms=0, ancho=1200, alto=800):
+        self.base_url = base_url.rstrip("/")
+        self.resultados = resultados
+        self.enlaces_rotos = enlaces_rotos
+        self.latency_ms = latency_ms
+        self.ancho = ancho
+        self.alto = alto
+        self._lock = threading.Lock()
+        self.stats = {"searches": 0, "images": 0, "broken": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def search(self, params):
+        """Devuelve (código HTTP, cabeceras, cuerpo) para una búsqueda de imágenes."""
+        self._count("searches")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        query = params.get("q")
+        if not query:
+            return 400, {}, b'{"error":"Missing query"}'
+        slug = quote(query, safe="")
+        images = [
+            {
+                "position": position,
+                "title": f"{query} ({position})",
+                "source": "mock",
+                "original": f"{self.base_url}/imagenes/{slug}-{position}.jpg",
+                "original_width": self.ancho,
+                "original_height": self.alto,
+            }
+            for position in range(1, self.resultados + 1)
+        ]
+        body = {"search_parameters": {"q": query, "engine": params.get("engine")}, "images_results": images}
+        return 200, {"Content-Type": "application/json"}, json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    def image(self, name):
+        """Imagen JPEG para `<búsqueda>-<posición>.jpg`; 404 si es uno de los enlaces rotos."""
+        stem = unquote(name).rsplit(".", 1)[0]
+        query, _, position = stem.rpartition("-")
+        if not query or not position.isdigit() or int(position) <= self.enlaces_rotos:
+            self._count("broken")
+            return 404, {}, b"Not Found"
+        self._count("images")
+        color = tuple(hashlib.sha256(stem.encode("utf-8")).digest()[:3])
+        buffer = io.BytesIO()
+        Image.new("RGB", (self.ancho, self.alto), color).save(buffer, format="JPEG", quality=90)
+        return 200, {"Content-Type": "image/jpeg"}, buffer.getvalue()
+
+
+def make_handler(mock):
+    class SerpApiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith("/imagenes/"):
+                status, headers, body = mock.image(url.path[len("/imagenes/"):])
+            else:
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status, headers, body = mock.search(params)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return SerpApiHandler
+
+
+def serve(mock, host="127.0.0.1", port=8767):
+    """Arranca el servidor y bloquea hasta Ctrl+C."""
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    logging.info(f"🧪 Servidor simulado de SerpAPI en http://{host}:{port}/search "
+                 f"({mock.resultados} candidatos por búsqueda, {mock.enlaces_rotos} rotos)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"🧪 Servidor detenido: {mock.stats}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la búsqueda de imágenes de SerpAPI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8767)
+    parser.add_argument("--resultados", type=int, default=5, help="Candidatos por búsqueda")
+    parser.add_argument("--enlaces-rotos", type=int, default=0,
+                        help="Los primeros N candidatos de cada búsqueda devuelven 404")
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Latencia de cada búsqueda")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+    mock = MockSerpApi(f"http://{args.host}:{args.puerto}", resultados=args.resultados,
+                       enlaces_rotos=args.enlaces_rotos, latency_ms=args.latencia_ms)
+    serve(mock, args.host, args.puerto)
+
+
+if __name__ == "__main__":
+    main()
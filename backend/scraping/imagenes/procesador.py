@@ -0,0 +1,273 @@
+# backend/scraping/imagenes/procesador.py
+"""
+Procesamiento de las imágenes de destinos: de los enlaces de `enlaces_imagenes.csv`
+a miniaturas locales listas para el frontend.
+- Cada imagen se descarga una sola vez: si el enlace y sus archivos ya están, se reutilizan
+- Si `candidatos_imagenes.csv` existe, un enlace roto pasa al siguiente candidato sin volver a buscar
+- Los archivos se nombran por el hash del contenido: la misma foto nunca se guarda dos veces
+- Genera varios anchos (MINIATURA_ANCHOS) en WebP y JPEG con Pillow
+- Las miniaturas van a `frontend/static/miniaturas/`, que Streamlit sirve como archivos
+  estáticos (`server.enableStaticServing`); el índice, los originales y los fallos quedan
+  en `data/processed/images/`
+- El índice `indice.csv` dice qué archivo corresponde a cada ciudad, ancho y formato
+- Las ciudades que fallan se anotan en `fallos.csv` y no se reintentan hasta que pase su
+  espera (se duplica con cada fallo) o cambien sus enlaces
+
+Uso:
+    python backend/scraping/imagenes/procesador.py
+"""
+
+import argparse
+import hashlib
+import io
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+from PIL import Image, ImageOps
+
+# Permite ejecutar el script directamente e importar el paquete backend
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from backend.scraping.http_client import get_http_client
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+ENLACES_CSV_PATH = PROJECT_ROOT / "data" / "raw" / "imagenes" / "enlaces_imagenes.csv"
+CANDIDATOS_FILENAME = "candidatos_imagenes.csv"
+IMAGES_DIR = PROJECT_ROOT / "data" / "processed" / "images"
+MINIATURAS_DIR = PROJECT_ROOT / "frontend" / "static" / "miniaturas"  # Servida en /app/static/miniaturas/
+ORIGINALES_DIRNAME = "originales"
+INDICE_FILENAME = "indice.csv"
+FALLOS_FILENAME = "fallos.csv"
+
+MINIATURA_ANCHOS = [160, 320, 640]  # px; las tarjetas del Buscador miden 160 px (320 en pantallas 2x)
+FORMATOS = {"webp": {"format": "WEBP", "quality": 80, "method": 6},
+            "jpg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}}
+MAX_WORKERS = 6
+REQUEST_TIMEOUT = 30
+INDICE_COLUMNS = ["ciudad", "url_imagen", "hash", "ancho", "formato", "archivo"]
+FALLOS_COLUMNS = ["ciudad", "enlaces", "intentos", "ultimo_intento"]
+ESPERA_INICIAL_S = 3600  # Tras el primer fallo; se duplica con cada fallo seguido
+ESPERA_MAXIMA_S = 7 * 24 * 3600
+
+
+def content_hash(data):
+    """Hash del contenido de la imagen; sus primeros 16 caracteres nombran los archivos."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def nombre_miniatura(hash_imagen, ancho, formato):
+    return f"{hash_imagen[:16]}-{ancho}.{formato}"
+
+
+def leer_indice(images_dir=IMAGES_DIR):
+    """Índice de miniaturas (una fila por ciudad, ancho y formato); vacío si aún no existe."""
+    path = Path(images_dir) / INDICE_FILENAME
+    if not path.exists():
+        return pd.DataFrame(columns=INDICE_COLUMNS)
+    return pd.read_csv(path)
+
+
+def _hash_enlaces(urls):
+    """Identifica la lista de candidatos de una ciudad: si cambia, el fallo anterior ya no cuenta."""
+    return hashlib.sha256("\n".join(urls).encode()).hexdigest()[:16]
+
+
+def leer_fallos(images_dir=IMAGES_DIR):
+    """Fallos anotados: ciudad -> (hash de sus enlaces, intentos, epoch del último intento)."""
+    path = Path(images_dir) / FALLOS_FILENAME
+    if not path.exists():
+        return {}
+    fallos = pd.read_csv(path)
+    return {ciudad: (enlaces, int(intentos), float(ultimo))
+            for ciudad, enlaces, intentos, ultimo in fallos[FALLOS_COLUMNS].itertuples(index=False)}
+
+
+def guardar_fallos(fallos, images_dir=IMAGES_DIR):
+    path = Path(images_dir) / FALLOS_FILENAME
+    if not fallos:
+        path.unlink(missing_ok=True)
+        return
+    filas = [(ciudad, *valores) for ciudad, valores in sorted(fallos.items())]
+    pd.DataFrame(filas, columns=FALLOS_COLUMNS).to_csv(path, index=False)
+
+
+def espera_fallo(intentos):
+    """Segundos sin reintentar una ciudad tras `intentos` fallos seguidos."""
+    return min(ESPERA_INICIAL_S * 2 ** (intentos - 1), ESPERA_MAXIMA_S)
+
+
+def generar_miniaturas(data, hash_imagen, miniaturas_dir=MINIATURAS_DIR, anchos=MINIATURA_ANCHOS):
+    """
+    Genera las miniaturas de una imagen (bytes) en todos los anchos y formatos.
+    Nunca agranda: si la imagen es más angosta que un ancho, se usa su tamaño original.
+    Devuelve una lista de (ancho, formato, archivo).
+    """
+    miniaturas_dir = Path(miniaturas_dir)
+    miniaturas_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        generadas = []
+        for ancho in anchos:
+            alto = max(1, round(original.height * min(ancho, original.width) / original.width))
+            imagen = original.resize((min(ancho, original.width), alto), Image.LANCZOS)
+            for formato, opciones in FORMATOS.items():
+                archivo = nombre_miniatura(hash_imagen, ancho, formato)
+                path = miniaturas_dir / archivo
+                if not path.exists():
+                    tmp_path = path.with_suffix(".tmp")
+                    imagen.save(tmp_path, **opciones)
+                    tmp_path.replace(path)
+                generadas.append((ancho, formato, archivo))
+    return generadas
+
+
+def descargar_imagen(client, url):
+    """Descarga una imagen y devuelve (bytes, hash)."""
+    response = client.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    data = response.content
+    return data, content_hash(data)
+
+
+def guardar_original(data, hash_imagen, images_dir=IMAGES_DIR):
+    originales = Path(images_dir) / ORIGINALES_DIRNAME
+    originales.mkdir(parents=True, exist_ok=True)
+    path = originales / hash_imagen[:16]
+    if not path.exists():
+        path.write_bytes(data)
+
+
+def leer_enlaces(enlaces_path=ENLACES_CSV_PATH, candidatos_path=None):
+    """
+    Enlaces por ciudad, del mejor al peor: ciudad -> [url, ...].
+    Usa `candidatos_imagenes.csv` (misma carpeta que `enlaces_path`) si existe; las
+    ciudades que no estén ahí usan su único enlace de `enlaces_imagenes.csv`.
+    Se descartan los valores que no son enlaces ("ERROR", "NO DISPONIBLE").
+    """
+    candidatos_path = Path(candidatos_path or Path(enlaces_path).with_name(CANDIDATOS_FILENAME))
+    enlaces = {}
+    if candidatos_path.exists():
+        candidatos = pd.read_csv(candidatos_path).sort_values(["ciudad", "rango"])
+        for ciudad, grupo in candidatos.groupby("ciudad", sort=False):
+            enlaces[ciudad] = [url for url in grupo["url_imagen"] if str(url).startswith("http")]
+    for ciudad, url in pd.read_csv(enlaces_path)[["ciudad", "url_imagen"]].itertuples(index=False):
+        if ciudad not in enlaces and str(url).startswith("http"):
+            enlaces[ciudad] = [url]
+    return {ciudad: urls for ciudad, urls in enlaces.items() if urls}
+
+
+def _vigente(filas, urls, miniaturas_dir):
+    """True si la ciudad ya tiene miniaturas de uno de sus enlaces y todos sus archivos existen."""
+    return (
+        not filas.empty
+        and filas["url_imagen"].isin(urls).all()
+        and all((Path(miniaturas_dir) / archivo).exists() for archivo in filas["archivo"])
+        and set(zip(filas["ancho"], filas["formato"])) >= {(a, f) for a in MINIATURA_ANCHOS for f in FORMATOS}
+    )
+
+
+def _procesar_ciudad(client, ciudad, urls, images_dir, miniaturas_dir):
+    """Prueba los enlaces en orden hasta que uno se descarga y se puede leer como imagen."""
+    for rango, url in enumerate(urls, start=1):
+        try:
+            data, hash_imagen = descargar_imagen(client, url)
+            generadas = generar_miniaturas(data, hash_imagen, miniaturas_dir)
+        except Exception as e:
+            if rango == len(urls):
+                raise
+            logging.warning(f"⚠️ {ciudad}: candidato {rango} no disponible ({e}), se prueba el siguiente")
+            continue
+        guardar_original(data, hash_imagen, images_dir)
+        return [
+            {"ciudad": ciudad, "url_imagen": url, "hash": hash_imagen, "ancho": ancho, "formato": formato, "archivo": archivo}
+            for ancho, formato, archivo in generadas
+        ]
+
+
+def procesar_imagenes(enlaces_path=ENLACES_CSV_PATH, images_dir=IMAGES_DIR, max_workers=MAX_WORKERS,
+                      candidatos_path=None, reintentar=False, miniaturas_dir=MINIATURAS_DIR):
+    """
+    Descarga las imágenes nuevas o cambiadas de los enlaces, genera sus miniaturas y
+    actualiza el índice. Devuelve el índice como DataFrame.
+    Las ciudades sin enlace válido ("ERROR", "NO DISPONIBLE") o cuyos candidatos fallan
+    todos conservan sus miniaturas anteriores, si las tenían. Las que fallaron hace poco
+    (ver `espera_fallo`) se saltan, salvo que cambien sus enlaces o se pida `reintentar`.
+    """
+    enlaces = leer_enlaces(enlaces_path, candidatos_path)
+    indice = leer_indice(images_dir)
+    fallos = leer_fallos(images_dir)
+    ahora = time.time()
+
+    filas = []
+    pendientes = []
+    en_espera = 0
+    for ciudad, urls in enlaces.items():
+        anteriores = indice[indice["ciudad"] == ciudad]
+        if _vigente(anteriores, urls, miniaturas_dir):
+            filas += anteriores.to_dict("records")
+            fallos.pop(ciudad, None)
+            continue
+        hash_enlaces, intentos, ultimo = fallos.get(ciudad, (None, 0, 0.0))
+        if hash_enlaces != _hash_enlaces(urls):
+            fallos.pop(ciudad, None)
+        elif not reintentar and ahora < ultimo + espera_fallo(intentos):
+            filas += anteriores.to_dict("records")
+            en_espera += 1
+            continue
+        pendientes.append((ciudad, urls, anteriores))
+    if en_espera:
+        logging.info(f"⏳ {en_espera} ciudades fallaron hace poco y no se reintentan aún ({FALLOS_FILENAME})")
+
+    if pendientes:
+        logging.info(f"🖼️ Descargando {len(pendientes)} imágenes nuevas o cambiadas...")
+        client = get_http_client()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [(executor.submit(_procesar_ciudad, client, ciudad, urls, images_dir, miniaturas_dir), ciudad, anteriores)
+                       for ciudad, urls, anteriores in pendientes]
+            for futuro, ciudad, anteriores in futuros:
+                try:
+                    filas += futuro.result()
+                    fallos.pop(ciudad, None)
+                    logging.info(f"✅ {ciudad}: miniaturas generadas")
+                except Exception as e:
+                    intentos = fallos[ciudad][1] + 1 if ciudad in fallos else 1
+                    fallos[ciudad] = (_hash_enlaces(enlaces[ciudad]), intentos, time.time())
+                    logging.error(f"❌ Error con la imagen de {ciudad} (fallo {intentos}, "
+                                  f"se reintenta en {espera_fallo(intentos) / 3600:.0f} h): {e}")
+                    filas += anteriores.to_dict("records")
+        client.log_stats()
+
+    # Se conservan también las ciudades que ya no están en el CSV de enlaces
+    procesadas = {fila["ciudad"] for fila in filas} | set(enlaces)
+    filas += indice[~indice["ciudad"].isin(procesadas)].to_dict("records")
+
+    indice = pd.DataFrame(filas, columns=INDICE_COLUMNS).sort_values(["ciudad", "ancho", "formato"])
+    Path(images_dir).mkdir(parents=True, exist_ok=True)
+    indice.to_csv(Path(images_dir) / INDICE_FILENAME, index=False)
+    guardar_fallos({ciudad: fallo for ciudad, fallo in fallos.items() if ciudad in enlaces}, images_dir)
+    logging.info(f"📁 Índice de imágenes: {indice['ciudad'].nunique()} ciudades, {len(indice)} miniaturas")
+    return indice
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descarga las imágenes de destinos y genera miniaturas locales")
+    parser.add_argument("--enlaces", default=str(ENLACES_CSV_PATH), help="CSV con las columnas ciudad,url_imagen")
+    parser.add_argument("--candidatos", default=None,
+                        help=f"CSV de candidatos ordenados (por defecto {CANDIDATOS_FILENAME} junto a --enlaces)")
+    parser.add_argument("--salida", default=str(IMAGES_DIR), help="Carpeta del índice, los originales y los fallos")
+    parser.add_argument("--miniaturas", default=str(MINIATURAS_DIR),
+                        help="Carpeta de las miniaturas (la carpeta static/ del frontend las sirve)")
+    parser.add_argument("--reintentar", action="store_true",
+                        help=f"Reintenta también las ciudades en espera por fallos recientes ({FALLOS_FILENAME})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    procesar_imagenes(args.enlaces, args.salida, candidatos_path=args.candidatos, reintentar=args.reintentar,
+                      miniaturas_dir=args.miniaturas)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,34 @@
-import requests
-import csv
-from pathlib import Path
+# backend/scraping/imagenes/scraper.py
+"""
+Búsqueda de imágenes de destinos con SerpAPI (Google Imágenes).
+- Todas las búsquedas se hacen en paralelo con el cliente HTTP compartido
+- Cada respuesta se guarda en disco con su fecha: mientras no venza el TTL no se vuelve a pagar la consulta
+- Se guardan varios candidatos ordenados por posición, así el procesador puede pasar
+  al siguiente si un enlace está roto sin volver a consultar
+- `--url` permite usar el servidor local `mock_serpapi.py` en lugar de SerpAPI
+
+Uso:
+    python backend/scraping/imagenes/scraper.py
+    python backend/scraping/imagenes/scraper.py --url http://127.0.0.1:8767/search --ttl-dias 0
+"""
+
+import argparse
+import hashlib
+import json
+import logging
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
 from dotenv import load_dotenv
 
+# Permite ejecutar el script directamente e importar el paquete backend
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from backend.scraping.http_client import get_http_client
+
 load_dotenv()
 API_KEY = os.getenv('SERPAPI_KEY')
 
@@ -17,46 +42,160 @@ CIUDADES = {
     "Huaraz": "Ciudad de Huaraz Perú"
 }
 
-# Ruta para guardar el CSV
+SERPAPI_URL = "https://serpapi.com/search"
+CACHE_TTL_DAYS = 30     # Días que una respuesta guardada se considera vigente
+MAX_CANDIDATOS = 5      # Imágenes por destino, en el orden de Google
+MAX_WORKERS = 6
+REQUEST_TIMEOUT = 30
+
+# Rutas de salida
 PROYECTO_ROOT = Path(__file__).resolve().parents[3]
-SALIDA_CSV = PROYECTO_ROOT / "data" / "raw" / "imagenes" / "enlaces_imagenes.csv"
-SALIDA_CSV.parent.mkdir(parents=True, exist_ok=True)
-
-# Diccionario final
-enlaces = {}
-
-# Scraping con SerpAPI
-for ciudad, query in CIUDADES.items():
-    print(f"🔎 Buscando imagen para: {ciudad}")
-    params = {
-        "engine": "google",
-        "q": query,
-        "tbm": "isch",
-        "api_key": API_KEY
-    }
+IMAGENES_RAW_DIR = PROYECTO_ROOT / "data" / "raw" / "imagenes"
+SALIDA_CSV = IMAGENES_RAW_DIR / "enlaces_imagenes.csv"
+CANDIDATOS_CSV = IMAGENES_RAW_DIR / "candidatos_imagenes.csv"
+CACHE_DIR = IMAGENES_RAW_DIR / "cache"
+CANDIDATOS_COLUMNS = ["ciudad", "rango", "url_imagen", "ancho", "alto", "titulo", "fuente"]
+
+
+def query_params(query):
+    """Parámetros de la búsqueda sin la clave de la API (lo que identifica la consulta)."""
+    return {"engine": "google", "q": query, "tbm": "isch"}
+
+
+def cache_path(params, cache_dir=CACHE_DIR):
+    key = hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{key[:32]}.json"
+
+
+def leer_cache(params, ttl, cache_dir=CACHE_DIR, now=None):
+    """
+    Respuesta guardada para `params` y si sigue vigente: (data, vigente).
+    Devuelve (None, False) si no hay nada guardado.
+    """
+    path = cache_path(params, cache_dir)
+    if not path.exists():
+        return None, False
+    with open(path, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    now = now or datetime.now(timezone.utc)
+    vigente = now - datetime.fromisoformat(entry["fetched_at"]) < ttl
+    return entry["response"], vigente
 
+
+def guardar_cache(params, data, cache_dir=CACHE_DIR):
+    path = cache_path(params, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {"fetched_at": datetime.now(timezone.utc).isoformat(), "query": params, "response": data}
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def buscar_imagenes(client, query, url=SERPAPI_URL, ttl=timedelta(days=CACHE_TTL_DAYS), cache_dir=CACHE_DIR):
+    """
+    Resultados de SerpAPI para `query`: de la caché si siguen vigentes y, si no, de la API.
+    Si la API falla y hay una respuesta vencida, se usa esa. Devuelve (data, origen).
+    """
+    params = query_params(query)
+    cached, vigente = leer_cache(params, ttl, cache_dir)
+    if vigente:
+        return cached, "caché"
     try:
-        response = requests.get("https://serpapi.com/search", params=params)
+        response = client.get(url, params=dict(params, api_key=API_KEY), timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
+    except Exception:
+        if cached is None:
+            raise
+        logging.warning(f"⚠️ Falló la búsqueda '{query}', se usa la respuesta vencida de la caché")
+        return cached, "caché vencida"
+    guardar_cache(params, data, cache_dir)
+    return data, "api"
+
+
+def candidatos(data, max_candidatos=MAX_CANDIDATOS):
+    """Hasta `max_candidatos` imágenes con enlace original válido, en el orden de Google."""
+    resultados = sorted(data.get("images_results") or [], key=lambda r: r.get("position", float("inf")))
+    elegidos, vistos = [], set()
+    for resultado in resultados:
+        url = resultado.get("original")
+        if not url or not url.startswith("http") or url in vistos:
+            continue
+        vistos.add(url)
+        elegidos.append({
+            "rango": len(elegidos) + 1,
+            "url_imagen": url,
+            "ancho": resultado.get("original_width"),
+            "alto": resultado.get("original_height"),
+            "titulo": resultado.get("title"),
+            "fuente": resultado.get("source"),
+        })
+        if len(elegidos) >= max_candidatos:
+            break
+    return elegidos
+
+
+def buscar_destinos(ciudades=None, url=SERPAPI_URL, ttl=timedelta(days=CACHE_TTL_DAYS), cache_dir=CACHE_DIR,
+                    max_candidatos=MAX_CANDIDATOS, max_workers=MAX_WORKERS):
+    """
+    Busca en paralelo las imágenes de cada ciudad y devuelve (candidatos, enlaces):
+    todos los candidatos ordenados y el mejor por ciudad ("NO DISPONIBLE"/"ERROR" si no hay).
+    """
+    ciudades = ciudades or CIUDADES
+    client = get_http_client()
+    filas, enlaces = [], {}
+    origenes = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {ciudad: executor.submit(buscar_imagenes, client, query, url, ttl, cache_dir)
+                   for ciudad, query in ciudades.items()}
+        for ciudad, futuro in futuros.items():
+            try:
+                data, origen = futuro.result()
+            except Exception as e:
+                enlaces[ciudad] = "ERROR"
+                print(f"❌ Error con {ciudad}: {e}")
+                continue
+            origenes[origen] = origenes.get(origen, 0) + 1
+            elegidos = candidatos(data, max_candidatos)
+            if elegidos:
+                enlaces[ciudad] = elegidos[0]["url_imagen"]
+                filas += [dict(candidato, ciudad=ciudad) for candidato in elegidos]
+                print(f"✅ {ciudad}: {len(elegidos)} candidatos ({origen})")
+            else:
+                enlaces[ciudad] = "NO DISPONIBLE"
+                print(f"⚠️ No se encontró imagen para {ciudad}")
+
+    print(f"💾 Respuestas por origen: {origenes}")
+    client.log_stats(print)
+    df_candidatos = pd.DataFrame(filas, columns=CANDIDATOS_COLUMNS)
+    df_enlaces = pd.DataFrame(list(enlaces.items()), columns=["ciudad", "url_imagen"])
+    return df_candidatos, df_enlaces
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca imágenes de los destinos con SerpAPI")
+    parser.add_argument("--url", default=SERPAPI_URL, help="Endpoint de búsqueda (o el servidor local)")
+    parser.add_argument("--ttl-dias", type=float, default=CACHE_TTL_DAYS,
+                        help="Días que una respuesta guardada es vigente (0 = consultar siempre)")
+    parser.add_argument("--candidatos", type=int, default=MAX_CANDIDATOS, help="Imágenes a guardar por destino")
+    parser.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Búsquedas simultáneas")
+    parser.add_argument("--cache", default=str(CACHE_DIR), help="Carpeta de respuestas guardadas")
+    parser.add_argument("--salida", default=str(IMAGENES_RAW_DIR), help="Carpeta de los CSV de enlaces")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    df_candidatos, df_enlaces = buscar_destinos(
+        url=args.url, ttl=timedelta(days=args.ttl_dias), cache_dir=args.cache,
+        max_candidatos=args.candidatos, max_workers=args.hilos
+    )
+
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    df_enlaces.to_csv(salida / SALIDA_CSV.name, index=False)
+    df_candidatos.to_csv(salida / CANDIDATOS_CSV.name, index=False)
+    print(f"\n📁 Enlaces guardados en: {salida / SALIDA_CSV.name} ({len(df_candidatos)} candidatos en "
+          f"{CANDIDATOS_CSV.name})")
+
 
-        if "images_results" in data and data["images_results"]:
-            url_imagen = data["images_results"][0]["original"]
-            enlaces[ciudad] = url_imagen
-            print(f"✅ {ciudad}: {url_imagen}")
-        else:
-            enlaces[ciudad] = "NO DISPONIBLE"
-            print(f"⚠️ No se encontró imagen para {ciudad}")
-
-    except Exception as e:
-        enlaces[ciudad] = "ERROR"
-        print(f"❌ Error con {ciudad}: {e}")
-
-# Guardar CSV
-with open(SALIDA_CSV, "w", encoding="utf-8", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["ciudad", "url_imagen"])
-    for ciudad, url in enlaces.items():
-        writer.writerow([ciudad, url])
-
-print(f"\n📁 Enlaces guardados en: {SALIDA_CSV}")
+if __name__ == "__main__":
+    main()
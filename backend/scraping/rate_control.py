@@ -0,0 +1,162 @@
+# backend/scraping/rate_control.py
+"""
+Control adaptativo de la tasa de peticiones (AIMD).
+- Aumento aditivo de la tasa mientras el servidor responde bien y rápido
+- Reducción multiplicativa ante 429/5xx, timeouts o latencia excesiva
+- La tasa actual y cada reducción quedan registradas en el log
+- Cubeta de tokens compartida entre procesos para un tope global de cortesía
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+
+import requests
+
+# Códigos que indican que el servidor está saturado o nos está limitando
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class SharedTokenBucket:
+    """
+    Cubeta de tokens en memoria compartida, válida entre procesos.
+    Permite ráfagas de hasta `capacity` peticiones y, en régimen, `rate` por segundo
+    sumando todos los procesos. Se implementa como reserva de turnos (GCRA), que
+    equivale a una cubeta de tokens pero solo necesita un número compartido:
+    el instante teórico de la siguiente petición.
+    Se crea en el proceso padre y se pasa a los hijos al arrancarlos.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._lock = multiprocessing.Lock()
+        self._next_slot = multiprocessing.Value("d", 0.0, lock=False)
+
+    def reserve(self, not_before=0.0):
+        """
+        Reserva un token para dentro de `not_before` segundos como mínimo y
+        devuelve cuántos segundos hay que esperar desde ahora.
+        """
+        interval = 1.0 / self.rate
+        burst = (self.capacity - 1) * interval
+        with self._lock:
+            # time.time y no monotonic: el reloj tiene que ser el mismo en todos los procesos
+            now = time.time()
+            earliest = now + not_before
+            start = max(earliest, self._next_slot.value - burst)
+            self._next_slot.value = max(self._next_slot.value, earliest) + interval
+        return max(0.0, start - now)
+
+
+class AimdRateController:
+    """
+    Controlador AIMD de peticiones por segundo hacia un host.
+    Se alimenta con cada intento HTTP (incluidos los reintentos) a través de
+    `on_response` / `on_error`, y expone el intervalo que hay que respetar
+    entre inicios de petición. Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=0.2, max_rate=10.0,
+                 increase_step=0.2, decrease_factor=0.5, latency_target=3.0,
+                 latency_decrease_factor=0.8, log_every=25, name="redbus", shared_bucket=None):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.latency_decrease_factor = latency_decrease_factor
+        self.log_every = log_every
+        self.name = name
+        # Tope global (SharedTokenBucket) cuando varios procesos piden al mismo host
+        self.shared_bucket = shared_bucket
+
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._lock = threading.Lock()
+        self._latency_ewma = None
+        self._last_decrease = 0.0
+        self._next_slot = 0.0
+        self.successes = 0
+        self.backoff_events = 0
+
+    @property
+    def rate(self):
+        """Peticiones por segundo permitidas en este momento."""
+        return self._rate
+
+    @property
+    def interval(self):
+        """Segundos mínimos entre inicios de petición."""
+        return 1.0 / self._rate
+
+    def _decrease(self, factor, reason):
+        # Una sola reducción por "ventana" (latencia típica o intervalo actual):
+        # cuando llegan varios 429 a la vez por peticiones en vuelo, cuentan como uno.
+        now = time.monotonic()
+        window = max(self._latency_ewma or 0.0, self.interval)
+        if now - self._last_decrease < window or self._rate <= self.min_rate:
+            return
+        self._last_decrease = now
+        previous = self._rate
+        self._rate = max(self.min_rate, self._rate * factor)
+        self.backoff_events += 1
+        logging.warning(
+            f"🐢 [{self.name}] Reducción de tasa por {reason}: {previous:.2f} -> {self._rate:.2f} req/s"
+        )
+
+    def on_response(self, response, elapsed):
+        """Registra una respuesta HTTP y su latencia total en segundos."""
+        with self._lock:
+            if response.status_code in THROTTLE_STATUS_CODES:
+                self._decrease(self.decrease_factor, f"HTTP {response.status_code}")
+                return
+
+            self._latency_ewma = elapsed if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * elapsed
+            if self._latency_ewma > self.latency_target:
+                self._decrease(self.latency_decrease_factor, f"latencia {self._latency_ewma:.1f}s")
+            else:
+                # step / rate por respuesta equivale a sumar `increase_step` req/s
+                # por cada segundo de tráfico sano, sin importar la tasa actual
+                self._rate = min(self.max_rate, self._rate + self.increase_step / self._rate)
+
+            self.successes += 1
+            if self.log_every and self.successes % self.log_every == 0:
+                logging.info(
+                    f"📈 [{self.name}] Tasa actual: {self._rate:.2f} req/s | "
+                    f"latencia media {self._latency_ewma:.2f}s | reducciones: {self.backoff_events}"
+                )
+
+    def on_error(self, exc, elapsed):
+        """Registra un fallo de red; los timeouts y errores de conexión reducen la tasa."""
+        if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            with self._lock:
+                self._decrease(self.decrease_factor, type(exc).__name__)
+
+    def reserve(self):
+        """
+        Reserva el siguiente turno y devuelve cuántos segundos hay que esperar.
+        Sirve tanto para código síncrono (`wait`) como para asyncio.
+        Con `shared_bucket`, el turno además respeta el tope global entre procesos.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if self.shared_bucket is not None:
+            wait = self.shared_bucket.reserve(wait)
+        return wait
+
+    def wait(self):
+        """Bloquea hasta el siguiente turno permitido."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def summary(self):
+        return {
+            "rate": round(self._rate, 3),
+            "latency_ewma": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+            "successes": self.successes,
+            "backoff_events": self.backoff_events,
+        }
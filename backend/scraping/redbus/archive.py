@@ -0,0 +1,196 @@
+# backend/scraping/redbus/archive.py
+"""
+Archivo crudo de RedBus en segmentos comprimidos de solo-anexado.
+- Cada respuesta se añade como una línea NDJSON comprimida (un miembro gzip
+  independiente) al segmento activo, en lugar de crear un JSON por ruta-fecha
+- Un índice SQLite al lado guarda (ruta, fecha, fetched_at) -> segmento, offset y longitud
+- El ETL abre los segmentos con mmap y descomprime solo los registros que necesita
+"""
+
+import contextlib
+import gzip
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+try:
+    import orjson
+    _loads = orjson.loads  # Más rápido al leer registros; el ETL lee miles
+except ImportError:  # orjson es opcional
+    _loads = json.loads
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".ndjson.gz"
+INDEX_FILENAME = "index.db"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:05d}{SEGMENT_SUFFIX}"
+
+
+def _segment_number(name):
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def _latest_segment(archive_dir):
+    existing = [
+        _segment_number(name) for name in os.listdir(archive_dir)
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+    ]
+    return max(existing, default=1)
+
+
+def _connect_index(archive_dir):
+    # timeout: con crawl en varios procesos, el índice se comparte y puede estar ocupado un instante
+    conn = sqlite3.connect(os.path.join(archive_dir, INDEX_FILENAME), check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive_index (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        from_city_id INTEGER,
+        to_city_id INTEGER,
+        origen TEXT,
+        destino TEXT,
+        date_str TEXT NOT NULL,
+        fetched_at TEXT NOT NULL,
+        content_hash TEXT NOT NULL
+    );
+    """)
+    conn.execute("""
+    CREATE INDEX IF NOT EXISTS idx_archive_route
+    ON archive_index (from_city_id, to_city_id, date_str, fetched_at);
+    """)
+    conn.commit()
+    return conn
+
+
+class RawArchive:
+    """
+    Escritor del archivo de segmentos. Es seguro usarlo desde varios hilos.
+    Para escribir desde varios procesos, todos deben recibir el mismo
+    `process_lock` (un multiprocessing.Lock creado en el proceso padre).
+    El segmento se escribe antes que el índice: si el proceso se cae entre
+    ambos pasos, solo quedan bytes huérfanos que nadie referencia.
+    """
+
+    def __init__(self, archive_dir, segment_max_bytes=SEGMENT_MAX_BYTES, process_lock=None):
+        os.makedirs(archive_dir, exist_ok=True)
+        self.archive_dir = archive_dir
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._process_lock = process_lock
+        self.conn = _connect_index(archive_dir)
+        self._segment = _latest_segment(archive_dir)
+
+    def _current_segment(self, incoming_bytes):
+        if self._process_lock is not None:
+            # Otro proceso puede haber abierto un segmento nuevo
+            self._segment = max(self._segment, _latest_segment(self.archive_dir))
+        path = os.path.join(self.archive_dir, _segment_name(self._segment))
+        if os.path.exists(path) and os.path.getsize(path) + incoming_bytes > self.segment_max_bytes:
+            self._segment += 1
+            path = os.path.join(self.archive_dir, _segment_name(self._segment))
+            logging.info(f"🗃️ Nuevo segmento del archivo: {path}")
+        return path
+
+    def append(self, job, content, content_hash):
+        """
+        Añade una respuesta ya serializada (`content`, JSON en texto) al segmento activo.
+        Devuelve la ruta del segmento donde quedó guardada.
+        """
+        record = {
+            "from_city_id": job.from_city_id,
+            "to_city_id": job.to_city_id,
+            "origen": job.from_name.replace(" (Todos)", ""),
+            "destino": job.to_name.replace(" (Todos)", ""),
+            "date_str": job.date_str,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+            "content_hash": content_hash,
+        }
+        # La respuesta se inserta tal cual para no volver a serializarla
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"payload":' + content + "}\n"
+        blob = gzip.compress(line.encode("utf-8"))
+
+        with self._lock, self._process_lock or contextlib.nullcontext():
+            path = self._current_segment(len(blob))
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            self.conn.execute("""
+            INSERT INTO archive_index
+                (segment, offset, length, from_city_id, to_city_id, origen, destino, date_str, fetched_at, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (os.path.basename(path), offset, len(blob), record["from_city_id"], record["to_city_id"],
+                  record["origen"], record["destino"], record["date_str"], record["fetched_at"], content_hash))
+            self.conn.commit()
+        logging.info(f"✅ Registro archivado: {record['destino']} {record['date_str']} -> {os.path.basename(path)}@{offset}")
+        return path
+
+    def close(self):
+        self.conn.close()
+
+
+def latest_index_entries(archive_dir):
+    """
+    Entradas del índice con la descarga más reciente de cada (origen, destino, fecha).
+    """
+    if not os.path.exists(os.path.join(archive_dir, INDEX_FILENAME)):
+        return []
+    conn = _connect_index(archive_dir)
+    try:
+        cursor = conn.execute("""
+        SELECT segment, offset, length, origen, destino, date_str, fetched_at, content_hash
+        FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY from_city_id, to_city_id, date_str ORDER BY fetched_at DESC, id DESC
+            ) AS rn
+            FROM archive_index
+        )
+        WHERE rn = 1
+        ORDER BY segment, offset
+        """)
+        keys = ("segment", "offset", "length", "origen", "destino", "date_str", "fetched_at", "content_hash")
+        return [dict(zip(keys, row)) for row in cursor]
+    finally:
+        conn.close()
+
+
+def read_records(archive_dir, entries):
+    """
+    Lee los registros indicados abriendo cada segmento una sola vez con mmap
+    y descomprimiendo solo los bytes de cada registro. Devuelve (entrada, payload).
+    """
+    by_segment = {}
+    for entry in entries:
+        by_segment.setdefault(entry["segment"], []).append(entry)
+
+    for segment, segment_entries in by_segment.items():
+        path = os.path.join(archive_dir, segment)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for entry in sorted(segment_entries, key=lambda e: e["offset"]):
+                    try:
+                        raw = gzip.decompress(mm[entry["offset"]:entry["offset"] + entry["length"]])
+                        yield entry, _loads(raw)["payload"]
+                    except (OSError, EOFError, ValueError, KeyError) as e:
+                        logging.error(f"Registro corrupto en {segment}@{entry['offset']}: {e}")
+        except (FileNotFoundError, ValueError) as e:
+            logging.error(f"No se pudo abrir el segmento {path}: {e}")
+
+
+def load_latest_payloads(archive_dir):
+    """
+    Devuelve la respuesta más reciente de cada ruta-fecha del archivo como
+    lista de (entrada_del_índice, payload).
+    """
+    return list(read_records(archive_dir, latest_index_entries(archive_dir)))
@@ -17,4 +17,62 @@ BODY = {
     "CampaignFilter": [], "rtcBusTypeList": [], "at": [],
     "persuasionList": [], "bpIdentifier": [], "bcf": [],
     "opBusTypeFilterList": []
-}
\ No newline at end of file
+}
+
+# Endpoint de búsqueda (configurable para apuntar a un servidor local de pruebas)
+BASE_URL = "https://www.redbus.pe/search/SearchV4Results"
+
+# Parámetros del crawler concurrente
+MAX_CONCURRENCY = 8        # Peticiones simultáneas en total
+PER_HOST_CONCURRENCY = 4   # Peticiones simultáneas por host (cortesía)
+
+# Control adaptativo de tasa (AIMD) por host, en peticiones por segundo
+RATE_INITIAL = 2.0         # Tasa de arranque
+RATE_MIN = 0.2             # Nunca bajar de aquí
+RATE_MAX = 10.0            # Techo aunque el servidor vaya sobrado
+LATENCY_TARGET = 3.0       # Latencia media (s) a partir de la cual se frena
+REQUEST_TIMEOUT = 20
+
+# Paginación de SearchV4Results (offset/limit)
+PAGE_LIMIT = 20
+MAX_PAGES = 50             # Tope de seguridad por ruta-fecha
+
+# Proyección de campos al guardar: de los ~120 campos por servicio solo se
+# conservan los que usa el ETL (y algunos útiles para análisis futuros).
+RESPONSE_FIELDS = [
+    "parentSrcCityName", "parentDstCityName", "parentSrcCityId", "parentDstCityId", "busCounts"
+]
+INVENTORY_FIELDS = [
+    "routeId", "operatorId", "travelsName", "busType", "departureTime", "arrivalTime",
+    "fareList", "availableSeats", "totalSeats", "totalRatings"
+]
+SAVE_FULL_PAYLOAD = False  # True para guardar la respuesta completa (igual en formato compacto)
+
+# Claves que cambian en cada petición aunque el inventario sea el mismo;
+# se ignoran al calcular el hash de contenido para detectar respuestas repetidas.
+VOLATILE_KEYS = ["uuidAtSRP"]
+
+# Campos de cada servicio cuyo cambio entre descargas cuenta para la volatilidad de tarifas
+FARE_FIELDS = ["fareList", "availableSeats"]
+
+# Almacenamiento: "archivo" (segmentos NDJSON comprimidos + índice) o "json" (un archivo por ruta-fecha)
+STORAGE_FORMAT = "archivo"
+ARCHIVE_DIRNAME = "archive"
+
+# Planificación del crawl (planner.py): matriz origen × destino × fecha
+DEFAULT_ORIGIN = "Lima"     # Origen histórico: sus JSON sueltos no llevan el origen en el nombre
+CRAWL_ORIGINS = ["Lima"]    # Nombres de city_ids.json, o "todas" para usar cada ciudad como origen
+CRAWL_DESTINATIONS = "todas"
+CRAWL_DATE_FROM = None      # 'DD-MMM-YYYY'; None = hoy
+CRAWL_DATE_TO = None        # 'DD-MMM-YYYY'; None = CRAWL_DAYS_AHEAD días desde el inicio
+CRAWL_DAYS_AHEAD = 30
+URGENCY_HALF_LIFE_DAYS = 7  # Una salida a 7 días vale la mitad que una de hoy
+DEFAULT_VOLATILITY = 0.5    # Volatilidad supuesta de una ruta sin historial
+VOLATILITY_FLOOR = 0.25     # Peso mínimo para que las rutas estables no dejen de refrescarse
+
+# Programador por frescura (scheduler.py): prioridad = urgencia × probabilidad de estar desactualizado
+LEAD_TIME_BUCKETS = [2, 6, 13, 29]  # Días hasta la salida que separan grupos con distinta volatilidad
+DEFAULT_CHANGE_RATE = 0.02          # Cambios de tarifa por hora supuestos sin historial
+PRIOR_HOURS = 24                    # Peso (en horas observadas) de la tasa del grupo frente a la propia
+NOT_FOUND_RATE = 0.01               # Por hora: una ruta-fecha sin servicio rara vez empieza a tenerlo
+NOT_FOUND_MAX_STALE = 0.5           # Tope: nunca vale tanto como una con tarifas que cambian
@@ -0,0 +1,307 @@
+# backend/scraping/redbus/crawler.py
+"""
+Motor de crawling concurrente para RedBus.
+- Lanza muchas peticiones ruta-fecha a la vez con asyncio
+- Límite global de concurrencia configurable
+- Presupuesto de cortesía por host (concurrencia y tasa adaptativa AIMD)
+- Escribe los mismos archivos redbus_<destino>_<fecha>.json que scraper.py
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import requests
+
+from backend.scraping.http_client import HttpClient
+from backend.scraping.rate_control import AimdRateController
+from .config import (
+    HEADERS, COOKIES, BODY, BASE_URL, REQUEST_TIMEOUT,
+    MAX_CONCURRENCY, PER_HOST_CONCURRENCY, RATE_INITIAL, RATE_MIN, RATE_MAX, LATENCY_TARGET,
+    SAVE_FULL_PAYLOAD, MAX_PAGES
+)
+from .manifest import DEFAULT_MAX_AGE_HOURS, STATUS_OK, filter_jobs
+from .scraper import (
+    validate_date, build_search_params, remaining_offsets, missing_offset, merge_pages, total_bus_count,
+    route_output_path, serialize_payload, write_route_json, fare_fingerprint
+)
+
+
+@dataclass(frozen=True)
+class RouteJob:
+    """Una consulta ruta-fecha a RedBus."""
+    from_city_id: int
+    to_city_id: int
+    from_name: str
+    to_name: str
+    date_str: str
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    """Resultado de un trabajo: 'ok', 'unchanged', 'not_found', 'error' o 'invalid'."""
+    status: str
+    http_code: int = None
+    content_hash: str = None
+    output_path: str = None
+    fare_hash: str = None
+
+
+class HostBudget:
+    """
+    Presupuesto de cortesía para un host: limita las peticiones simultáneas
+    y espacia los inicios de petición según la tasa del controlador AIMD.
+    """
+
+    def __init__(self, max_concurrent=PER_HOST_CONCURRENCY, rate_controller=None):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.rate_controller = rate_controller or AimdRateController()
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            delay = self.rate_controller.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+def route_label(job):
+    """Etiqueta de la ruta (sin fecha) para agrupar la telemetría."""
+    return f"{job.from_name.replace(' (Todos)', '')}->{job.to_name.replace(' (Todos)', '')}"
+
+
+def _post_search(client, base_url, params, observer=None, label=None):
+    """Petición bloqueante (con reintentos); se ejecuta en el pool de hilos del crawler."""
+    return client.post(
+        base_url,
+        observer=observer,
+        label=label,
+        params=params,
+        headers=HEADERS,
+        cookies=COOKIES,
+        json=BODY,
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+def _store_result(job, data, output_dir, full_payload, archive, previous_hash):
+    """
+    Serializa y guarda la respuesta (en el pool de hilos). Si su hash coincide con
+    el de la última descarga, no se escribe nada y se devuelve 'unchanged'.
+    """
+    content, content_hash = serialize_payload(data, full_payload)
+    fare_hash = fare_fingerprint(data)
+    if previous_hash is not None and content_hash == previous_hash:
+        logging.info(f"♻️ Sin cambios: {job.to_name} {job.date_str}; no se reescribe.")
+        return FetchResult("unchanged", 200, content_hash, fare_hash=fare_hash)
+
+    if archive is not None:
+        output_path = archive.append(job, content, content_hash)
+    else:
+        output_path = route_output_path(output_dir, job.to_name, job.date_str, job.from_name)
+        write_route_json(content, output_path)
+    return FetchResult("ok", 200, content_hash, output_path, fare_hash)
+
+
+async def fetch_route(job, client, budget, executor, output_dir, base_url=BASE_URL,
+                      full_payload=SAVE_FULL_PAYLOAD, archive=None, previous_hash=None):
+    """
+    Descarga una ruta-fecha respetando el presupuesto del host y la guarda,
+    en el archivo de segmentos si se pasa `archive` o como JSON suelto si no.
+    La primera página informa el total (`busCounts`); el resto de páginas se
+    piden en paralelo y se unen en un único inventario. Si el contenido coincide
+    con `previous_hash` (última descarga), no se vuelve a escribir.
+    Devuelve un FetchResult con el estado, el código HTTP y el hash del JSON.
+    """
+    if not validate_date(job.date_str):
+        return FetchResult("invalid")
+
+    loop = asyncio.get_running_loop()
+
+    async def fetch_page(offset):
+        params = build_search_params(
+            job.from_city_id, job.to_city_id, job.from_name, job.to_name, job.date_str, offset=offset
+        )
+        async with budget:
+            return await loop.run_in_executor(
+                executor, _post_search, client, base_url, params, budget.rate_controller, route_label(job)
+            )
+
+    logging.info(f"🚌 Buscando: {job.from_name} -> {job.to_name} | Fecha: {job.date_str}")
+    try:
+        response = await fetch_page(0)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"❌ Error de red en {job.to_name} {job.date_str}: {e}")
+        return FetchResult("error")
+
+    if response.status_code == 200:
+        # Decodificar fuera del event loop
+        data = await loop.run_in_executor(executor, response.json)
+        offsets = remaining_offsets(data)
+        if offsets:
+            logging.info(f"📄 {job.to_name} {job.date_str}: {len(offsets)} páginas adicionales")
+        responses = await asyncio.gather(*(fetch_page(o) for o in offsets), return_exceptions=True)
+
+        pages = []
+        for offset, page in zip(offsets, responses):
+            if isinstance(page, Exception) or page.status_code != 200:
+                detail = page if isinstance(page, Exception) else f"código {page.status_code}"
+                logging.error(f"❌ Página offset={offset} de {job.to_name} {job.date_str} falló: {detail}")
+                return FetchResult("error", None if isinstance(page, Exception) else page.status_code)
+            pages.append(await loop.run_in_executor(executor, page.json))
+
+        # Si alguna página trajo menos que la primera, se pide lo que falte desde lo ya recibido
+        offset = missing_offset(data, pages)
+        while offset is not None and len(pages) + 1 < MAX_PAGES:
+            try:
+                page = await fetch_page(offset)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"❌ Página offset={offset} de {job.to_name} {job.date_str} falló: {e}")
+                return FetchResult("error")
+            if page.status_code != 200:
+                logging.error(f"❌ Página offset={offset} de {job.to_name} {job.date_str} falló: código {page.status_code}")
+                return FetchResult("error", page.status_code)
+            pages.append(await loop.run_in_executor(executor, page.json))
+            if not pages[-1].get("inventories"):
+                break
+            offset = missing_offset(data, pages)
+
+        if missing_offset(data, pages) is not None:
+            # No se guarda un inventario incompleto como si fuera completo
+            logging.error(f"❌ Inventario incompleto en {job.to_name} {job.date_str}: "
+                          f"recibidos {missing_offset(data, pages)} de {total_bus_count(data)} servicios")
+            return FetchResult("error", 200)
+
+        merged = merge_pages(data, pages)
+        return await loop.run_in_executor(
+            executor, _store_result, job, merged, output_dir, full_payload, archive, previous_hash
+        )
+    if response.status_code == 404:
+        logging.warning(f"⚠️ Ruta no encontrada (404) para {job.from_name} -> {job.to_name} en {job.date_str}.")
+        return FetchResult("not_found", 404)
+
+    logging.error(f"❌ Error en la petición: Código {response.status_code} para {job.from_name} -> {job.to_name}")
+    return FetchResult("error", response.status_code)
+
+
+async def crawl_routes(jobs, output_dir, max_concurrency=MAX_CONCURRENCY,
+                       per_host_concurrency=PER_HOST_CONCURRENCY,
+                       rate_initial=RATE_INITIAL, rate_max=RATE_MAX, base_url=BASE_URL,
+                       manifest=None, max_age_hours=DEFAULT_MAX_AGE_HOURS, only_failed=False,
+                       full_payload=SAVE_FULL_PAYLOAD, archive=None, time_budget=None,
+                       shared_bucket=None, telemetry=None):
+    """
+    Procesa la lista de trabajos con `max_concurrency` workers sobre una cola.
+    La cola respeta el orden de `jobs` (el planificador los entrega por prioridad);
+    con `time_budget` (segundos) no se empiezan trabajos nuevos al agotarse la ventana,
+    y los que quedan se cuentan como 'skipped' para la siguiente ejecución.
+    `shared_bucket` (SharedTokenBucket) impone además un tope de tasa común a varios procesos.
+    `telemetry` (Telemetry) recibe las fases, bytes y códigos de cada intento, agrupados por ruta.
+    Con `archive` (RawArchive) las respuestas se anexan a segmentos comprimidos
+    en lugar de escribirse como redbus_<destino>_<fecha>.json.
+    Si se pasa un `manifest` (CrawlManifest), se omiten las rutas-fecha frescas
+    y se registra el resultado de cada trabajo para poder reanudar.
+    Devuelve un resumen con el número de trabajos por resultado.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    if manifest is not None:
+        jobs = filter_jobs(
+            jobs, manifest,
+            lambda job: route_output_path(output_dir, job.to_name, job.date_str, job.from_name),
+            max_age_hours, only_failed
+        )
+
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    summary = {"ok": 0, "unchanged": 0, "not_found": 0, "error": 0, "invalid": 0, "skipped": 0}
+    # Todas las peticiones van al host de base_url, que comparte un único presupuesto
+    host = urlparse(base_url).netloc
+    rate_controller = AimdRateController(
+        initial_rate=rate_initial, min_rate=RATE_MIN, max_rate=rate_max,
+        latency_target=LATENCY_TARGET, name=host, shared_bucket=shared_bucket
+    )
+    budget = HostBudget(per_host_concurrency, rate_controller)
+    logging.info(
+        f"⚙️ Concurrencia: {max_concurrency} | Host {host}: {per_host_concurrency} simultáneas, "
+        f"tasa adaptativa {rate_initial}-{rate_max} req/s"
+    )
+
+    # Un pool keep-alive con una conexión por worker; 429/5xx se reintentan con backoff
+    client = HttpClient(pool_maxsize=max_concurrency, telemetry=telemetry)
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if deadline is not None and time.monotonic() > deadline:
+                summary["skipped"] += 1
+                queue.task_done()
+                continue
+            # Una fecha inválida no se pide ni se anota: marcarla como pendiente la
+            # dejaría en 'pending' para siempre, sumando intentos en cada ejecución
+            if not validate_date(job.date_str):
+                summary["invalid"] += 1
+                queue.task_done()
+                continue
+            previous_hash = None
+            if manifest is not None:
+                # Solo se compara con la última descarga si su contenido sigue guardado
+                previous = manifest.get(job)
+                if (previous is not None and previous["status"] == STATUS_OK
+                        and previous["output_path"] and os.path.exists(previous["output_path"])):
+                    previous_hash = previous["content_hash"]
+                manifest.mark_started(job)
+            try:
+                result = await fetch_route(
+                    job, client, budget, executor, output_dir, base_url, full_payload, archive, previous_hash
+                )
+            except Exception as e:
+                logging.error(f"❌ Error inesperado en {job.to_name} {job.date_str}: {e}")
+                result = FetchResult("error")
+            if manifest is not None:
+                manifest.record(
+                    job, result.status, result.http_code, result.content_hash, result.output_path, result.fare_hash
+                )
+            summary[result.status] += 1
+            queue.task_done()
+
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget else None
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        finally:
+            client.close()
+
+    elapsed = time.monotonic() - start
+    logging.info(f"📊 Crawl terminado en {elapsed:.1f}s: {summary}")
+    if summary["skipped"]:
+        logging.warning(f"⏰ Ventana agotada: {summary['skipped']} rutas-fecha de menor prioridad quedan para la próxima ejecución.")
+    client.log_stats()
+    logging.info(f"🚦 Control de tasa final: {rate_controller.summary()}")
+    if telemetry is not None:
+        telemetry.finish()
+        for label, p95 in telemetry.slowest_routes():
+            logging.info(f"🐌 Ruta lenta: {label} (p95 {p95:.2f}s)")
+    return summary
+
+
+def run_crawl(jobs, output_dir, **kwargs):
+    """Punto de entrada síncrono para `crawl_routes`."""
+    return asyncio.run(crawl_routes(jobs, output_dir, **kwargs))
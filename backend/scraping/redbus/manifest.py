@@ -0,0 +1,241 @@
+# backend/scraping/redbus/manifest.py
+"""
+Manifiesto del crawl de RedBus (tabla SQLite).
+- Registra estado, hora de descarga, hash del contenido y código HTTP de cada ruta-fecha
+- Permite saltar las rutas frescas, reintentar solo las fallidas y reanudar tras una caída
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# Estados posibles de una ruta-fecha
+STATUS_PENDING = "pending"      # Se empezó a descargar (si queda así, el proceso se cayó)
+STATUS_OK = "ok"
+STATUS_UNCHANGED = "unchanged"  # Resultado de una descarga idéntica a la anterior (se guarda como 'ok')
+STATUS_NOT_FOUND = "not_found"
+STATUS_ERROR = "error"
+
+DEFAULT_MAX_AGE_HOURS = 24
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class CrawlManifest:
+    """
+    Estado persistente del crawl, una fila por (origen, destino, fecha).
+    Cada cambio se confirma de inmediato para poder reanudar tras una caída.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        # timeout: en el crawl por procesos, cada proceso escribe en el mismo manifiesto
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_manifest (
+            from_city_id INTEGER NOT NULL,
+            to_city_id INTEGER NOT NULL,
+            date_str TEXT NOT NULL,
+            from_name TEXT,
+            to_name TEXT,
+            status TEXT NOT NULL,
+            http_code INTEGER,
+            content_hash TEXT,
+            output_path TEXT,
+            fetched_at TEXT,
+            changed_at TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            checks INTEGER NOT NULL DEFAULT 0,
+            changes INTEGER NOT NULL DEFAULT 0,
+            fare_hash TEXT,
+            fare_checked_at TEXT,
+            fare_changes INTEGER NOT NULL DEFAULT 0,
+            observed_hours REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (from_city_id, to_city_id, date_str)
+        );
+        """)
+        # Manifiestos creados antes de registrar cambios de contenido
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(crawl_manifest)")}
+        if "changed_at" not in columns:
+            self.conn.execute("ALTER TABLE crawl_manifest ADD COLUMN changed_at TEXT")
+        for column, definition in (
+            ("checks", "INTEGER NOT NULL DEFAULT 0"),
+            ("changes", "INTEGER NOT NULL DEFAULT 0"),
+            ("fare_hash", "TEXT"),
+            ("fare_checked_at", "TEXT"),
+            ("fare_changes", "INTEGER NOT NULL DEFAULT 0"),
+            ("observed_hours", "REAL NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE crawl_manifest ADD COLUMN {column} {definition}")
+        self.conn.commit()
+
+    def get(self, job):
+        """Fila del manifiesto para un trabajo, como diccionario (o None)."""
+        cursor = self.conn.execute(
+            "SELECT status, http_code, content_hash, output_path, fetched_at, changed_at, attempts "
+            "FROM crawl_manifest WHERE from_city_id = ? AND to_city_id = ? AND date_str = ?",
+            (job.from_city_id, job.to_city_id, job.date_str)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ("status", "http_code", "content_hash", "output_path", "fetched_at", "changed_at", "attempts")
+        return dict(zip(keys, row))
+
+    def should_fetch(self, job, output_path, max_age_hours=DEFAULT_MAX_AGE_HOURS, only_failed=False):
+        """
+        Decide si hay que volver a pedir una ruta-fecha.
+        - Fallidas o pendientes (caída a mitad de crawl): siempre.
+        - Con `only_failed`: solo esas.
+        - Correctas o 404: solo si superan `max_age_hours` o falta el archivo.
+        Si no hay fila pero el JSON ya existe y es reciente, se considera fresco.
+        """
+        row = self.get(job)
+        max_age = timedelta(hours=max_age_hours)
+
+        if row is None:
+            if only_failed:
+                return False
+            if os.path.exists(output_path):
+                modified = datetime.fromtimestamp(os.path.getmtime(output_path), timezone.utc)
+                return _now() - modified > max_age
+            return True
+
+        if row["status"] in (STATUS_ERROR, STATUS_PENDING):
+            return True
+        if only_failed:
+            return False
+        # El resultado puede vivir en un JSON suelto o en un segmento del archivo
+        stored_at = row["output_path"] or output_path
+        if row["status"] == STATUS_OK and not os.path.exists(stored_at):
+            return True
+        fetched_at = datetime.fromisoformat(row["fetched_at"]) if row["fetched_at"] else None
+        return fetched_at is None or _now() - fetched_at > max_age
+
+    def mark_started(self, job):
+        """Marca el trabajo como pendiente antes de lanzar la petición."""
+        self.conn.execute("""
+        INSERT INTO crawl_manifest (from_city_id, to_city_id, date_str, from_name, to_name, status, attempts)
+        VALUES (?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT (from_city_id, to_city_id, date_str)
+        DO UPDATE SET status = excluded.status, attempts = attempts + 1
+        """, (job.from_city_id, job.to_city_id, job.date_str, job.from_name, job.to_name, STATUS_PENDING))
+        self.conn.commit()
+
+    def _record_fares(self, job, fare_hash, now):
+        """
+        Compara las tarifas y asientos (`fare_hash`) con la revisión anterior:
+        suma las horas transcurridas a `observed_hours` y, si cambiaron, un cambio
+        a `fare_changes`. Con ambos, `fare_changes / observed_hours` estima los
+        cambios por hora de cada ruta-fecha.
+        """
+        row = self.conn.execute(
+            "SELECT fare_hash, fare_checked_at FROM crawl_manifest "
+            "WHERE from_city_id = ? AND to_city_id = ? AND date_str = ?",
+            (job.from_city_id, job.to_city_id, job.date_str)
+        ).fetchone()
+        if row is None:
+            return
+        previous_hash, checked_at = row
+        hours, changed = 0.0, 0
+        if previous_hash is not None and checked_at:
+            hours = (now - datetime.fromisoformat(checked_at)).total_seconds() / 3600
+            changed = int(previous_hash != fare_hash)
+        self.conn.execute("""
+        UPDATE crawl_manifest
+        SET fare_hash = ?, fare_checked_at = ?, fare_changes = fare_changes + ?, observed_hours = observed_hours + ?
+        WHERE from_city_id = ? AND to_city_id = ? AND date_str = ?
+        """, (fare_hash, now.isoformat(), changed, hours, job.from_city_id, job.to_city_id, job.date_str))
+
+    def record(self, job, status, http_code=None, content_hash=None, output_path=None, fare_hash=None):
+        """
+        Guarda el resultado final de un trabajo. `fetched_at` es la última vez
+        que se vio la ruta-fecha; `changed_at`, la última vez que cambió su contenido.
+        Una respuesta sin cambios solo actualiza `fetched_at`.
+        `checks` cuenta las respuestas correctas y `changes` las que traían contenido nuevo.
+        Con `fare_hash` se lleva además la cuenta de cambios de tarifas por hora observada.
+        """
+        if fare_hash is not None and status in (STATUS_OK, STATUS_UNCHANGED):
+            self._record_fares(job, fare_hash, _now())
+        now = _now().isoformat()
+        if status == STATUS_UNCHANGED:
+            self.conn.execute("""
+            UPDATE crawl_manifest SET status = ?, http_code = ?, fetched_at = ?, checks = checks + 1
+            WHERE from_city_id = ? AND to_city_id = ? AND date_str = ?
+            """, (STATUS_OK, http_code, now, job.from_city_id, job.to_city_id, job.date_str))
+            self.conn.commit()
+            return
+
+        changed_at = now if status == STATUS_OK else None
+        changed = 1 if status == STATUS_OK else 0
+        self.conn.execute("""
+        INSERT INTO crawl_manifest
+            (from_city_id, to_city_id, date_str, from_name, to_name, status, http_code,
+             content_hash, output_path, fetched_at, changed_at, attempts, checks, changes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT (from_city_id, to_city_id, date_str)
+        DO UPDATE SET status = excluded.status, http_code = excluded.http_code,
+            content_hash = COALESCE(excluded.content_hash, content_hash),
+            output_path = COALESCE(excluded.output_path, output_path),
+            fetched_at = excluded.fetched_at,
+            changed_at = COALESCE(excluded.changed_at, changed_at),
+            checks = checks + excluded.checks,
+            changes = changes + excluded.changes
+        """, (job.from_city_id, job.to_city_id, job.date_str, job.from_name, job.to_name,
+              status, http_code, content_hash, output_path, now, changed_at, changed, changed))
+        self.conn.commit()
+
+    def freshness_rows(self):
+        """
+        Historial de tarifas de cada ruta-fecha: (origen_id, destino_id, fecha) ->
+        estado, `fetched_at`, `fare_checked_at`, `fare_changes` y `observed_hours`.
+        """
+        cursor = self.conn.execute("""
+        SELECT from_city_id, to_city_id, date_str, status, fetched_at, fare_checked_at, fare_changes, observed_hours
+        FROM crawl_manifest
+        """)
+        keys = ("status", "fetched_at", "fare_checked_at", "fare_changes", "observed_hours")
+        return {tuple(row[:3]): dict(zip(keys, row[3:])) for row in cursor}
+
+    def route_volatility(self):
+        """
+        Fracción de revisiones que trajeron contenido nuevo, por ruta (origen, destino).
+        La primera descarga de cada fecha no cuenta: siempre es "nueva".
+        Las rutas sin al menos una revisión repetida no aparecen.
+        """
+        cursor = self.conn.execute("""
+        SELECT from_city_id, to_city_id,
+               CAST(SUM(MAX(changes - 1, 0)) AS REAL) / SUM(checks - 1)
+        FROM crawl_manifest
+        WHERE checks > 1
+        GROUP BY from_city_id, to_city_id
+        """)
+        return {(from_id, to_id): min(1.0, ratio) for from_id, to_id, ratio in cursor}
+
+    def summary(self):
+        """Número de rutas-fecha por estado."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM crawl_manifest GROUP BY status"))
+
+    def close(self):
+        self.conn.close()
+
+
+def filter_jobs(jobs, manifest, output_path_for, max_age_hours=DEFAULT_MAX_AGE_HOURS, only_failed=False):
+    """
+    Devuelve solo los trabajos que el manifiesto considera necesarios.
+    `output_path_for(job)` da la ruta del JSON de cada trabajo.
+    """
+    pending = [
+        job for job in jobs
+        if manifest.should_fetch(job, output_path_for(job), max_age_hours, only_failed)
+    ]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        logging.info(f"⏭️ Se omiten {skipped} rutas-fecha frescas según el manifiesto; quedan {len(pending)}.")
+    return pending
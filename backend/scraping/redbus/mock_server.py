@@ -0,0 +1,229 @@
+# backend/scraping/redbus/mock_server.py
+"""
+Servidor local que imita SearchV4Results a partir del corpus de data/raw/redbus.
+- Responde POST con fromCity/toCity/DOJ/limit/offset como la API real (JSON + busCounts)
+- Latencia, errores 429 y paginación configurables para pruebas de carga sin red
+- Al terminar (Ctrl+C) muestra cuántas peticiones sirvió y cuántos 429 devolvió
+
+Uso:
+    python -m backend.scraping.redbus.mock_server --puerto 8765 --latencia-ms 150 --prob-429 0.05
+    python -m backend.scraping.redbus.run_scraper --base-url http://127.0.0.1:8765/search/SearchV4Results
+"""
+
+import argparse
+import copy
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from .archive import load_latest_payloads
+from .config import ARCHIVE_DIRNAME
+from .planner import load_cities
+
+DEFAULT_CORPUS_DIR = Path(__file__).resolve().parents[3] / "data" / "raw" / "redbus"
+
+
+def load_corpus(corpus_dir=DEFAULT_CORPUS_DIR):
+    """
+    Respuestas del corpus por (destino, fecha): JSON sueltos y, si existe,
+    lo más reciente del archivo de segmentos. Se omiten las que no traen inventario.
+    """
+    corpus_dir = Path(corpus_dir)
+    corpus = {}
+    for file_path in corpus_dir.glob("redbus_*.json"):
+        parts = file_path.stem.split("_")[1:]
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(data.get("inventories"), list):
+            corpus[(parts[-2], parts[-1])] = data
+
+    archive_dir = corpus_dir / ARCHIVE_DIRNAME
+    if archive_dir.exists():
+        for entry, data in load_latest_payloads(archive_dir):
+            if data and isinstance(data.get("inventories"), list):
+                corpus[(entry["destino"], entry["date_str"])] = data
+    return corpus
+
+
+class MockRedBus:
+    """
+    Estado y reglas del servidor simulado. Es seguro entre hilos.
+    - `latency_ms` ± `jitter_ms`: espera antes de responder
+    - `prob_429`: probabilidad de contestar 429 con Retry-After
+    - `max_rps`: si se supera esta tasa (ventana de 1 s), se contesta 429
+    - `multiply`: repite el inventario N veces (con routeId distintos) para forzar varias páginas
+    - `max_page_size`: tope de servicios por página aunque se pida un `limit` mayor
+    """
+
+    def __init__(self, corpus, cities, latency_ms=0, jitter_ms=0, prob_429=0.0, max_rps=None,
+                 retry_after=1, multiply=1, max_page_size=None, seed=None):
+        self.corpus = corpus
+        self.names_by_id = {str(city_id): name for name, city_id in cities.items()}
+        self.by_destination = {}
+        for (destination, date_str), data in sorted(corpus.items()):
+            self.by_destination.setdefault(destination, []).append(data)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.prob_429 = prob_429
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.multiply = max(1, multiply)
+        self.max_page_size = max_page_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = []
+        self.stats = {"requests": 0, "ok": 0, "throttled": 0, "not_found": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _throttle(self):
+        """Decide si esta petición recibe un 429."""
+        with self._lock:
+            if self.prob_429 and self._random.random() < self.prob_429:
+                return True
+            if self.max_rps:
+                now = time.monotonic()
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.max_rps:
+                    return True
+                self._window.append(now)
+            return False
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def payload_for(self, to_city_id, date_str):
+        """
+        Respuesta del corpus para el destino y la fecha. Si la fecha no está,
+        se reutiliza otra del mismo destino (elegida de forma estable) para poder
+        simular cualquier fecha; destinos desconocidos devuelven None.
+        """
+        destination = self.names_by_id.get(str(to_city_id))
+        if destination is None:
+            return None
+        data = self.corpus.get((destination, date_str))
+        if data is None:
+            candidates = self.by_destination.get(destination)
+            if not candidates:
+                return None
+            data = candidates[sum(map(ord, date_str)) % len(candidates)]
+        return data
+
+    def search(self, params):
+        """Devuelve (código HTTP, cabeceras, cuerpo) para una petición de búsqueda."""
+        self._count("requests")
+        self._delay()
+        if self._throttle():
+            self._count("throttled")
+            return 429, {"Retry-After": str(self.retry_after)}, b'{"error":"Too Many Requests"}'
+
+        data = self.payload_for(params.get("toCity"), params.get("DOJ", ""))
+        if data is None:
+            self._count("not_found")
+            return 404, {}, b'{"error":"Not Found"}'
+
+        inventories = data["inventories"]
+        if self.multiply > 1:
+            inventories = []
+            for copy_number in range(self.multiply):
+                for inventory in data["inventories"]:
+                    inventory = dict(inventory)
+                    inventory["routeId"] = f"{inventory.get('routeId')}-{copy_number}"
+                    inventories.append(inventory)
+
+        limit = int(params.get("limit", 20))
+        if self.max_page_size:
+            limit = min(limit, self.max_page_size)
+        offset = int(params.get("offset", 0))
+
+        response = copy.copy(data)
+        response["inventories"] = inventories[offset:offset + limit]
+        response["busCounts"] = dict(data.get("busCounts") or {}, total=len(inventories))
+        self._count("ok")
+        return 200, {"Content-Type": "application/json"}, json.dumps(response, ensure_ascii=False).encode("utf-8")
+
+
+def make_handler(mock):
+    class SearchHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como el servidor real
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            if length:
+                self.rfile.read(length)
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            status, headers, body = mock.search(params)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return SearchHandler
+
+
+def serve(mock, host="127.0.0.1", port=8765):
+    """Arranca el servidor y bloquea hasta Ctrl+C."""
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    logging.info(f"🧪 Servidor simulado de RedBus en http://{host}:{port}/search/SearchV4Results "
+                 f"({len(mock.corpus)} rutas-fecha en el corpus)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"🧪 Servidor detenido: {mock.stats}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita SearchV4Results de RedBus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS_DIR),
+                        help="Carpeta con los JSON y el archivo de segmentos de RedBus")
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Latencia media por respuesta")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variación aleatoria de la latencia")
+    parser.add_argument("--prob-429", type=float, default=0.0, help="Probabilidad de responder 429")
+    parser.add_argument("--max-rps", type=float, default=None, help="Por encima de esta tasa se responde 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Segundos de la cabecera Retry-After")
+    parser.add_argument("--multiplicar", type=int, default=1,
+                        help="Repite el inventario N veces para forzar la paginación")
+    parser.add_argument("--max-por-pagina", type=int, default=None,
+                        help="Tope de servicios por página aunque el cliente pida más")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla para resultados reproducibles")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+    mock = MockRedBus(
+        load_corpus(args.corpus), load_cities(),
+        latency_ms=args.latencia_ms, jitter_ms=args.jitter_ms, prob_429=args.prob_429,
+        max_rps=args.max_rps, retry_after=args.retry_after, multiply=args.multiplicar,
+        max_page_size=args.max_por_pagina, seed=args.semilla
+    )
+    serve(mock, args.host, args.puerto)
+
+
+if __name__ == "__main__":
+    main()
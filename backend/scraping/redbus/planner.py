@@ -0,0 +1,113 @@
+# backend/scraping/redbus/planner.py
+"""
+Planificador del crawl de RedBus.
+- Construye la matriz origen × destino × fecha a partir de city_ids.json y config.py
+- Ordena los trabajos por prioridad: salidas cercanas y rutas volátiles primero
+- Así, si la ventana nocturna se acaba, lo que quedó sin refrescar es lo menos valioso
+"""
+
+import json
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .config import (
+    CRAWL_ORIGINS, CRAWL_DESTINATIONS, CRAWL_DATE_FROM, CRAWL_DATE_TO, CRAWL_DAYS_AHEAD,
+    URGENCY_HALF_LIFE_DAYS, DEFAULT_VOLATILITY, VOLATILITY_FLOOR
+)
+from .crawler import RouteJob
+
+CITY_IDS_PATH = Path(__file__).parent / "city_ids.json"
+ALL_CITIES = "todas"
+DATE_FORMAT = "%d-%b-%Y"
+
+
+def load_cities(path=CITY_IDS_PATH):
+    """Diccionario nombre -> id de RedBus de las ciudades configuradas."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def select_cities(cities, names):
+    """
+    Filtra las ciudades por nombre. `names` puede ser "todas" o una lista.
+    Los nombres desconocidos se avisan en el log y se ignoran.
+    """
+    if names == ALL_CITIES or names == [ALL_CITIES]:
+        return dict(cities)
+    unknown = [name for name in names if name not in cities]
+    if unknown:
+        logging.warning(f"⚠️ Ciudades no encontradas en city_ids.json, se ignoran: {unknown}")
+    return {name: cities[name] for name in names if name in cities}
+
+
+def plan_dates(date_from=CRAWL_DATE_FROM, date_to=CRAWL_DATE_TO, days_ahead=CRAWL_DAYS_AHEAD, today=None):
+    """
+    Fechas de salida a consultar, de `date_from` a `date_to` (formato 'DD-MMM-YYYY').
+    Sin `date_from` se empieza hoy; sin `date_to` se cubren `days_ahead` días.
+    Las fechas ya pasadas se descartan: RedBus no vende pasajes para ellas.
+    """
+    today = today or date.today()
+    start = datetime.strptime(date_from, DATE_FORMAT).date() if date_from else today
+    end = datetime.strptime(date_to, DATE_FORMAT).date() if date_to else start + timedelta(days=days_ahead - 1)
+
+    dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    past = sum(1 for day in dates if day < today)
+    if past:
+        logging.warning(f"⚠️ Se descartan {past} fechas anteriores a hoy ({today:%d-%b-%Y}).")
+    return [day for day in dates if day >= today]
+
+
+def departure_urgency(departure, today=None):
+    """
+    Cuánto importa una fecha de salida para quien busca: vale 1 hoy y cae
+    a la mitad cada URGENCY_HALF_LIFE_DAYS días.
+    """
+    days_ahead = max(0, (departure - (today or date.today())).days)
+    return 0.5 ** (days_ahead / URGENCY_HALF_LIFE_DAYS)
+
+
+def job_priority(departure, volatility, today=None):
+    """
+    Prioridad de una ruta-fecha: urgencia de la salida × volatilidad de la ruta.
+    VOLATILITY_FLOOR evita que una ruta estable quede siempre al final.
+    """
+    return departure_urgency(departure, today) * (VOLATILITY_FLOOR + volatility)
+
+
+def plan_jobs(cities, origins=CRAWL_ORIGINS, destinations=CRAWL_DESTINATIONS,
+              dates=None, volatility=None, today=None):
+    """
+    Devuelve los RouteJob de la matriz origen × destino × fecha, de mayor a menor prioridad.
+    `volatility` es un diccionario (origen_id, destino_id) -> [0, 1], por ejemplo
+    `CrawlManifest.route_volatility()`; las rutas sin historial usan DEFAULT_VOLATILITY.
+    """
+    today = today or date.today()
+    dates = plan_dates(today=today) if dates is None else dates
+    volatility = volatility or {}
+
+    scored = []
+    for from_name, from_id in select_cities(cities, origins).items():
+        for to_name, to_id in select_cities(cities, destinations).items():
+            if from_id == to_id:
+                continue
+            route_volatility = volatility.get((from_id, to_id), DEFAULT_VOLATILITY)
+            for departure in dates:
+                job = RouteJob(
+                    from_city_id=from_id,
+                    to_city_id=to_id,
+                    from_name=f"{from_name} (Todos)",
+                    to_name=f"{to_name} (Todos)", # Asumimos que el nombre en la API usa "(Todos)"
+                    date_str=departure.strftime(DATE_FORMAT)
+                )
+                scored.append((job_priority(departure, route_volatility, today), departure, job))
+
+    # Desempate: primero la fecha más cercana, luego el orden de city_ids.json
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    jobs = [job for _, _, job in scored]
+    if jobs:
+        logging.info(
+            f"🗺️ Plan: {len(jobs)} rutas-fecha ({len(select_cities(cities, origins))} orígenes, "
+            f"{len(dates)} fechas). Primera: {jobs[0].from_name} -> {jobs[0].to_name} {jobs[0].date_str}"
+        )
+    return jobs
@@ -1,9 +1,19 @@
 # Este script es para ejecutar el scraper de RedBus de forma independiente.
 
+import argparse
 import logging
 from pathlib import Path
-import json
-from .scraper import scrape_redbus_route # Importa la función desde scraper.py en el mismo directorio
+from .config import (
+    BASE_URL, MAX_CONCURRENCY, PER_HOST_CONCURRENCY, RATE_INITIAL, RATE_MAX, STORAGE_FORMAT, ARCHIVE_DIRNAME,
+    CRAWL_ORIGINS, CRAWL_DESTINATIONS, CRAWL_DATE_FROM, CRAWL_DATE_TO, CRAWL_DAYS_AHEAD
+)
+from .archive import RawArchive
+from .crawler import run_crawl # Motor concurrente que reutiliza la lógica de scraper.py
+from .manifest import CrawlManifest, DEFAULT_MAX_AGE_HOURS
+from .planner import load_cities, plan_dates, plan_jobs
+from .scheduler import schedule_jobs
+from .sharded import run_sharded_crawl
+from backend.scraping.telemetry import Telemetry
 
 # Configuración del logging para ver el progreso
 logging.basicConfig(
@@ -11,54 +21,132 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-def main():
+def parse_args(argv=None):
+    """
+    Argumentos de línea de comandos para ajustar la concurrencia del crawl.
+    """
+    parser = argparse.ArgumentParser(description="Scraper concurrente de RedBus")
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCY,
+                        help="Peticiones simultáneas en total")
+    parser.add_argument("--por-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help="Peticiones simultáneas permitidas por host")
+    parser.add_argument("--tasa-inicial", type=float, default=RATE_INITIAL,
+                        help="Peticiones por segundo al arrancar (luego se adapta según el servidor)")
+    parser.add_argument("--tasa-max", type=float, default=RATE_MAX,
+                        help="Tope de peticiones por segundo por host")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="Endpoint SearchV4Results (útil para un servidor local de pruebas)")
+    parser.add_argument("--max-edad-horas", type=float, default=DEFAULT_MAX_AGE_HOURS,
+                        help="Antigüedad a partir de la cual una ruta-fecha se vuelve a descargar")
+    parser.add_argument("--solo-fallidos", action="store_true",
+                        help="Reintenta solo las rutas-fecha fallidas o interrumpidas")
+    parser.add_argument("--forzar", action="store_true",
+                        help="Ignora el manifiesto y descarga todo de nuevo")
+    parser.add_argument("--payload-completo", action="store_true",
+                        help="Guarda la respuesta completa en lugar de solo los campos proyectados")
+    parser.add_argument("--formato", choices=["archivo", "json"], default=STORAGE_FORMAT,
+                        help="'archivo': segmentos comprimidos con índice; 'json': un archivo por ruta-fecha")
+    parser.add_argument("--origenes", nargs="+", default=CRAWL_ORIGINS,
+                        help="Ciudades de origen (nombres de city_ids.json) o 'todas'")
+    parser.add_argument("--destinos", nargs="+", default=CRAWL_DESTINATIONS,
+                        help="Ciudades de destino o 'todas'")
+    parser.add_argument("--desde", default=CRAWL_DATE_FROM,
+                        help="Primera fecha de salida 'DD-MMM-YYYY' (por defecto, hoy)")
+    parser.add_argument("--hasta", default=CRAWL_DATE_TO,
+                        help="Última fecha de salida 'DD-MMM-YYYY'")
+    parser.add_argument("--dias", type=int, default=CRAWL_DAYS_AHEAD,
+                        help="Días a cubrir desde --desde si no se indica --hasta")
+    parser.add_argument("--ventana-minutos", type=float, default=None,
+                        help="Tiempo máximo del crawl; lo de menor prioridad queda para la próxima vez")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Reparte el crawl en N procesos que comparten el tope de tasa")
+    parser.add_argument("--tasa-global", type=float, default=RATE_MAX,
+                        help="Con --procesos: peticiones por segundo hacia el host sumando todos los procesos")
+    parser.add_argument("--presupuesto", type=int, default=None,
+                        help="Consultas ruta-fecha de esta ejecución, repartidas por frescura y volatilidad de tarifas")
+    parser.add_argument("--sin-telemetria", action="store_true",
+                        help="No escribe el resumen de telemetría (JSON y Prometheus)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Función principal que orquesta el scraping de RedBus para el proyecto.
     """
-    logging.info("🚀 Iniciando scraping de RedBus para el mes de Julio...")
+    args = parse_args(argv)
+    logging.info("🚀 Iniciando scraping de RedBus...")
 
     # Cargar la configuración de ciudades
     try:
-        city_ids_path = Path(__file__).parent / "city_ids.json"
-        with open(city_ids_path, "r", encoding="utf-8") as f:
-            CITIES = json.load(f)
+        CITIES = load_cities()
     except FileNotFoundError:
         logging.error("Error: No se encontró el archivo 'city_ids.json'. Asegúrate de que exista.")
         return
 
-    # Parámetros fijos para el trabajo
-    ORIGIN_NAME = "Lima"
-    ORIGIN_ID = CITIES[ORIGIN_NAME]
-    TARGET_MONTH_STR = "Jul"
-    TARGET_YEAR_STR = "2025"
-
     # Definir la carpeta de salida
     OUTPUT_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data" / "raw" / "redbus"
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     logging.info(f"Los archivos se guardarán en: {OUTPUT_DIR}")
 
-    # Iterar sobre cada destino desde Lima
-    for city_name, city_id in CITIES.items():
-        if city_name == ORIGIN_NAME:
-            continue
+    # El manifiesto permite saltar lo fresco, reintentar lo fallido y reanudar tras una caída;
+    # su historial también da la volatilidad de cada ruta para priorizar
+    manifest = CrawlManifest(OUTPUT_DIR / "crawl_manifest.db")
 
-        logging.info(f"\n--- Procesando destino: {city_name} ---")
-        
-        # Scrapeamos para cada día de julio (desde el 3 hasta el 31)
-        for day in range(3, 32):
-            date_str = f"{day:02d}-{TARGET_MONTH_STR}-{TARGET_YEAR_STR}"
-            
-            # Llamamos a la función del scraper
-            scrape_redbus_route(
-                from_city_id=ORIGIN_ID,
-                to_city_id=city_id,
-                from_name=f"{ORIGIN_NAME} (Todos)",
-                to_name=f"{city_name} (Todos)", # Asumimos que el nombre en la API usa "(Todos)"
-                date_str=date_str,
-                output_dir=OUTPUT_DIR
+    # Matriz origen × destino × fecha, de mayor a menor prioridad
+    dates = plan_dates(args.desde, args.hasta, args.dias)
+    jobs = plan_jobs(CITIES, args.origenes, args.destinos, dates, volatility=manifest.route_volatility())
+
+    # Con presupuesto, el programador elige qué refrescar según la probabilidad de que
+    # las tarifas guardadas ya hayan cambiado (sustituye al filtro por antigüedad)
+    max_age_hours = 0 if args.forzar else args.max_edad_horas
+    if args.presupuesto is not None and not args.solo_fallidos:
+        jobs = schedule_jobs(jobs, manifest, budget=args.presupuesto)
+        max_age_hours = 0
+
+    logging.info(f"Se programaron {len(jobs)} consultas ruta-fecha.")
+
+    telemetry = None if args.sin_telemetria else Telemetry("redbus")
+    crawl_kwargs = dict(
+        max_concurrency=args.concurrencia,
+        per_host_concurrency=args.por_host,
+        rate_initial=args.tasa_inicial,
+        rate_max=args.tasa_max,
+        base_url=args.base_url,
+        max_age_hours=max_age_hours,
+        only_failed=args.solo_fallidos,
+        full_payload=args.payload_completo,
+        time_budget=args.ventana_minutos * 60 if args.ventana_minutos else None,
+        telemetry=telemetry
+    )
+
+    # Las consultas se ejecutan en paralelo con límites de concurrencia y cortesía
+    try:
+        if args.procesos > 1:
+            # Cada proceso abre su propio manifiesto y archivo sobre los mismos ficheros
+            run_sharded_crawl(
+                jobs,
+                OUTPUT_DIR,
+                args.procesos,
+                global_rate=args.tasa_global,
+                manifest_path=OUTPUT_DIR / "crawl_manifest.db",
+                archive_dir=OUTPUT_DIR / ARCHIVE_DIRNAME if args.formato == "archivo" else None,
+                **crawl_kwargs
             )
+        else:
+            archive = RawArchive(OUTPUT_DIR / ARCHIVE_DIRNAME) if args.formato == "archivo" else None
+            try:
+                run_crawl(jobs, OUTPUT_DIR, manifest=manifest, archive=archive, **crawl_kwargs)
+            finally:
+                if archive is not None:
+                    archive.close()
+        logging.info(f"📒 Estado del manifiesto: {manifest.summary()}")
+        if telemetry is not None:
+            telemetry.finish()
+            json_path, prom_path = telemetry.write(OUTPUT_DIR / "telemetry")
+            logging.info(f"📈 Telemetría guardada en {json_path} y {prom_path}")
+    finally:
+        manifest.close()
 
-    logging.info("\n✅ Scraping de RedBus para Julio completado.")
+    logging.info("\n✅ Scraping de RedBus completado.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,112 @@
+# backend/scraping/redbus/scheduler.py
+"""
+Programador de recrawl por frescura para RedBus.
+- Estima cuántas veces por hora cambian las tarifas y asientos (`fareList`, `availableSeats`)
+  de cada ruta-fecha, a partir de lo observado entre descargas (manifiesto)
+- Prioridad = urgencia de la salida × probabilidad de que lo guardado ya esté desactualizado
+- Reparte un presupuesto fijo de consultas: las salidas cercanas y cambiantes se refrescan
+  a menudo y las lejanas y estables casi nunca, sin hacer más peticiones
+"""
+
+import logging
+import math
+from datetime import date, datetime, timezone
+
+from .config import LEAD_TIME_BUCKETS, DEFAULT_CHANGE_RATE, PRIOR_HOURS, NOT_FOUND_RATE, NOT_FOUND_MAX_STALE
+from .manifest import STATUS_OK, STATUS_NOT_FOUND
+from .planner import DATE_FORMAT, departure_urgency
+
+
+def _departure(job):
+    return datetime.strptime(job.date_str, DATE_FORMAT).date()
+
+
+def lead_time_bucket(days_ahead):
+    """Índice del grupo de antelación (0 = salida en LEAD_TIME_BUCKETS[0] días o menos)."""
+    for index, limit in enumerate(LEAD_TIME_BUCKETS):
+        if days_ahead <= limit:
+            return index
+    return len(LEAD_TIME_BUCKETS)
+
+
+def bucket_change_rates(rows, today=None):
+    """
+    Cambios por hora de cada grupo de antelación, sumando todas las rutas-fecha
+    del manifiesto. Los grupos sin horas observadas usan DEFAULT_CHANGE_RATE.
+    """
+    today = today or date.today()
+    changes, hours = {}, {}
+    for (_, _, date_str), row in rows.items():
+        if not row["observed_hours"]:
+            continue
+        days_ahead = (datetime.strptime(date_str, DATE_FORMAT).date() - today).days
+        bucket = lead_time_bucket(max(0, days_ahead))
+        changes[bucket] = changes.get(bucket, 0) + row["fare_changes"]
+        hours[bucket] = hours.get(bucket, 0.0) + row["observed_hours"]
+    return {
+        bucket: changes.get(bucket, 0) / hours[bucket] if hours.get(bucket) else DEFAULT_CHANGE_RATE
+        for bucket in range(len(LEAD_TIME_BUCKETS) + 1)
+    }
+
+
+def change_rate(row, bucket_rate):
+    """
+    Cambios por hora de una ruta-fecha: su propio historial, suavizado con la tasa
+    de su grupo como si se hubieran observado PRIOR_HOURS horas más a ese ritmo.
+    """
+    changes = (row or {}).get("fare_changes") or 0
+    hours = (row or {}).get("observed_hours") or 0.0
+    return (changes + bucket_rate * PRIOR_HOURS) / (hours + PRIOR_HOURS)
+
+
+def stale_probability(row, rate, now=None):
+    """
+    Probabilidad de que las tarifas guardadas ya no sean las actuales, suponiendo
+    cambios de Poisson con `rate` por hora: 1 - e^(-tasa × horas desde la última revisión).
+    Una ruta-fecha sin servicio (`not_found`) usa su propia tasa, NOT_FOUND_RATE, desde la
+    última vez que se vio, con el tope NOT_FOUND_MAX_STALE: así no desplaza a las que
+    sí tienen tarifas. Sin ninguna descarga correcta (error, pendiente o nunca vista),
+    lo guardado se considera desactualizado (1).
+    """
+    if row is not None and row["status"] == STATUS_NOT_FOUND and row["fetched_at"]:
+        return min(NOT_FOUND_MAX_STALE, _poisson_stale(NOT_FOUND_RATE, row["fetched_at"], now))
+    if row is None or row["status"] != STATUS_OK or not row["fare_checked_at"]:
+        return 1.0
+    return _poisson_stale(rate, row["fare_checked_at"], now)
+
+
+def _poisson_stale(rate, checked_at, now=None):
+    """1 - e^(-tasa × horas) desde `checked_at` (ISO, UTC) hasta `now`."""
+    now = now or datetime.now(timezone.utc)
+    age_hours = max(0.0, (now - datetime.fromisoformat(checked_at)).total_seconds() / 3600)
+    return 1.0 - math.exp(-rate * age_hours)
+
+
+def schedule_jobs(jobs, manifest, budget=None, today=None, now=None):
+    """
+    Ordena los trabajos por urgencia × probabilidad de estar desactualizados y,
+    con `budget`, se queda solo con los `budget` más valiosos.
+    Registra en el log cuántas rutas-fecha desactualizadas se espera refrescar.
+    """
+    today = today or date.today()
+    rows = manifest.freshness_rows()
+    rates = bucket_change_rates(rows, today)
+
+    scored = []
+    for job in jobs:
+        departure = _departure(job)
+        row = rows.get((job.from_city_id, job.to_city_id, job.date_str))
+        bucket = lead_time_bucket(max(0, (departure - today).days))
+        stale = stale_probability(row, change_rate(row, rates[bucket]), now)
+        scored.append((departure_urgency(departure, today) * stale, stale, departure, job))
+    scored.sort(key=lambda item: (-item[0], item[2]))
+
+    selected = scored[:budget] if budget is not None else scored
+    expected_total = sum(stale for _, stale, _, _ in scored)
+    expected_selected = sum(stale for _, stale, _, _ in selected)
+    logging.info(
+        f"🧭 Programador: {len(selected)}/{len(scored)} rutas-fecha; se esperan refrescar "
+        f"{expected_selected:.1f} de {expected_total:.1f} desactualizadas. "
+        f"Cambios/hora por antelación: {', '.join(f'{rate:.3f}' for rate in rates.values())}"
+    )
+    return [job for _, _, _, job in selected]
@@ -2,75 +2,283 @@
 
 import os
 import json
-import time
-import random
+import hashlib
 import logging
 import requests
 from datetime import datetime
 
+from backend.scraping.http_client import get_http_client
+from backend.scraping.rate_control import AimdRateController
 # Importar la configuración desde el mismo directorio
-from .config import HEADERS, COOKIES, BODY
+from .config import (
+    HEADERS, COOKIES, BODY, BASE_URL, REQUEST_TIMEOUT, PAGE_LIMIT, MAX_PAGES,
+    RATE_INITIAL, RATE_MIN, RATE_MAX, LATENCY_TARGET,
+    RESPONSE_FIELDS, INVENTORY_FIELDS, SAVE_FULL_PAYLOAD, VOLATILE_KEYS, DEFAULT_ORIGIN, FARE_FIELDS
+)
 
-def scrape_redbus_route(from_city_id, to_city_id, from_name, to_name, date_str, output_dir):
+# Tasa adaptativa compartida por todas las llamadas síncronas a scrape_redbus_route
+_rate_controller = AimdRateController(
+    initial_rate=RATE_INITIAL, min_rate=RATE_MIN, max_rate=RATE_MAX, latency_target=LATENCY_TARGET
+)
+
+def validate_date(date_str):
     """
-    Realiza scraping a la API de RedBus para una ruta y fecha específicas.
-    Guarda el JSON crudo solo si la petición es exitosa (código 200).
+    Verifica que la fecha tenga el formato 'DD-MMM-YYYY' que espera RedBus.
     """
-    # Validar formato de fecha
     try:
         datetime.strptime(date_str, "%d-%b-%Y")
+        return True
     except ValueError:
         logging.error(f"❌ Fecha inválida: '{date_str}'. Usa 'DD-MMM-YYYY'.")
-        return
+        return False
 
-    # Crear el directorio de salida si no existe
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Construir la URL y los parámetros de forma segura
-    base_url = "https://www.redbus.pe/search/SearchV4Results"
-    params = {
+def build_search_params(from_city_id, to_city_id, from_name, to_name, date_str, limit=PAGE_LIMIT, offset=0):
+    """
+    Construye los parámetros de SearchV4Results para una ruta y fecha.
+    """
+    return {
         "fromCity": from_city_id,
         "toCity": to_city_id,
         "src": from_name,
         "dst": to_name,
         "DOJ": date_str,
-        "sectionId": 0, "groupId": 0, "limit": 20, "offset": 0,
+        "sectionId": 0, "groupId": 0, "limit": limit, "offset": offset,
         "sort": 0, "sortOrder": 0, "meta": "true", "returnSearch": 0
     }
 
+def total_bus_count(data):
+    """
+    Total de servicios que reporta RedBus para la búsqueda (`busCounts.total`).
+    Si no viene informado, se asume que la primera página es todo el inventario.
+    """
+    counts = (data or {}).get("busCounts") or {}
+    total = counts.get("total")
+    if isinstance(total, int):
+        return total
+    return len((data or {}).get("inventories") or [])
+
+def remaining_offsets(data, limit=PAGE_LIMIT, max_pages=MAX_PAGES):
+    """
+    Offsets de las páginas que faltan después de la primera, según `busCounts`.
+    El servidor puede devolver menos de `limit` servicios por página aunque haya más:
+    el paso es lo que trajo la primera página, no `limit`. Si alguna página trae aún
+    menos, `missing_offset` pide lo que falte al final.
+    """
+    page_size = len((data or {}).get("inventories") or [])
+    if not page_size:
+        return []
+    total = total_bus_count(data)
+    return list(range(page_size, min(total, page_size * max_pages), page_size))
+
+def missing_offset(first_page, other_pages):
+    """
+    Offset desde el que faltan servicios según `busCounts.total` (las filas recibidas
+    en todas las páginas), o None si el inventario está completo.
+    """
+    received = sum(len((page or {}).get("inventories") or []) for page in [first_page, *other_pages])
+    return received if received < total_bus_count(first_page) else None
+
+def merge_pages(first_page, other_pages):
+    """
+    Une los inventarios de todas las páginas en la respuesta de la primera.
+    Los servicios repetidos entre páginas (mismo routeId) se descartan.
+    """
+    merged = dict(first_page)
+    inventories = list(first_page.get("inventories") or [])
+    seen = {inv.get("routeId") for inv in inventories if isinstance(inv, dict)}
+    for page in other_pages:
+        for inv in (page or {}).get("inventories") or []:
+            route_id = inv.get("routeId") if isinstance(inv, dict) else None
+            if route_id is not None and route_id in seen:
+                continue
+            seen.add(route_id)
+            inventories.append(inv)
+    merged["inventories"] = inventories
+    return merged
+
+def route_output_path(output_dir, to_name, date_str, from_name=None):
+    """
+    Devuelve la ruta del JSON crudo: redbus_<destino>_<fecha>.json desde el origen
+    por defecto, o redbus_<origen>_<destino>_<fecha>.json desde cualquier otro.
+    """
+    # Limpiamos el nombre de la ciudad para el nombre del archivo
+    to_name_clean = to_name.replace(" (Todos)", "")
+    from_name_clean = (from_name or DEFAULT_ORIGIN).replace(" (Todos)", "")
+    if from_name_clean != DEFAULT_ORIGIN:
+        to_name_clean = f"{from_name_clean}_{to_name_clean}"
+    return os.path.join(output_dir, f"redbus_{to_name_clean}_{date_str}.json")
+
+def project_payload(data, response_fields=RESPONSE_FIELDS, inventory_fields=INVENTORY_FIELDS):
+    """
+    Conserva solo los campos declarados de la respuesta y de cada servicio.
+    """
+    data = data or {}
+    projected = {key: data[key] for key in response_fields if key in data}
+    projected["inventories"] = [
+        {key: inv[key] for key in inventory_fields if key in inv}
+        for inv in (data.get("inventories") or [])
+        if isinstance(inv, dict)
+    ]
+    return projected
+
+def content_fingerprint(data, volatile_keys=VOLATILE_KEYS):
+    """
+    Hash SHA-256 del contenido normalizado: sin claves volátiles (p. ej. `uuidAtSRP`),
+    con las claves ordenadas y los servicios en un orden estable. Dos respuestas
+    con el mismo inventario dan el mismo hash aunque cambie el orden o el uuid.
+    """
+    volatile = set(volatile_keys)
+
+    def normalize(obj):
+        if isinstance(obj, dict):
+            return {key: normalize(value) for key, value in obj.items() if key not in volatile}
+        if isinstance(obj, list):
+            return [normalize(value) for value in obj]
+        return obj
+
+    normalized = normalize(data or {})
+    inventories = normalized.get("inventories")
+    if isinstance(inventories, list):
+        normalized["inventories"] = sorted(
+            inventories, key=lambda inv: json.dumps(inv, sort_keys=True, ensure_ascii=False)
+        )
+    canonical = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def fare_fingerprint(data, fare_fields=FARE_FIELDS):
+    """
+    Hash solo de lo que le importa al usuario que busca: tarifas y asientos libres
+    de cada servicio (`FARE_FIELDS`). Cambios de rating o de orden no cuentan.
+    """
+    inventories = (data or {}).get("inventories") or []
+    fares = sorted(
+        json.dumps([inv.get("routeId")] + [inv.get(field) for field in fare_fields], sort_keys=True, default=str)
+        for inv in inventories if isinstance(inv, dict)
+    )
+    return hashlib.sha256("\n".join(fares).encode("utf-8")).hexdigest()
+
+def serialize_payload(data, full_payload=SAVE_FULL_PAYLOAD):
+    """
+    Serializa la respuesta en JSON compacto (proyectado salvo que se pida el
+    payload completo). Devuelve el texto y el hash de su contenido normalizado.
+    """
+    if not full_payload:
+        data = project_payload(data)
+    content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return content, content_fingerprint(data)
+
+def write_route_json(content, output_path):
+    """
+    Escribe en disco una respuesta ya serializada.
+    """
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    logging.info(f"✅ Archivo guardado: {output_path}")
+
+def save_route_json(data, output_path, full_payload=SAVE_FULL_PAYLOAD):
+    """
+    Guarda la respuesta de RedBus en disco en JSON compacto.
+    Salvo que se pida el payload completo, se guardan solo los campos proyectados.
+    Devuelve el hash del contenido normalizado.
+    """
+    content, content_hash = serialize_payload(data, full_payload)
+    write_route_json(content, output_path)
+    return content_hash
+
+def stored_content_hash(output_path):
+    """Hash del contenido normalizado de un JSON ya guardado (None si no existe o no se puede leer)."""
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            return content_fingerprint(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+def scrape_redbus_route(from_city_id, to_city_id, from_name, to_name, date_str, output_dir, base_url=BASE_URL,
+                        full_payload=SAVE_FULL_PAYLOAD, previous_hash=None):
+    """
+    Realiza scraping a la API de RedBus para una ruta y fecha específicas.
+    Guarda el JSON crudo solo si la petición es exitosa (código 200) y su contenido
+    cambió: igual que el crawler, compara el hash con `previous_hash` (o, si no se da,
+    con el del JSON que ya está en disco) y no reescribe una respuesta idéntica.
+    Devuelve el hash del contenido, o None si no se pudo descargar.
+    """
+    # Validar formato de fecha
+    if not validate_date(date_str):
+        return
+
+    # Crear el directorio de salida si no existe
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Construir los parámetros de forma segura
+    params = build_search_params(from_city_id, to_city_id, from_name, to_name, date_str)
+
     logging.info(f"🚌 Buscando: {from_name} -> {to_name} | Fecha: {date_str}")
 
+    # Cliente compartido: conexiones keep-alive y reintentos con backoff ante 429/5xx
+    client = get_http_client()
+
     try:
-        response = requests.post(
+        # Esperar el turno que marca el control de tasa (en lugar de una pausa fija)
+        _rate_controller.wait()
+        response = client.post(
             base_url,
+            observer=_rate_controller,
             params=params,
             headers=HEADERS,
             cookies=COOKIES,
             json=BODY,
-            timeout=20
+            timeout=REQUEST_TIMEOUT
         )
 
         # Manejar códigos de estado específicos
         if response.status_code == 200:
             data = response.json()
-            # Guardar el archivo JSON
-            # Limpiamos el nombre de la ciudad para el nombre del archivo
-            to_name_clean = to_name.replace(" (Todos)", "")
-            output_path = os.path.join(output_dir, f"redbus_{to_name_clean}_{date_str}.json")
-            
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logging.info(f"✅ Archivo guardado: {output_path}")
+            # Recorrer el resto de páginas hasta agotar busCounts
+            pages = []
+            offsets = remaining_offsets(data)
+            failed = False
+            while offsets and not failed:
+                offset = offsets.pop(0)
+                page_params = build_search_params(from_city_id, to_city_id, from_name, to_name, date_str, offset=offset)
+                _rate_controller.wait()
+                page_response = client.post(
+                    base_url, observer=_rate_controller, params=page_params, headers=HEADERS, cookies=COOKIES,
+                    json=BODY, timeout=REQUEST_TIMEOUT
+                )
+                if page_response.status_code != 200:
+                    logging.error(f"❌ Página offset={offset} falló con código {page_response.status_code} para {from_name} -> {to_name}")
+                    failed = True
+                    break
+                page = page_response.json()
+                pages.append(page)
+                # Páginas más cortas que la primera: se pide lo que falte desde lo ya recibido
+                if not offsets and page.get("inventories") and len(pages) + 1 < MAX_PAGES:
+                    next_offset = missing_offset(data, pages)
+                    if next_offset is not None:
+                        offsets.append(next_offset)
+
+            if failed or missing_offset(data, pages) is not None:
+                # No se guarda un inventario incompleto
+                if not failed:
+                    logging.error(f"❌ Inventario incompleto para {from_name} -> {to_name} en {date_str}: "
+                                  f"recibidos {missing_offset(data, pages)} de {total_bus_count(data)} servicios")
+            else:
+                output_path = route_output_path(output_dir, to_name, date_str, from_name)
+                content, content_hash = serialize_payload(merge_pages(data, pages), full_payload)
+                if previous_hash is None:
+                    previous_hash = stored_content_hash(output_path)
+                if content_hash == previous_hash:
+                    logging.info(f"♻️ Sin cambios: {to_name} {date_str}; no se reescribe.")
+                else:
+                    write_route_json(content, output_path)
+                return content_hash
 
         elif response.status_code == 404:
             logging.warning(f"⚠️ Ruta no encontrada (404) para {from_name} -> {to_name} en {date_str}.")
         else:
-            # Para otros errores (500, 429, etc.), mostrar un error más genérico
+            # Para otros errores (500, 429, etc.) que persisten tras los reintentos
             logging.error(f"❌ Error en la petición: Código {response.status_code} para {from_name} -> {to_name}")
             # response.raise_for_status() # Opcional: si quieres que el programa se detenga
 
     except requests.exceptions.RequestException as e:
         logging.error(f"❌ Error de red: {e}")
-    
-    # Pequeña pausa para ser respetuosos con el servidor
-    time.sleep(random.uniform(1, 3))
\ No newline at end of file
@@ -0,0 +1,112 @@
+# backend/scraping/redbus/sharded.py
+"""
+Crawl de RedBus repartido en varios procesos.
+- Cada proceso ejecuta `crawl_routes` sobre su parte de los trabajos, con su propio
+  bucle asyncio, pool de hilos y cliente HTTP: el parseo y la serialización de JSON
+  ya no compiten por un único GIL
+- Todos comparten una cubeta de tokens (memoria compartida), así la tasa total
+  hacia el host nunca supera el tope global de cortesía
+- Escriben en la misma carpeta, el mismo archivo de segmentos y el mismo manifiesto
+"""
+
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.scraping.rate_control import SharedTokenBucket
+from backend.scraping.telemetry import Telemetry
+from .archive import RawArchive
+from .config import MAX_CONCURRENCY, PER_HOST_CONCURRENCY, RATE_MAX
+from .crawler import run_crawl
+from .manifest import CrawlManifest
+
+# Objetos compartidos que cada proceso hijo recibe al arrancar
+_shard_state = {}
+
+
+def _init_shard(shared_bucket, archive_lock):
+    _shard_state["bucket"] = shared_bucket
+    _shard_state["archive_lock"] = archive_lock
+    # Con el arranque 'spawn' (Windows/macOS) el hijo no hereda la configuración del log
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def _run_shard(shard_number, jobs, output_dir, manifest_path, archive_dir, with_telemetry, crawl_kwargs):
+    """Ejecuta una parte del crawl en el proceso hijo y devuelve su resumen (y su telemetría)."""
+    logging.info(f"🧩 Proceso {shard_number}: {len(jobs)} rutas-fecha.")
+    manifest = CrawlManifest(manifest_path) if manifest_path else None
+    archive = RawArchive(archive_dir, process_lock=_shard_state["archive_lock"]) if archive_dir else None
+    telemetry = Telemetry() if with_telemetry else None
+    try:
+        summary = run_crawl(
+            jobs, output_dir, manifest=manifest, archive=archive,
+            shared_bucket=_shard_state["bucket"], telemetry=telemetry, **crawl_kwargs
+        )
+        return summary, telemetry
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if archive is not None:
+            archive.close()
+
+
+def shard_jobs(jobs, shards):
+    """
+    Reparte los trabajos en `shards` partes intercaladas (0, N, 2N...):
+    si los trabajos vienen ordenados por prioridad, cada proceso empieza por los más urgentes.
+    """
+    return [jobs[i::shards] for i in range(shards)]
+
+
+def split_limit(limit, shards):
+    """
+    Reparte un límite entero entre `shards` procesos sin pasarse: `limit // shards`
+    a cada uno y una unidad más a los primeros `limit % shards`. La suma es `limit`.
+    """
+    base, extra = divmod(limit, shards)
+    return [base + (1 if number < extra else 0) for number in range(shards)]
+
+
+def run_sharded_crawl(jobs, output_dir, shards, global_rate=RATE_MAX, manifest_path=None, archive_dir=None,
+                      max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY,
+                      telemetry=None, **crawl_kwargs):
+    """
+    Ejecuta el crawl en `shards` procesos y devuelve el resumen combinado.
+    - `global_rate`: peticiones por segundo hacia el host sumando todos los procesos.
+    - La concurrencia total y por host se reparten entre los procesos sin superar los
+      límites (`split_limit`); nunca hay más procesos que peticiones simultáneas por host.
+    - El manifiesto y el archivo se abren en cada proceso a partir de sus rutas.
+    - Con `telemetry`, la de cada proceso se combina en ella al terminar.
+    El resto de argumentos se pasan tal cual a `crawl_routes`.
+    """
+    # Cada proceso necesita al menos una petición simultánea: no más procesos que el límite
+    shards = max(1, min(shards, len(jobs), max_concurrency, per_host_concurrency))
+    per_shard_concurrency = split_limit(max(1, max_concurrency), shards)
+    per_shard_host = split_limit(max(1, per_host_concurrency), shards)
+    shared_bucket = SharedTokenBucket(global_rate, capacity=per_host_concurrency)
+    archive_lock = multiprocessing.Lock()
+    logging.info(
+        f"🧩 Crawl en {shards} procesos: {'/'.join(map(str, per_shard_concurrency))} workers y "
+        f"{'/'.join(map(str, per_shard_host))} peticiones por host, tope global {global_rate} req/s"
+    )
+
+    with ProcessPoolExecutor(max_workers=shards, initializer=_init_shard,
+                             initargs=(shared_bucket, archive_lock)) as pool:
+        futures = [
+            pool.submit(_run_shard, number, part, output_dir, manifest_path, archive_dir,
+                        telemetry is not None,
+                        dict(crawl_kwargs, max_concurrency=per_shard_concurrency[number],
+                             per_host_concurrency=per_shard_host[number]))
+            for number, part in enumerate(shard_jobs(jobs, shards))
+        ]
+        summary = Counter()
+        for future in futures:
+            shard_summary, shard_telemetry = future.result()
+            summary.update(shard_summary)
+            if telemetry is not None:
+                telemetry.merge(shard_telemetry)
+
+    summary = dict(summary)
+    logging.info(f"📊 Crawl por procesos terminado: {summary}")
+    return summary
@@ -0,0 +1,140 @@
+# backend/scraping/replay.py
+"""
+Caché de grabación y reproducción HTTP para los scrapers.
+- 'record': hace las peticiones reales y guarda cada par petición -> respuesta en disco
+- 'replay': responde solo desde disco; una petición no grabada es un error
+- 'auto': usa lo grabado si existe y, si no, pide y graba
+Permite ejecutar los scrapers sin red (pruebas, benchmarks, máquinas aisladas).
+Se activa con las variables de entorno CHASKIWAY_HTTP_REPLAY (modo) y
+CHASKIWAY_HTTP_CASSETTE (carpeta), o pasando un ReplayCache a HttpClient.
+Los parámetros secretos (SECRET_PARAMS, como el api_key de SerpAPI) no entran en la
+huella ni en la URL grabada: las grabaciones no guardan claves y sirven con cualquiera.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+MODES = ("record", "replay", "auto")
+ENV_MODE = "CHASKIWAY_HTTP_REPLAY"
+ENV_DIR = "CHASKIWAY_HTTP_CASSETTE"
+DEFAULT_CASSETTE_DIR = os.path.join("data", "raw", "http_cassette")
+SECRET_PARAMS = frozenset({"api_key", "apikey", "access_token", "token"})  # En minúsculas
+
+
+class ReplayMissError(requests.exceptions.RequestException):
+    """La petición no está grabada y el modo es 'replay'."""
+
+
+def _is_secret(name):
+    return str(name).lower() in SECRET_PARAMS
+
+
+def strip_secrets(url):
+    """La URL sin los parámetros secretos de su query string."""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_secret(k)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def request_key(method, url, params=None, json_body=None, data=None):
+    """
+    Huella de una petición: método, URL, parámetros y cuerpo (sin cookies ni cabeceras,
+    que cambian entre sesiones sin cambiar la respuesta, ni parámetros secretos).
+    """
+    if isinstance(params, dict):
+        params = params.items()
+    if params is not None and not isinstance(params, (str, bytes)):
+        params = sorted((str(k), str(v)) for k, v in params if not _is_secret(k))
+    url = strip_secrets(url)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="replace")
+    canonical = json.dumps([method.upper(), url, params, json_body, data], sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ReplayCache:
+    """
+    Pares petición -> respuesta en `cache_dir/<2 primeros caracteres>/<hash>.json.gz`.
+    Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CASSETTE_DIR, mode="auto"):
+        if mode not in MODES:
+            raise ValueError(f"Modo de reproducción desconocido: {mode!r} (usa {', '.join(MODES)})")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @classmethod
+    def from_env(cls):
+        """ReplayCache configurado por variables de entorno, o None si no están definidas."""
+        mode = os.environ.get(ENV_MODE)
+        if not mode:
+            return None
+        return cls(os.environ.get(ENV_DIR, DEFAULT_CASSETTE_DIR), mode)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def lookup(self, key):
+        """Devuelve la respuesta grabada como requests.Response, o None."""
+        if self.mode == "record":
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise ReplayMissError(f"Petición no grabada ({key[:12]}) en {self.cache_dir}")
+            return None
+        with self._lock:
+            self.hits += 1
+
+        response = requests.Response()
+        response.status_code = stored["status_code"]
+        response.url = stored["url"]
+        response.headers = CaseInsensitiveDict(stored["headers"])
+        response.encoding = stored.get("encoding")
+        response._content = base64.b64decode(stored["body"])
+        return response
+
+    def store(self, key, response):
+        """Graba una respuesta (en los modos 'record' y 'auto')."""
+        if self.mode == "replay":
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stored = {
+            "url": strip_secrets(response.url),
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "encoding": response.encoding,
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+        # Escritura atómica: otro hilo o proceso puede estar leyendo la misma grabación
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.recorded += 1
+
+    def log_stats(self, log=logging.info):
+        log(f"📼 Caché HTTP ({self.mode}): {self.hits} reproducidas, {self.misses} no grabadas, {self.recorded} grabadas")
@@ -0,0 +1,407 @@
+# backend/scraping/telemetry.py
+"""
+Telemetría de las peticiones HTTP de los scrapers.
+- Conexiones de urllib3 cronometradas: DNS, conexión TCP, TLS y tiempo hasta el primer byte (TTFB)
+- Un colector que agrega cada intento por ruta y por ejecución: histogramas de latencia,
+  bytes, códigos de estado y reintentos
+- Resumen en JSON y en formato de texto de Prometheus (para el textfile collector de node_exporter)
+"""
+
+import bisect
+import heapq
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family, create_connection
+
+PHASES = ("dns", "connect", "tls", "ttfb", "total")
+# Límites superiores de los buckets (como los de Prometheus por defecto, en segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+METRIC_PREFIX = "chaskiway_http"
+RESERVOIR_SIZE = 1024  # Muestra para los percentiles; exactos mientras haya menos observaciones
+
+
+# --- Conexiones cronometradas ---
+
+class _TimedConnectionMixin:
+    """
+    Mide las fases de cada petición y las deja en `response.chaskiway_timing`
+    (la respuesta de urllib3, accesible como `response.raw` en requests).
+    En una conexión reutilizada, DNS, conexión y TLS valen 0.
+    """
+
+    def _reset_timing(self):
+        self._timing = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "reused": True}
+        self._connected_at = None
+
+    def _new_conn(self):
+        """
+        Igual que `HTTPConnection._new_conn` de urllib3 (mismas excepciones), pero resuelve
+        el nombre una sola vez y conecta a las direcciones ya resueltas, en orden: así el
+        DNS y la conexión se miden por separado sin una segunda resolución.
+        """
+        if not hasattr(self, "_timing"):
+            self._reset_timing()
+        start = time.monotonic()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.monotonic()
+
+        last_error = None
+        for *_, sockaddr in addresses:
+            try:
+                # Con una IP literal, create_connection no vuelve a consultar el DNS
+                sock = create_connection(sockaddr[:2], self.timeout, source_address=self.source_address,
+                                         socket_options=self.socket_options)
+            except OSError as e:
+                last_error = e
+                continue
+            self._timing.update(dns=resolved - start, connect=time.monotonic() - resolved, reused=False)
+            sys.audit("http.client.connect", self, self.host, self.port)
+            return sock
+
+        if isinstance(last_error, socket.timeout):
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from last_error
+        raise NewConnectionError(self, f"Failed to establish a new connection: {last_error}") from last_error
+
+    def connect(self):
+        start = time.monotonic()
+        super().connect()
+        elapsed = time.monotonic() - start
+        self._timing["tls"] = max(0.0, elapsed - self._timing["dns"] - self._timing["connect"])
+        self._connected_at = time.monotonic()
+
+    def request(self, *args, **kwargs):
+        if not hasattr(self, "_timing"):
+            self._reset_timing()
+        self._request_at = time.monotonic()
+        return super().request(*args, **kwargs)
+
+    def getresponse(self):
+        response = super().getresponse()
+        # TTFB desde que la conexión está lista (o desde el envío si ya lo estaba)
+        sent_at = max(self._request_at, self._connected_at or 0.0)
+        response.chaskiway_timing = dict(self._timing, ttfb=time.monotonic() - sent_at)
+        self._reset_timing()
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+# --- Histogramas y colector ---
+
+class Histogram:
+    """
+    Histograma de buckets acumulativos al estilo Prometheus. Guarda solo un contador
+    por bucket, la cuenta, la suma y el máximo; los percentiles salen de una muestra
+    uniforme de hasta RESERVOIR_SIZE valores (muestreo de reservorio), así que la
+    memoria no crece con el número de peticiones.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Por bucket, sin acumular; el último es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+        self.sample = []
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.sample) < RESERVOIR_SIZE:
+            self.sample.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < RESERVOIR_SIZE:
+                self.sample[index] = value
+
+    def merge(self, other):
+        # Cada valor de una muestra representa count / len(muestra) observaciones de su
+        # histograma: se combinan con un muestreo ponderado (Efraimidis-Spirakis)
+        sample = self.sample + other.sample
+        if len(sample) > RESERVOIR_SIZE:
+            weights = ([self.count / len(self.sample)] * len(self.sample)
+                       + [other.count / len(other.sample)] * len(other.sample))
+            keyed = ((random.random() ** (1 / weight), value) for weight, value in zip(weights, sample))
+            sample = [value for _, value in heapq.nlargest(RESERVOIR_SIZE, keyed)]
+        self.sample = sample
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def bucket_counts(self):
+        """Lista de (límite, cuántos valores <= límite), terminando en +Inf."""
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def percentile(self, q):
+        if not self.sample:
+            return None
+        ordered = sorted(self.sample)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": round(self.percentile(0.50), 6),
+            "p95": round(self.percentile(0.95), 6),
+            "p99": round(self.percentile(0.99), 6),
+            "max": round(self.max, 6),
+            "buckets": {str(bound): count for bound, count in self.bucket_counts()},
+        }
+
+
+class _Stats:
+    """Agregado de un conjunto de intentos (una ruta o la ejecución entera)."""
+
+    def __init__(self):
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.body_bytes = Histogram(BYTES_BUCKETS)
+        self.wire_bytes = 0
+        self.status_codes = {}
+        self.errors = {}
+        self.attempts = 0
+        self.fetches = 0
+        self.retries = 0
+
+    def merge(self, other):
+        for phase in PHASES:
+            self.phases[phase].merge(other.phases[phase])
+        self.body_bytes.merge(other.body_bytes)
+        self.wire_bytes += other.wire_bytes
+        for code, count in other.status_codes.items():
+            self.status_codes[code] = self.status_codes.get(code, 0) + count
+        for error, count in other.errors.items():
+            self.errors[error] = self.errors.get(error, 0) + count
+        self.attempts += other.attempts
+        self.fetches += other.fetches
+        self.retries += other.retries
+
+    def summary(self):
+        return {
+            "attempts": self.attempts,
+            "fetches": self.fetches,
+            "retries": self.retries,
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "errors": self.errors,
+            "body_bytes": self.body_bytes.summary(),
+            "wire_bytes": self.wire_bytes,
+            "latency_seconds": {phase: hist.summary() for phase, hist in self.phases.items()},
+        }
+
+
+def _escape(label):
+    return str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+class Telemetry:
+    """
+    Colector de telemetría de una ejecución. Es seguro entre hilos y se puede
+    enviar entre procesos (pickle) para combinar los de varios shards con `merge`.
+    Recibe cada intento con `record_attempt` y cada petición lógica (con sus
+    reintentos) con `record_fetch`; las etiquetas de ruta las pone el llamador.
+    """
+
+    def __init__(self, name="redbus"):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._start = time.time()
+        self._end = None
+        self.run = _Stats()
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _targets(self, label):
+        if label is None:
+            return (self.run,)
+        return (self.run, self.routes.setdefault(label, _Stats()))
+
+    def record_attempt(self, label, response=None, error=None, elapsed=0.0):
+        """Registra un intento HTTP: su respuesta (o excepción) y su duración total."""
+        timing = getattr(getattr(response, "raw", None), "chaskiway_timing", None) or {}
+        with self._lock:
+            for stats in self._targets(label):
+                stats.attempts += 1
+                stats.phases["total"].observe(elapsed)
+                for phase in ("dns", "connect", "tls", "ttfb"):
+                    if phase in timing:
+                        stats.phases[phase].observe(timing[phase])
+                if response is not None:
+                    code = str(response.status_code)
+                    stats.status_codes[code] = stats.status_codes.get(code, 0) + 1
+                    stats.body_bytes.observe(len(response.content))
+                    raw = getattr(response, "raw", None)
+                    stats.wire_bytes += raw.tell() if hasattr(raw, "tell") else len(response.content)
+                if error is not None:
+                    name = type(error).__name__
+                    stats.errors[name] = stats.errors.get(name, 0) + 1
+
+    def record_fetch(self, label, attempts):
+        """Registra una petición lógica que necesitó `attempts` intentos."""
+        with self._lock:
+            for stats in self._targets(label):
+                stats.fetches += 1
+                stats.retries += max(0, attempts - 1)
+
+    def finish(self):
+        self._end = time.time()
+
+    def merge(self, other):
+        """Suma la telemetría de otro colector (por ejemplo, de otro proceso)."""
+        with self._lock:
+            self.run.merge(other.run)
+            for label, stats in other.routes.items():
+                self.routes.setdefault(label, _Stats()).merge(stats)
+            self._start = min(self._start, other._start)
+            if other._end is not None:
+                self._end = max(self._end or other._end, other._end)
+
+    @property
+    def duration(self):
+        return (self._end or time.time()) - self._start
+
+    def summary(self):
+        duration = self.duration
+        with self._lock:
+            return {
+                "name": self.name,
+                "started_at": self.started_at,
+                "duration_seconds": round(duration, 3),
+                "throughput_rps": round(self.run.attempts / duration, 3) if duration else None,
+                "run": self.run.summary(),
+                "routes": {label: stats.summary() for label, stats in sorted(self.routes.items())},
+            }
+
+    def slowest_routes(self, top=5):
+        """Rutas con mayor latencia p95, para el log."""
+        with self._lock:
+            ranked = [
+                (label, stats.phases["total"].percentile(0.95)) for label, stats in self.routes.items()
+                if stats.phases["total"].count
+            ]
+        return sorted(ranked, key=lambda item: item[1], reverse=True)[:top]
+
+    def to_prometheus(self):
+        """Texto en formato de exposición de Prometheus."""
+        job = _escape(self.name)
+        lines = []
+        seen = set()
+
+        def histogram(metric, help_text, hist, labels):
+            # HELP y TYPE una sola vez por métrica, aunque tenga varias series
+            if metric not in seen:
+                seen.add(metric)
+                lines.extend([f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"])
+            for bound, count in hist.bucket_counts():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{labels}}} {hist.sum:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {hist.count}")
+
+        with self._lock:
+            for phase, hist in self.run.phases.items():
+                histogram(f"{METRIC_PREFIX}_phase_duration_seconds",
+                          "Duración de cada fase de las peticiones HTTP.", hist, f'job="{job}",phase="{phase}"')
+            histogram(f"{METRIC_PREFIX}_response_body_bytes",
+                      "Tamaño del cuerpo de las respuestas.", self.run.body_bytes, f'job="{job}"')
+            for label, stats in sorted(self.routes.items()):
+                histogram(f"{METRIC_PREFIX}_route_duration_seconds",
+                          "Duración total de las peticiones por ruta.", stats.phases["total"],
+                          f'job="{job}",route="{_escape(label)}"')
+
+            lines += [f"# HELP {METRIC_PREFIX}_responses_total Respuestas por código de estado.",
+                      f"# TYPE {METRIC_PREFIX}_responses_total counter"]
+            lines += [f'{METRIC_PREFIX}_responses_total{{job="{job}",code="{code}"}} {count}'
+                      for code, count in sorted(self.run.status_codes.items())]
+            lines += [f"# HELP {METRIC_PREFIX}_errors_total Errores de red por tipo.",
+                      f"# TYPE {METRIC_PREFIX}_errors_total counter"]
+            lines += [f'{METRIC_PREFIX}_errors_total{{job="{job}",error="{_escape(error)}"}} {count}'
+                      for error, count in sorted(self.run.errors.items())]
+            for metric, help_text, value in (
+                ("retries_total", "Reintentos en la ejecución.", self.run.retries),
+                ("fetches_total", "Peticiones lógicas (con sus reintentos) en la ejecución.", self.run.fetches),
+                ("wire_bytes_total", "Bytes recibidos por la red (antes de descomprimir).", self.run.wire_bytes),
+            ):
+                lines += [f"# HELP {METRIC_PREFIX}_{metric} {help_text}", f"# TYPE {METRIC_PREFIX}_{metric} counter",
+                          f'{METRIC_PREFIX}_{metric}{{job="{job}"}} {value}']
+            attempts = self.run.attempts
+
+        duration = self.duration
+        lines += [f"# HELP {METRIC_PREFIX}_run_duration_seconds Duración de la ejecución.",
+                  f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+                  f'{METRIC_PREFIX}_run_duration_seconds{{job="{job}"}} {duration:.3f}',
+                  f"# HELP {METRIC_PREFIX}_throughput_rps Intentos HTTP por segundo en la ejecución.",
+                  f"# TYPE {METRIC_PREFIX}_throughput_rps gauge",
+                  f'{METRIC_PREFIX}_throughput_rps{{job="{job}"}} {attempts / duration if duration else 0:.3f}',
+                  f"# HELP {METRIC_PREFIX}_run_timestamp_seconds Fin de la ejecución (epoch).",
+                  f"# TYPE {METRIC_PREFIX}_run_timestamp_seconds gauge",
+                  f'{METRIC_PREFIX}_run_timestamp_seconds{{job="{job}"}} {self._end or time.time():.0f}']
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir):
+        """
+        Escribe `<nombre>-<fecha>.json` (un archivo por ejecución) y `<nombre>.prom`
+        (siempre la última ejecución). Ambos se escriben de forma atómica.
+        Devuelve las dos rutas.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        json_path = os.path.join(output_dir, f"{self.name}-{stamp}.json")
+        prom_path = os.path.join(output_dir, f"{self.name}.prom")
+        for path, content in ((json_path, json.dumps(self.summary(), ensure_ascii=False, indent=2)),
+                              (prom_path, self.to_prometheus())):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return json_path, prom_path
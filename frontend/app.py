@@ -6,7 +6,7 @@ import streamlit as st
 from datetime import date
 import base64
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from frontend.data_loader import load_data
+from frontend.data_loader import load_data, version_datos
 
 # =========================
 # CONFIGURACIÓN
@@ -22,9 +22,9 @@ st.set_page_config(
 DESTINOS_FALLBACK = ["Arequipa", "Cusco", "Trujillo", "Piura", "Huancayo", "Huaraz"]
 
 @st.cache_data
-def get_available_destinations():
+def get_available_destinations(version):
     try:
-        df = load_data()
+        df = load_data(version)
         if not df.empty and 'destino' in df.columns:
             destinos = sorted(df['destino'].unique())
             destinos = [d for d in destinos if d and str(d).strip()]
@@ -35,9 +35,9 @@ def get_available_destinations():
         return DESTINOS_FALLBACK
 
 @st.cache_data
-def get_stats_summary():
+def get_stats_summary(version):
     try:
-        df = load_data()
+        df = load_data(version)
         if not df.empty:
             total_viajes = len(df)
             empresas_unicas = df['empresa'].nunique() if 'empresa' in df.columns else 0
@@ -57,9 +57,9 @@ def get_stats_summary():
         return None
 
 @st.cache_data
-def get_climate_options():
+def get_climate_options(version):
     try:
-        df = load_data()
+        df = load_data(version)
         if not df.empty and 'categoria_clima' in df.columns:
             climas = sorted(df['categoria_clima'].unique())
             return [c for c in climas if c and str(c).strip()]
@@ -526,11 +526,12 @@ st.markdown(f'''
     <div class="chaski-hero-form">
 ''', unsafe_allow_html=True)
 
-# Obtener datos necesarios
+# Obtener datos necesarios (la versión publicada es la clave de la caché: cambia con cada ETL)
 try:
-    available_destinations = get_available_destinations()
-    stats = get_stats_summary()
-    climate_options = get_climate_options()
+    version = version_datos()
+    available_destinations = get_available_destinations(version)
+    stats = get_stats_summary(version)
+    climate_options = get_climate_options(version)
 except Exception as e:
     st.error(f"❌ Error al cargar datos: {str(e)}")
     st.info("💡 Asegúrate de haber ejecutado el pipeline de datos")
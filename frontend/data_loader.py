@@ -5,39 +5,81 @@ import pandas as pd
 import sqlite3
 from pathlib import Path
 
-# Usamos el decorador de cache de Streamlit para que la base de datos
-# solo se lea una vez, sin importar cuántas veces se llame a esta función
-# desde diferentes páginas. Esto hace la app súper rápida.
-@st.cache_data
-def load_data():
+from backend.database.exportacion import a_pandas, leer_arrow, tabla_desde_vista
+from backend.database.publicacion import ruta_arrow
+
+# Base de datos publicada por el pipeline (backend/database/publicacion.py). Se reemplaza
+# de forma atómica: mientras no haya una versión nueva, siempre se lee la misma.
+# .parents[1] sube un nivel (de 'frontend/' a la raíz del proyecto)
+DB_PATH = Path(__file__).resolve().parents[1] / "data" / "processed" / "viajes_grupales.db"
+
+
+def version_datos():
+    """
+    Versión de la base de datos publicada (última fila de la tabla `data_version`).
+    Si la base de datos es anterior a esa tabla se usa la fecha de modificación del
+    archivo; None si aún no existe. Es una consulta de una fila: se hace en cada rerun.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{DB_PATH.as_posix()}?mode=ro", uri=True)
+        try:
+            fila = conn.execute("SELECT version FROM data_version ORDER BY construida_en DESC LIMIT 1").fetchone()
+        finally:
+            conn.close()
+        if fila:
+            return fila[0]
+    except sqlite3.Error:
+        pass
+    try:
+        return str(DB_PATH.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+def load_data(version=None):
+    """
+    Devuelve los datos de la app. Solo se vuelven a leer cuando el pipeline publica una
+    versión nueva; si no, se usa la que ya está en memoria.
+    Las funciones de las páginas que cachean algo calculado a partir de estos datos deben
+    recibir la versión (`version_datos()`) como argumento y pasarla aquí: así su caché
+    también cambia cuando se publica una versión nueva.
+    """
+    if version is None:
+        version = version_datos()
+    # Copia superficial: cada página puede añadir o reemplazar columnas sin tocar la compartida
+    return _load_data(version).copy(deep=False)
+
+
+# Usamos cache_resource (y no cache_data, que guarda una copia serializada y la vuelve a
+# crear en cada llamada) para que todas las páginas y sesiones usen el mismo DataFrame,
+# cuyas columnas apuntan al archivo Arrow mapeado en memoria. Se lee una vez por versión.
+# max_entries=2: la versión en uso y, durante el cambio, la anterior.
+@st.cache_resource(max_entries=2)
+def _load_data(version):
     """
-    Carga los datos desde la base de datos SQLite final y los prepara para la app.
-    Esta es la ÚNICA función que se conecta a la base de datos.
+    Carga los datos de la versión publicada y los prepara para la app.
+    Lee la exportación Arrow de la versión (backend/database/exportacion.py) con
+    memory_map: los tipos ya vienen en el archivo (fechas, categóricas, precios en
+    float32), las columnas numéricas no se copian y varios procesos de Streamlit
+    comparten las mismas páginas. Si la versión no tiene .arrow, lee la base de datos SQLite y la
+    convierte a los mismos tipos.
+    `version` solo sirve de clave de la caché (ver `version_datos`).
     """
     try:
-        # La ruta se calcula desde la ubicación de este archivo (utils.py)
-        # .parents[1] sube un nivel (de 'frontend/' a la raíz del proyecto)
-        db_path = Path(__file__).resolve().parents[1] / "data" / "processed" / "viajes_grupales.db"
-        
-        # Conectarse a la base de datos
-        conn = sqlite3.connect(db_path)
-        
-        # Leer la tabla completa en un DataFrame de Pandas
-        df = pd.read_sql_query("SELECT * FROM viajes_combinados", conn)
-        
-        # Cerrar la conexión
-        conn.close()
-        
-        # --- Pequeñas conversiones para asegurar la calidad de los datos ---
-        # Convertir la columna de fecha a un objeto datetime de Pandas
-        df['fecha_viaje'] = pd.to_datetime(df['fecha_viaje'])
-        
-        # Asegurarse de que las columnas numéricas sean del tipo correcto (int/float)
-        numeric_cols = ['precio_min', 'asientos_disponibles', 'rating_empresa', 'temperatura_promedio']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce') # 'coerce' convierte errores en NaN
-
-        return df
+        if version is None:
+            raise FileNotFoundError(DB_PATH)
+
+        arrow_path = ruta_arrow(DB_PATH, version)
+        if arrow_path.exists():
+            return a_pandas(leer_arrow(arrow_path))
+
+        # Conectarse a la base de datos (solo lectura)
+        conn = sqlite3.connect(f"file:{DB_PATH.as_posix()}?mode=ro", uri=True)
+        try:
+            tabla = tabla_desde_vista(conn)
+        finally:
+            conn.close()
+        return a_pandas(tabla)
     
     except FileNotFoundError:
         st.error("❌ No se encontró la base de datos. Ejecuta primero el pipeline de datos con 'python main.py'")
@@ -47,4 +89,40 @@ def load_data():
         return pd.DataFrame()
     except Exception as e:
         st.error(f"❌ Error inesperado al cargar los datos: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+# Miniaturas locales de los destinos (generadas por backend/scraping/imagenes/procesador.py).
+# Están en la carpeta static/ de la app: con `server.enableStaticServing` (.streamlit/config.toml)
+# Streamlit las sirve en app/static/miniaturas/ y el navegador las pide y cachea una sola vez.
+IMAGES_DIR = Path(__file__).resolve().parents[1] / "data" / "processed" / "images"
+MINIATURAS_DIR = Path(__file__).resolve().parent / "static" / "miniaturas"
+MINIATURAS_URL = "app/static/miniaturas"  # Relativa: respeta server.baseUrlPath
+CARD_IMAGE_WIDTH = 320   # La tarjeta mide 160 px; 320 se ve nítida en pantallas 2x
+CARD_IMAGE_FORMAT = "webp"
+
+
+def load_thumbnails(width=CARD_IMAGE_WIDTH, image_format=CARD_IMAGE_FORMAT):
+    """
+    Devuelve un diccionario destino -> URL de su miniatura local. Las tarjetas solo
+    enlazan la imagen; no se incrusta nada en la página. Si aún no hay miniaturas o la
+    app no sirve archivos estáticos, devuelve {} (las tarjetas usan el enlace original).
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return {}
+    try:
+        modificado = (IMAGES_DIR / "indice.csv").stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _load_thumbnails(modificado, width, image_format)
+
+
+@st.cache_data(max_entries=4)
+def _load_thumbnails(modificado, width, image_format):
+    """`modificado` (mtime del índice) solo sirve de clave: el procesador puede reescribirlo."""
+    indice = pd.read_csv(IMAGES_DIR / "indice.csv")
+    indice = indice[(indice["ancho"] == width) & (indice["formato"] == image_format)]
+    return {
+        destino: f"{MINIATURAS_URL}/{archivo}"
+        for destino, archivo in zip(indice["ciudad"], indice["archivo"])
+        if (MINIATURAS_DIR / archivo).exists()
+    }
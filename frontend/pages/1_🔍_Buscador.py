@@ -16,7 +16,7 @@ import math
 import numpy as np
 
 # Función compartida para cargar datos
-from frontend.data_loader import load_data
+from frontend.data_loader import load_data, load_thumbnails, version_datos
 
 # === CSS GLOBAL PARA TODO EL FRONTEND ===
 st.markdown('''
@@ -493,7 +493,7 @@ def generate_savings_suggestions(df_recomendado, user_preferences):
                 })
     
     # 3. Ofertas de fin de semana
-    hoy = date.today()
+    hoy = pd.Timestamp(date.today())
     proximo_fin_semana = hoy + timedelta(days=(4 - hoy.weekday()) % 7)  # Viernes
     if proximo_fin_semana >= hoy:
         df_fin_semana = df_recomendado[
@@ -557,21 +557,23 @@ def format_climate_info(clima: str, temp: float) -> str:
     icon = "🌞" if clima == "Cálido" else "☁️" if clima == "Templado" else "❄️"
     return f"{icon} {clima} ({temp:.1f}°C)"
 
-@st.cache_data
-def load_and_prepare_data():
-    df = load_data()
-    df["fecha_viaje"] = pd.to_datetime(df["fecha_viaje"], errors="coerce").dt.date
-    # Filtrar fechas pasadas
-    hoy = date.today()
-    df = df[df["fecha_viaje"] >= hoy]
-    return df
+# Sin st.cache_data: guardaría otra copia serializada del DataFrame por sesión. Se filtra
+# en cada rerun el DataFrame compartido de data_loader (mapeado en memoria), con
+# `fecha_viaje` como datetime64, tal como viene (sin pasarla a objetos `date`)
+def load_and_prepare_data(version, hoy):
+    df = load_data(version)
+    if df.empty:
+        return df
+    # Filtrar fechas pasadas (si no hay ninguna, sin copiar el DataFrame)
+    futuras = df["fecha_viaje"] >= pd.Timestamp(hoy)
+    return df if futuras.all() else df[futuras]
 
 # =========================
 # CARGA DE DATOS
 # =========================
 with st.spinner("🔄 Cargando datos y preparando recomendaciones..."):
     try:
-        df = load_and_prepare_data()
+        df = load_and_prepare_data(version_datos(), date.today())
     except Exception as e:
         st.error(f"❌ Error al cargar datos: {str(e)}")
         st.info("💡 Asegúrate de haber ejecutado el pipeline de datos con 'python main.py'")
@@ -607,7 +609,8 @@ if st.session_state['presupuesto_max'] <= 0:
 # Extraer parámetros del session state
 user_preferences = {
     'presupuesto_max': st.session_state.get('presupuesto_max', 500),
-    'fecha_viaje': st.session_state.get('fecha_viaje', date.today()),
+    # Timestamp, como la columna fecha_viaje, para compararlas y restarlas directamente
+    'fecha_viaje': pd.Timestamp(st.session_state.get('fecha_viaje', date.today())),
     'clima_preferido': st.session_state.get('clima_preferido', 'Sin preferencia'),
     'destino_preferido': st.session_state.get('destino_preferido', 'Sin preferencia')
 }
@@ -828,6 +831,7 @@ if not df_final.empty:
     # MOSTRAR RECOMENDACIONES (agrego badges y explicación)
     # =========================
     st.markdown("### 🏆 Tus Mejores Opciones")
+    miniaturas = load_thumbnails()
     for idx, (_, viaje) in enumerate(df_final.iterrows()):
         match_class, match_text = get_match_level(viaje['score'])
         badges = []
@@ -848,10 +852,13 @@ if not df_final.empty:
         else:
             badges.append('🔴 Pocos asientos')
         explicacion = ', '.join(badges)
-        # Card con imagen y datos
+        # Card con imagen y datos: miniatura local si existe; si no, el enlace original
+        imagen = miniaturas.get(viaje['destino'])
+        if imagen is None and pd.notna(viaje.get('url_imagen_destino')):
+            imagen = viaje['url_imagen_destino']
         st.markdown(f"""
         <div class="recommendation-card" style="display:flex; align-items:stretch; background:#fff; border-radius:18px; box-shadow:0 2px 12px rgba(0,0,0,0.07); margin-bottom:1.2rem; overflow:hidden;">
-            {f'<img src="{viaje["url_imagen_destino"]}" alt="{viaje["destino"]}" style="width:160px; height:100%; object-fit:cover; background:#eee;">' if pd.notna(viaje.get('url_imagen_destino')) else ''}
+            {f'<img src="{imagen}" alt="{viaje["destino"]}" width="160" loading="lazy" style="width:160px; height:100%; object-fit:cover; background:#eee;">' if imagen else ''}
             <div style="flex:1; padding:1.2rem 1.5rem; display:flex; flex-direction:column; justify-content:center;">
                 <div style="background:#28a745; color:#fff; border-radius:12px 12px 0 0; padding:0.4rem 1rem; font-weight:600; font-size:1.05rem; margin-bottom:0.7rem;">
                     {' | '.join(badges)}
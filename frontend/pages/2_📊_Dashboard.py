@@ -17,7 +17,7 @@ from datetime import datetime, timedelta
 import io
 
 # Función compartida para cargar datos
-from frontend.data_loader import load_data
+from frontend.data_loader import load_data, version_datos
 
 # =========================
 # CONFIGURACIÓN
@@ -121,11 +121,13 @@ st.markdown("""
 # FUNCIONES AUXILIARES
 # =========================
 
-@st.cache_data
-def get_dashboard_data():
-    """Carga y prepara los datos para el dashboard."""
+# cache_resource y no cache_data: el resultado (con el DataFrame de los viajes) se comparte
+# entre sesiones sin serializarlo ni copiarlo en cada llamada. No se debe modificar en su sitio.
+@st.cache_resource(max_entries=2)
+def get_dashboard_data(version):
+    """Carga y prepara los datos para el dashboard (`version`: clave de la caché, ver data_loader.py)."""
     try:
-        df = load_data()
+        df = load_data(version)
         if df is None or df.empty:
             st.warning("⚠️ No se encontraron datos en la base de datos.")
             return None, None, None, None, None
@@ -137,16 +139,10 @@ def get_dashboard_data():
             st.error(f"❌ Columnas faltantes en los datos: {missing_columns}")
             return None, None, None, None, None
         
-        # Limpiar datos
-        df_clean = df.dropna(subset=['precio_min', 'destino'])
-        
-        # Convertir fecha_viaje a datetime
-        df_clean['fecha_viaje'] = pd.to_datetime(df_clean['fecha_viaje'], errors='coerce')
-        df_clean = df_clean.dropna(subset=['fecha_viaje'])
-        
-        # Validar que los precios sean numéricos y positivos
-        df_clean['precio_min'] = pd.to_numeric(df_clean['precio_min'], errors='coerce')
-        df_clean = df_clean[df_clean['precio_min'] > 0]
+        # Limpiar datos: los tipos ya vienen de data_loader (fecha datetime64, precio float32).
+        # Si todas las filas son válidas no se filtra, para no copiar el DataFrame compartido
+        validos = df['precio_min'].gt(0) & df['destino'].notna() & df['fecha_viaje'].notna()
+        df_clean = (df if validos.all() else df[validos]).copy(deep=False)
         
         if df_clean.empty:
             st.warning("⚠️ No hay datos válidos después de la limpieza.")
@@ -168,7 +164,7 @@ def get_dashboard_data():
         
         # Análisis temporal
         df_clean['mes'] = df_clean['fecha_viaje'].dt.month
-        df_clean['dia_semana'] = df_clean['fecha_viaje'].dt.day_name()
+        df_clean['dia_semana'] = df_clean['fecha_viaje'].dt.day_name().astype('category')
         
         # Análisis de clima (si existe la columna)
         clima_stats = None
@@ -216,7 +212,7 @@ st.markdown("""
 
 # Cargar datos
 with st.spinner("Cargando datos..."):
-    df_clean, destinos_stats, empresas_stats, clima_stats, df_original = get_dashboard_data()
+    df_clean, destinos_stats, empresas_stats, clima_stats, df_original = get_dashboard_data(version_datos())
 
 if df_clean is None or df_clean.empty:
     st.error("❌ No se pudieron cargar los datos. Verifica que la base de datos esté disponible.")
@@ -257,15 +253,23 @@ if len(fecha_range) == 2:
 else:
     fecha_inicio, fecha_fin = min_date_obj, max_date_obj
 
-# Aplicar filtros
-df_filtrado = df_clean[
+# Aplicar filtros (con el rango completo no se copia el DataFrame compartido)
+en_rango = (
     (df_clean['fecha_viaje'] >= pd.to_datetime(fecha_inicio)) &
     (df_clean['fecha_viaje'] <= pd.to_datetime(fecha_fin))
-]
+)
+df_filtrado = df_clean if en_rango.all() else df_clean[en_rango]
 
 if destino_seleccionado != "Todos":
     df_filtrado = df_filtrado[df_filtrado['destino'] == destino_seleccionado]
 
+# destino, empresa y categoria_clima son categóricas (ver data_loader.py): se quitan las
+# categorías que el filtro dejó sin viajes para que value_counts no las cuente con 0
+df_filtrado = df_filtrado.assign(**{
+    col: df_filtrado[col].cat.remove_unused_categories()
+    for col in df_filtrado.select_dtypes('category').columns
+})
+
 # =========================
 # PALETA DE COLORES
 # =========================
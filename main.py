@@ -1,5 +1,6 @@
 # main.py - El Orquestador del Proyecto Chaskiway (Versión Final)
 
+import argparse
 import pandas as pd
 import logging
 from pathlib import Path
@@ -8,6 +9,10 @@ from pathlib import Path
 # Asegúrate de que tu schema.py esté actualizado con la columna 'categoria_clima'
 from backend.database.schema import create_database
 from backend.database.loader import process_redbus_data, load_combined_data_to_db
+from backend.database.incremental import fuentes_redbus, fuentes_entrada, planificar_etl, guardar_estado
+from backend.database.publicacion import nueva_version, descartar_version, publicar, VersionInvalida
+from backend.scraping.clima.procesador import procesar_clima, leer_clima_viajes
+from backend.scraping.imagenes.procesador import procesar_imagenes
 
 # --- Configuración del Logging ---
 logging.basicConfig(
@@ -24,44 +29,114 @@ PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_RAW_DIR = PROJECT_ROOT / "data" / "raw"
 DATA_PROCESSED_DIR = PROJECT_ROOT / "data" / "processed"
 DB_PROCESSED_PATH = DATA_PROCESSED_DIR / "viajes_grupales.db"
+REDBUS_CACHE_PATH = DATA_PROCESSED_DIR / "redbus_parse_cache.parquet"  # Viajes ya parseados, por hash de contenido
+CLIMA_STORE_DIR = DATA_PROCESSED_DIR / "clima"  # Almacén Parquet del clima diario (destino/mes)
+IMAGES_DIR = DATA_PROCESSED_DIR / "images"  # Índice, originales y fallos de las imágenes de destinos
+MINIATURAS_DIR = PROJECT_ROOT / "frontend" / "static" / "miniaturas"  # Servidas por Streamlit como estáticos
+CLIMA_RAW_PATH = DATA_RAW_DIR / "clima" / "historico_julio_2024.csv"
+IMAGENES_CSV_PATH = DATA_RAW_DIR / "imagenes" / "enlaces_imagenes.csv"
 
 # --- Función Principal (Orquestador ETL) ---
 
-def main():
+def main(completo=False, imagenes=False):
     """
     Orquesta la unión de las fuentes de datos pre-procesadas y carga el resultado
     en la base de datos SQLite final.
+    Por defecto es incremental: solo se re-parsean las fuentes de RedBus nuevas o
+    cambiadas desde la última ejecución y solo se tocan sus filas. Con `completo`
+    (o si cambió el clima o las imágenes) se recarga todo.
+    Nunca escribe en la base de datos publicada: construye una versión nueva, la
+    comprueba y la publica de forma atómica (ver backend/database/publicacion.py).
+    Las miniaturas no forman parte de la base de datos: con `imagenes` se actualizan
+    al final, como un paso aparte que no retrasa la publicación.
     """
     logging.info("🚀 --- INICIANDO PIPELINE FINAL DE INTEGRACIÓN --- 🚀")
+    publicar_version(completo)
+
+    if imagenes:
+        # Red externa: solo se descargan las imágenes nuevas o cambiadas, y las que
+        # fallaron hace poco esperan su turno (ver backend/scraping/imagenes/procesador.py)
+        logging.info("🖼️ Actualizando las miniaturas de los destinos...")
+        try:
+            procesar_imagenes(IMAGENES_CSV_PATH, IMAGES_DIR, miniaturas_dir=MINIATURAS_DIR)
+        except FileNotFoundError:
+            logging.warning("No se encontró el archivo de imágenes. No se actualizan las miniaturas.")
+
+
+def publicar_version(completo=False):
+    """Construye, comprueba y publica una versión nueva de la base de datos, si hay cambios."""
+    # --- PASO 0: PLAN (qué cambió desde la última ejecución) ---
+    version, build_path = nueva_version(DB_PROCESSED_PATH)
+    try:
+        plan = construir_version(build_path, completo)
+        if plan is None:
+            descartar_version(build_path)
+            return
+        publicar(build_path, DB_PROCESSED_PATH, version, "completa" if plan.completo else "incremental", plan.huellas)
+    except VersionInvalida as e:
+        logging.critical(f"La versión {version} no pasó las comprobaciones y no se publicó: {e}")
+        return
+    except BaseException:
+        descartar_version(build_path)
+        raise
+
+    logging.info("🎉 --- PIPELINE DE DATOS COMPLETADO EXITOSAMENTE --- 🎉")
+    logging.info(f"Puedes encontrar la base de datos final en: {DB_PROCESSED_PATH}")
+
+
+def construir_version(build_path, completo=False):
+    """
+    Aplica el ETL sobre la copia de trabajo `build_path`. Devuelve el plan ejecutado,
+    o None si no hay nada que publicar (sin cambios o con un error ya registrado).
+    """
+    # (Importante) Asegúrate de que tu schema.py tenga la columna 'categoria_clima'
+    create_database(build_path)
+    plan = planificar_etl(
+        build_path,
+        fuentes_redbus(DATA_RAW_DIR / "redbus"),
+        fuentes_entrada([CLIMA_RAW_PATH, IMAGENES_CSV_PATH]),
+        completo=completo,
+    )
+    if not plan.hay_cambios:
+        logging.info("✅ No hay cambios desde la última ejecución. La base de datos ya está al día.")
+        return None
 
     # --- PASO 1: EXTRACT (Leer todas las fuentes de datos) ---
     
     # 1.1 Extraer datos de RedBus (esta función ya los procesa desde los JSON)
     logging.info("Leyendo y procesando datos de RedBus...")
-    df_redbus = process_redbus_data(DATA_RAW_DIR / "redbus")
-    if df_redbus.empty:
+    df_redbus = process_redbus_data(
+        DATA_RAW_DIR / "redbus", cache_path=REDBUS_CACHE_PATH,
+        claves=None if plan.completo else plan.claves_redbus
+    )
+    if df_redbus.empty and plan.completo:
         logging.critical("No se pudieron procesar los datos de RedBus. El pipeline no puede continuar.")
-        return
+        return None
     logging.info(f"Se procesaron {len(df_redbus)} registros de RedBus.")
 
     # 1.2 Extraer datos de Imágenes
     logging.info("Leyendo datos de imágenes...")
     try:
-        df_imagenes = pd.read_csv(DATA_RAW_DIR / "imagenes" / "enlaces_imagenes.csv")
+        df_imagenes = pd.read_csv(IMAGENES_CSV_PATH)
         df_imagenes = df_imagenes.rename(columns={'ciudad': 'destino', 'url_imagen': 'url_imagen_destino'})
         logging.info(f"Se leyeron {len(df_imagenes)} enlaces de imágenes.")
     except FileNotFoundError:
         logging.warning("No se encontró el archivo de imágenes. Se continuará sin estos datos.")
         df_imagenes = pd.DataFrame(columns=['destino', 'url_imagen_destino'])
 
-    # 1.3 Extraer los datos de clima YA PROCESADOS
-    logging.info("Leyendo datos de clima procesados...")
+    # 1.3 Actualizar el almacén de clima con el horario crudo (si está) y leer solo lo necesario
+    logging.info("Procesando datos de clima...")
     try:
-        df_clima = pd.read_csv(DATA_PROCESSED_DIR / "clima_final.csv")
-        logging.info(f"Se leyeron {len(df_clima)} registros de clima procesado.")
+        if plan.completo or not CLIMA_STORE_DIR.exists():
+            procesar_clima(CLIMA_RAW_PATH, output_path=None, store_dir=CLIMA_STORE_DIR)
     except FileNotFoundError:
-        logging.critical("No se encontró 'clima_final.csv'. Por favor, ejecuta primero 'procesador_clima.py'.")
-        return
+        logging.warning("No se encontró el clima horario. Se usará el almacén de clima existente.")
+    try:
+        df_clima = leer_clima_viajes(CLIMA_STORE_DIR, destinos=df_redbus['destino'].unique())
+        logging.info(f"Se leyeron {len(df_clima)} registros de clima del almacén.")
+    except FileNotFoundError:
+        logging.critical("No se encontró el clima horario ni el almacén de clima. Ejecuta primero el scraper de clima.")
+        return None
 
     # --- PASO 2: COMBINE (MERGE) ---
     logging.info("Combinando los tres datasets...")
@@ -77,13 +152,18 @@ def main():
     # --- PASO 3: LOAD ---
     logging.info("Cargando datos combinados en la base de datos final...")
     
-    # (Importante) Asegúrate de que tu schema.py tenga la columna 'categoria_clima'
-    create_database(DB_PROCESSED_PATH)
-    
-    load_combined_data_to_db(str(DB_PROCESSED_PATH), df_final)
-
-    logging.info("🎉 --- PIPELINE DE DATOS COMPLETADO EXITOSAMENTE --- 🎉")
-    logging.info(f"Puedes encontrar la base de datos final en: {DB_PROCESSED_PATH}")
+    claves_afectadas = None if plan.completo else plan.claves_afectadas
+    if not load_combined_data_to_db(str(build_path), df_final, claves_afectadas):
+        logging.critical("La carga falló; no se publica nada y se reintentará en la próxima ejecución.")
+        return None
+    guardar_estado(build_path, plan)
+    return plan
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline ETL de Chaskiway")
+    parser.add_argument("--completo", action="store_true",
+                        help="Recarga todo en lugar de solo las fuentes que cambiaron")
+    parser.add_argument("--imagenes", action="store_true",
+                        help="Al terminar, descarga las imágenes nuevas o cambiadas y genera sus miniaturas")
+    args = parser.parse_args()
+    main(completo=args.completo, imagenes=args.imagenes)
\ No newline at end of file
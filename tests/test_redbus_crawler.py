@@ -0,0 +1,139 @@
+# tests/test_redbus_crawler.py
+"""
+Pruebas del crawler asíncrono de RedBus contra el servidor simulado (MockRedBus), en el
+mismo proceso y sin red: paginación con páginas más cortas que `limit`, reintentos ante
+429, detección de respuestas sin cambios y que nunca se guarde un inventario incompleto.
+
+Uso:
+    python -m pytest -q tests
+"""
+
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from backend.scraping.redbus.crawler import RouteJob, run_crawl
+from backend.scraping.redbus.manifest import CrawlManifest
+from backend.scraping.redbus.mock_server import MockRedBus, make_handler
+from backend.scraping.redbus.scraper import missing_offset, remaining_offsets, route_output_path
+
+CITIES = {"Lima": 1, "Cusco": 2}
+DATE = "09-Jul-2025"
+JOB = RouteJob(CITIES["Lima"], CITIES["Cusco"], "Lima", "Cusco", DATE)
+
+
+def _corpus(services=6):
+    """Una ruta-fecha con `services` servicios de routeId distinto."""
+    inventories = [
+        {
+            "routeId": route_id,
+            "departureTime": "2025-07-09 08:00:00",
+            "travelsName": f"Empresa {route_id % 3}",
+            "fareList": [40.0 + route_id],
+            "availableSeats": 10 + route_id,
+            "totalRatings": 4.0,
+        }
+        for route_id in range(services)
+    ]
+    data = {"parentSrcCityName": "Lima", "parentDstCityName": "Cusco", "inventories": inventories,
+            "busCounts": {"total": services}}
+    return {("Cusco", DATE): data}
+
+
+@pytest.fixture
+def serve():
+    """Arranca un MockRedBus en un puerto libre y devuelve (mock, base_url)."""
+    servers = []
+
+    def start(mock):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(mock))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/search"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _crawl(base_url, output_dir, manifest):
+    return run_crawl([JOB], str(output_dir), base_url=base_url, manifest=manifest, max_age_hours=0,
+                     max_concurrency=2, per_host_concurrency=2, rate_initial=50, rate_max=100)
+
+
+def _stored(output_dir):
+    with open(route_output_path(str(output_dir), "Cusco", DATE, "Lima"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_remaining_offsets_step_by_first_page():
+    first_page = {"inventories": [{}] * 10, "busCounts": {"total": 18}}
+    assert remaining_offsets(first_page, limit=20) == [10]
+    assert missing_offset(first_page, [{"inventories": [{}] * 8}]) is None
+    assert missing_offset(first_page, [{"inventories": [{}] * 5}]) == 15
+
+
+@pytest.mark.parametrize("max_page_size", [None, 10, 7])
+def test_crawl_stores_whole_inventory_and_detects_unchanged(serve, tmp_path, max_page_size):
+    base_url = serve(MockRedBus(_corpus(), CITIES, multiply=3, max_page_size=max_page_size))
+    manifest = CrawlManifest(str(tmp_path / "manifest.db"))
+    try:
+        assert _crawl(base_url, tmp_path, manifest)["ok"] == 1
+        data = _stored(tmp_path)
+        assert len(data["inventories"]) == data["busCounts"]["total"] == 18
+
+        assert _crawl(base_url, tmp_path, manifest)["unchanged"] == 1
+    finally:
+        manifest.close()
+
+
+def test_crawl_retries_429(serve, tmp_path):
+    mock = MockRedBus(_corpus(), CITIES, multiply=3, max_page_size=5, prob_429=0.3, retry_after=0, seed=1)
+    base_url = serve(mock)
+    manifest = CrawlManifest(str(tmp_path / "manifest.db"))
+    try:
+        assert _crawl(base_url, tmp_path, manifest)["ok"] == 1
+    finally:
+        manifest.close()
+    assert mock.stats["throttled"] > 0
+    assert len(_stored(tmp_path)["inventories"]) == 18
+
+
+class _ShortPagesMock(MockRedBus):
+    """Páginas posteriores más cortas que la primera, o un total que el servidor no entrega."""
+
+    def __init__(self, *args, later_page_size=None, extra_total=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.later_page_size = later_page_size
+        self.extra_total = extra_total
+
+    def search(self, params):
+        if int(params.get("offset", 0)) and self.later_page_size:
+            params = dict(params, limit=self.later_page_size)
+        status, headers, body = super().search(params)
+        if status == 200 and self.extra_total:
+            data = json.loads(body)
+            data["busCounts"]["total"] += self.extra_total
+            body = json.dumps(data).encode("utf-8")
+        return status, headers, body
+
+
+def test_crawl_fetches_rows_missing_after_short_pages(serve, tmp_path):
+    base_url = serve(_ShortPagesMock(_corpus(), CITIES, multiply=3, max_page_size=10, later_page_size=3))
+    assert _crawl(base_url, tmp_path, None)["ok"] == 1
+    assert len(_stored(tmp_path)["inventories"]) == 18
+
+
+def test_crawl_never_stores_incomplete_inventory(serve, tmp_path):
+    base_url = serve(_ShortPagesMock(_corpus(), CITIES, multiply=3, max_page_size=10, extra_total=5))
+    manifest = CrawlManifest(str(tmp_path / "manifest.db"))
+    try:
+        assert _crawl(base_url, tmp_path, manifest)["error"] == 1
+        assert manifest.get(JOB)["status"] == "error"
+    finally:
+        manifest.close()
+    assert not (tmp_path / "redbus_Cusco_09-Jul-2025.json").exists()
@@ -0,0 +1,40 @@
+# tests/test_redbus_parser.py
+"""
+Pruebas del parser columnar de RedBus (ColumnarTrips): valores con tipos inesperados
+no deben cortar el ETL ni dejar columnas de distinto largo.
+
+Uso:
+    python -m pytest -q tests
+"""
+
+import math
+
+from backend.database.redbus_parser import ColumnarTrips
+
+
+def _respuesta(*viajes):
+    return {"parentSrcCityName": "Lima", "parentDstCityName": "Cusco", "inventories": list(viajes)}
+
+
+def test_add_convierte_tipos_raros_sin_desalinear_columnas():
+    viajes = ColumnarTrips(with_hash=True)
+    n = viajes.add(_respuesta(
+        {"departureTime": "2025-07-09 08:00:00", "travelsName": "Cruz del Sur", "fareList": [50, 45.5],
+         "totalRatings": "4.1", "availableSeats": 3.0},
+        {"departureTime": "2025-07-09 22:00:00", "travelsName": "Oltursa", "fareList": ["x"],
+         "totalRatings": "sin datos", "availableSeats": 2.5},
+        {"departureTime": None, "travelsName": None, "totalRatings": None, "availableSeats": "12"},
+        "no es un viaje",
+    ), content_hash="abc")
+    assert n == len(viajes) == 3
+
+    df = viajes.to_frame()
+    assert len(df) == 3
+    assert list(df["origen"]) == ["Lima"] * 3
+    assert list(df["content_hash"]) == ["abc"] * 3
+    assert df["precio_min"][0] == 45.5 and math.isnan(df["precio_min"][1])
+    assert df["rating_empresa"][0] == 4.1
+    assert math.isnan(df["rating_empresa"][1]) and math.isnan(df["rating_empresa"][2])
+    assert df["asientos_disponibles"].tolist()[0] == 3
+    assert df["asientos_disponibles"].isna().tolist() == [False, True, False]
+    assert df["asientos_disponibles"][2] == 12